@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+
+""" Benchmark runner for the modules of this repository.
+
+Every case of benchmarks/cases.py is timed for a range of input sizes. The
+results (time per call, throughput and peak memory) are written as JSON and
+can be compared against a saved baseline to flag regressions.
+
+Example:
+--------
+$ python3 -m benchmarks --output baseline.json
+$ python3 -m benchmarks --compare baseline.json --threshold 0.2
+"""
+
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+from benchmarks.cases import CASES
+
+
+def measure(func, min_time=0.2, max_repeat=1000):
+    """ Calls func repeatedly for at least min_time seconds (but at most
+    max_repeat times) and returns the best time of a single call in seconds.
+    """
+
+    best, total, repeat = float('inf'), 0.0, 0
+
+    while total < min_time and repeat < max_repeat:
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+
+        best, total, repeat = min(best, elapsed), total + elapsed, repeat + 1
+
+    return best
+
+
+def peak_memory(func):
+    """ Returns the peak of memory in bytes allocated during a single call of func. """
+
+    tracemalloc.start()
+
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run(selection=None, min_time=0.2, log=sys.stderr):
+    """ Runs all cases (or the ones whose name contains one of the strings in
+    selection) and returns the list of results.
+    """
+
+    results = []
+
+    for name, (case, sizes, size_unit, unit) in CASES.items():
+        if selection and not any(s in name for s in selection):
+            continue
+
+        for size in sizes:
+            func, units = case(size)
+            seconds = measure(func, min_time)
+
+            results.append({
+                'case': name,
+                'size': size,
+                'size_unit': size_unit,
+                'seconds': seconds,
+                'throughput': units / seconds if seconds else float('inf'),
+                'unit': unit,
+                'peak_memory': peak_memory(func),
+            })
+
+            print(format_result(results[-1]), file=log)
+
+    return results
+
+
+def format_result(result):
+    return (
+        f"{result['case']:<32} {result['size']:>8} {result['size_unit']:<7} "
+        f"{result['throughput']:>14.1f} {result['unit']:<9} {result['peak_memory']:>10} B peak"
+    )
+
+
+def compare(results, baseline, threshold):
+    """ Compares the results with the ones of the baseline and returns the list
+    of regressions as tuples (result, baseline result) where the throughput
+    dropped by more than the given fraction.
+    """
+
+    previous = {(r['case'], r['size']): r for r in baseline['results']}
+    regressions = []
+
+    for result in results:
+        old = previous.get((result['case'], result['size']))
+
+        if old is not None and result['throughput'] < old['throughput'] * (1 - threshold):
+            regressions.append((result, old))
+
+    return regressions
+
+
+def cli():
+    """ Provides a command line interface. Pass -h as argument to get some information. """
+
+    parser = argparse.ArgumentParser(description='Benchmarks for the modules of this repository.')
+
+    parser.add_argument('cases', nargs='*', help='run only cases containing one of these strings')
+    parser.add_argument('--output', '-o', help='write the results as JSON to this file')
+    parser.add_argument('--compare', '-c', help='compare the results with this JSON baseline')
+
+    parser.add_argument(
+        '--threshold', type=float, default=0.2,
+        help='flag a regression if the throughput dropped by more than this fraction'
+    )
+
+    parser.add_argument(
+        '--min-time', type=float, default=0.2, help='minimal time in seconds to time every case'
+    )
+
+    parser.add_argument('--list', action='store_true', help='list the available cases')
+    args = parser.parse_args()
+
+    if args.list:
+        print('\n'.join(CASES))
+        return
+
+    report = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': run(args.cases, args.min_time),
+    }
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=4)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report['results'], json.load(f), args.threshold)
+
+        for result, old in regressions:
+            print(
+                f"[-] regression: {result['case']} ({result['size']} {result['size_unit']}): "
+                f"{old['throughput']:.1f} -> {result['throughput']:.1f} {result['unit']}"
+            )
+
+        if regressions:
+            sys.exit(1)
+
+        print("[+] no regressions")
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,130 @@
+""" The benchmark cases covering the modules of this repository.
+
+Every case is a function expecting the input size and returning the tuple
+(function to time, amount of processed units). The units are bytes for the
+byte/text processing cases and single operations for the number theoretic
+ones (see the units in the tuples of CASES). The inputs are pseudo random but
+seeded, so every run (e.g. a baseline and a --compare run) times the same data.
+"""
+
+import hashlib
+import random
+import string
+
+from classic.caesar import CaesarCipher
+from classic.otp import otp
+from cryptanalysis.informationtheory import compute_entropy
+from cryptanalysis.vigenere_cracker import rank_key_lengths
+from hashing.sha1_lea import SHA1, sha1_lea
+from tools.convert import message_to_indexlist, indexlist_to_message
+from tools.hamming import hamming
+from tools.rsa_attack import factorize, int_sqrt
+
+
+BYTE_SIZES = [1 << 10, 1 << 16, 1 << 20]
+SHA1_SIZES = [1 << 10, 1 << 14, 1 << 17]
+CONVERT_SIZES = [1 << 10, 1 << 14, 1 << 17]
+BIT_SIZES = [512, 1024, 2048, 4096, 8192]
+SYMBOL_SIZES = [1 << 4, 1 << 8, 1 << 12]
+
+
+def random_text(size, alphabet=string.ascii_uppercase, seed='text'):
+    return ''.join(random.Random(f'{seed}/{size}').choices(alphabet, k=size))
+
+
+def random_bytes(size, seed='bytes'):
+    return random.Random(f'{seed}/{size}').randbytes(size)
+
+
+def caesar_encrypt(size):
+    suite, text = CaesarCipher(3), random_text(size)
+    return lambda: suite.encrypt(text), size
+
+
+def caesar_decrypt(size):
+    suite, text = CaesarCipher(3), random_text(size)
+    return lambda: suite.decrypt(text), size
+
+
+def otp_xor(size):
+    a, b = random_bytes(size, 'a'), random_bytes(size, 'b')
+    return lambda: otp(a, b), size
+
+
+def hamming_distance(size):
+    a, b = random_bytes(size, 'a'), random_bytes(size, 'b')
+    return lambda: hamming(a, b), size
+
+
+def vigenere_key_lengths(size):
+    text = random_text(size)
+    return lambda: rank_key_lengths(text), size
+
+
+def convert_message_to_indexlist(size):
+    text = random_text(size)
+    return lambda: message_to_indexlist(text, string.ascii_uppercase), size
+
+
+def convert_indexlist_to_message(size):
+    indexes = message_to_indexlist(random_text(size), string.ascii_uppercase)
+    return lambda: indexlist_to_message(indexes, string.ascii_uppercase, ''), size
+
+
+def sha1_update(size):
+    data = random_bytes(size)
+    return lambda: SHA1().update(data).hexdigest(), size
+
+
+def sha1_hashlib(size):
+    data = random_bytes(size)
+    return lambda: hashlib.sha1(data).hexdigest(), size
+
+
+def sha1_length_extension(size):
+    hexdigest, data, appendix = hashlib.sha1(b'secret' + b'data').hexdigest(), b'data', random_bytes(size)
+    return lambda: sha1_lea(hexdigest, data, appendix, 6), size
+
+
+def _rsa_numbers(bits):
+    """ Returns n = pq and phi(n) for two random odd numbers p, q of bits / 2 bits each.
+    The factorization formula doesn't depend on p and q being prime.
+    """
+
+    rng = random.Random(bits)
+    p, q = (rng.getrandbits(bits // 2) | (1 << (bits // 2 - 1)) | 1 for _ in range(2))
+
+    return p * q, (p - 1) * (q - 1)
+
+
+def rsa_factorize(bits):
+    n, phi = _rsa_numbers(bits)
+    return lambda: factorize(n, phi), 1
+
+
+def rsa_int_sqrt(bits):
+    n, _ = _rsa_numbers(bits)
+    return lambda: int_sqrt(n), 1
+
+
+def entropy(symbols):
+    probabilities = {i: 1 / symbols for i in range(symbols)}
+    return lambda: compute_entropy(probabilities), symbols
+
+
+# name -> (case, sizes, unit of the size, unit of the throughput):
+CASES = {
+    'caesar.encrypt': (caesar_encrypt, BYTE_SIZES, 'bytes', 'B/s'),
+    'caesar.decrypt': (caesar_decrypt, BYTE_SIZES, 'bytes', 'B/s'),
+    'otp': (otp_xor, BYTE_SIZES, 'bytes', 'B/s'),
+    'hamming': (hamming_distance, BYTE_SIZES, 'bytes', 'B/s'),
+    'vigenere.key_lengths': (vigenere_key_lengths, CONVERT_SIZES, 'bytes', 'B/s'),
+    'convert.message_to_indexlist': (convert_message_to_indexlist, CONVERT_SIZES, 'bytes', 'B/s'),
+    'convert.indexlist_to_message': (convert_indexlist_to_message, CONVERT_SIZES, 'bytes', 'B/s'),
+    'sha1.update': (sha1_update, SHA1_SIZES, 'bytes', 'B/s'),
+    'sha1.hashlib': (sha1_hashlib, SHA1_SIZES, 'bytes', 'B/s'),
+    'sha1.lea': (sha1_length_extension, SHA1_SIZES, 'bytes', 'B/s'),
+    'rsa.factorize': (rsa_factorize, BIT_SIZES, 'bits', 'op/s'),
+    'rsa.int_sqrt': (rsa_int_sqrt, BIT_SIZES, 'bits', 'op/s'),
+    'entropy': (entropy, SYMBOL_SIZES, 'symbols', 'symbols/s'),
+}
@@ -8,11 +8,19 @@ arithmetic modulo 26 (”normal“ arithmetic, but remainder when dividing by 26
 """
 
 
+import io
+import sys
 import unittest
 import string
 
+from tools.convert import TranslationCipher
 
-class CaesarCipher:
+
+# number of symbols that are read at once while working on streams:
+DEFAULT_CHUNK_SIZE = 1 << 20
+
+
+class CaesarCipher(TranslationCipher):
     """ Implementation of the caesar cipher providing an encryption and a decryption routine.
 
     Example:
@@ -23,29 +31,87 @@ class CaesarCipher:
     CLLYXO
     >>> suite.decrypt("CLLYXO")
     'FOOBAR'
+    >>> suite.encrypt("FOO BAR!")
+    'CLL YXO!'
+
+    Symbols that are not part of the alphabet (spaces, punctuation, line breaks)
+    are passed through unchanged. Earlier versions raised a ValueError for them,
+    tools.convert.Alphabet(alphabet).encode(message) still rejects such texts.
     """
 
+    counter = 'caesar.symbols'
+
     def __init__(self, key, alphabet=string.ascii_uppercase):
         """ key has to be a natural number with 0 <= key < len(alphabet) """
 
         self.alphabet = alphabet
         self.key = key
 
+    def _targets(self, key):
+        """ Every symbol of the alphabet is encrypted to the symbol key positions ahead. """
+
+        size = len(self.alphabet)
+        return [(i + key) % size for i in range(size)]
+
     def encrypt(self, plaintext):
-        """ Encrypts a message using the caesar cipher and returns the corresponding ciphertext. """
+        """ Encrypts a message using the caesar cipher and returns the corresponding ciphertext.
+
+        The message can be passed as str or as bytes-like object, the ciphertext is of the same
+        type (bytes for any bytes-like object). Symbols that are not part of the alphabet are
+        passed through unchanged.
+        """
 
-        # enc is a helper function that computes the corresponding index of the ciphertext
-        # character for the passed index of a plaintext character based on self.key.
-        enc = lambda i: (i + self.key) % len(self.alphabet)
-        return ''.join([self.alphabet[enc(self.alphabet.index(m))] for m in plaintext])
+        return self._translate(plaintext, self._encrypt_table, self._encrypt_bytes_table)
 
     def decrypt(self, ciphertext):
-        """ Decrypts a message using the caesar cipher and returns the corresponding plaintext. """
+        """ Decrypts a message using the caesar cipher and returns the corresponding plaintext.
+
+        The same rules regarding the type of the message as for encrypt() apply.
+        """
+
+        return self._translate(ciphertext, self._decrypt_table, self._decrypt_bytes_table)
+
+    def encrypt_stream(self, chunks):
+        """ Encrypts the given iterable of chunks (str or bytes) and yields the ciphertext chunk
+        by chunk. As every symbol is mapped on its own, the chunk boundaries don't matter.
+        """
+
+        for chunk in chunks:
+            yield self.encrypt(chunk)
+
+    def decrypt_stream(self, chunks):
+        """ Decrypts the given iterable of chunks (str or bytes) and yields the plaintext chunk
+        by chunk.
+        """
+
+        for chunk in chunks:
+            yield self.decrypt(chunk)
+
+    def encrypt_file(self, source, target, chunk_size=DEFAULT_CHUNK_SIZE):
+        """ Encrypts the content of the file object source into the file object target reading
+        at most chunk_size symbols at once, so the memory usage is constant.
+        """
+
+        target.writelines(self.encrypt_stream(read_chunks(source, chunk_size)))
+
+    def decrypt_file(self, source, target, chunk_size=DEFAULT_CHUNK_SIZE):
+        """ Decrypts the content of the file object source into the file object target reading
+        at most chunk_size symbols at once, so the memory usage is constant.
+        """
+
+        target.writelines(self.decrypt_stream(read_chunks(source, chunk_size)))
+
+
+def read_chunks(fileobj, chunk_size=DEFAULT_CHUNK_SIZE):
+    """ Reads the given file object and yields its content in chunks of at most chunk_size. """
+
+    while True:
+        chunk = fileobj.read(chunk_size)
 
-        # dec is a helper function that computes the corresponding index of the plaintext
-        # character for the passed index of a ciphertext character based on self.key.
-        dec = lambda i: (i + len(self.alphabet) - self.key) % len(self.alphabet)
-        return ''.join([self.alphabet[dec(self.alphabet.index(m))] for m in ciphertext])
+        if not chunk:
+            return
+
+        yield chunk
 
 
 class TestCaesarSuite(unittest.TestCase):
@@ -68,6 +134,9 @@ class TestCaesarSuite(unittest.TestCase):
             self.assertEqual(suite.encrypt(vector['plaintext']), vector['ciphertext'])
             self.assertEqual(suite.decrypt(vector['ciphertext']), vector['plaintext'])
 
+        # symbols occurring twice are shifted from their first occurrence:
+        self.assertEqual(CaesarCipher(1, 'AAB').encrypt('AB'), 'AA')
+
     def test_random(self):
         """ Tests the caesar cipher implementation using randomly generated values. """
 
@@ -89,6 +158,29 @@ class TestCaesarSuite(unittest.TestCase):
             self.assertEqual(suite.encrypt(suite.decrypt(message)), message)
             self.assertEqual(suite.decrypt(suite.encrypt(message)), message)
 
+    def test_bytes(self):
+        """ Tests that bytes are handled like strings and unknown symbols are passed through. """
+
+        suite = CaesarCipher(1)
+
+        self.assertEqual(suite.encrypt(b'HELLO'), b'IFMMP')
+        self.assertEqual(suite.decrypt(bytearray(b'IFMMP')), b'HELLO')
+        self.assertEqual(suite.encrypt('HELLO WORLD!'), 'IFMMP XPSME!')
+        self.assertRaises(ValueError, CaesarCipher(1, 'AB\u20ac').encrypt, b'AB')
+
+    def test_stream(self):
+        """ Tests the streaming interface using small chunks. """
+
+        suite = CaesarCipher(3)
+        plaintext = b'THE QUICK BROWN FOX\nJUMPS OVER THE LAZY DOG\n' * 10
+
+        ciphertext = io.BytesIO()
+        suite.encrypt_file(io.BytesIO(plaintext), ciphertext, chunk_size=7)
+        self.assertEqual(ciphertext.getvalue(), suite.encrypt(plaintext))
+
+        decrypted = b''.join(suite.decrypt_stream([ciphertext.getvalue()[:5], ciphertext.getvalue()[5:]]))
+        self.assertEqual(decrypted, plaintext)
+
 
 def cli():
     """ Provides a command line interface. Pass -h as argument to get some information.
@@ -96,23 +188,32 @@ def cli():
 
     Example to encrypt a string:
     ----------------------------
-    $ python3 caesar.py -e 23 "HELLOWORLD"
+    $ python3 -m classic.caesar -e 23 "HELLOWORLD"
     EBIILTLOIA
 
 
     Example to decrypt a string:
     ----------------------------
-    $ python3 caesar.py -d 23 "EBIILTLOIA"
+    $ python3 -m classic.caesar -d 23 "EBIILTLOIA"
     HELLOWORLD
 
 
     Example how to work with another alphabet:
     ------------------------------------------
-    $ python3 caesar.py --alphabet="abcdefghijklmnopqrstuvwxyz" -e 4 "hello"
+    $ python3 -m classic.caesar --alphabet="abcdefghijklmnopqrstuvwxyz" -e 4 "hello"
     lipps
 
-    $ python3 caesar.py --alphabet="abcdefghijklmnopqrstuvwxyz" -d 4 "lipps"
+    $ python3 -m classic.caesar --alphabet="abcdefghijklmnopqrstuvwxyz" -d 4 "lipps"
     hello
+
+
+    Example how to work with files or stdin/stdout:
+    -----------------------------------------------
+    $ python3 -m classic.caesar -e 23 -i plaintext.txt -o ciphertext.txt
+
+    $ cat ciphertext.txt | python3 -m classic.caesar -d 23 -i - > plaintext.txt
+
+    Symbols that are not part of the alphabet are passed through unchanged.
     """
 
     import argparse
@@ -133,13 +234,40 @@ def cli():
         '--alphabet', default=string.ascii_uppercase, help='define the alphabet, default is A-Z'
     )
 
+    parser.add_argument(
+        '--input', '-i', type=argparse.FileType('rb'),
+        help='read the text from this file instead of the argument ("-" for stdin)'
+    )
+
+    parser.add_argument(
+        '--output', '-o',
+        help='write the result to this file ("-" for stdout), requires --input'
+    )
+
     parser.add_argument('key', type=int, help='key to be used (between 0 and 25)')
-    parser.add_argument('text', type=str, help='help to encrypt or decrypt')
+    parser.add_argument('text', type=str, nargs='?', help='text to encrypt or decrypt')
 
     args = parser.parse_args()
+
+    if args.output is not None and args.input is None:
+        parser.error('--output requires --input')
+
     suite = CaesarCipher(args.key, args.alphabet)
 
-    if args.encrypt:
+    if args.input is not None:
+        routine = suite.encrypt_file if args.encrypt else suite.decrypt_file if args.decrypt else None
+
+        # the output is opened (and truncated) only once the arguments are checked:
+        if routine is None:
+            pass
+        elif args.output in (None, '-'):
+            routine(args.input, sys.stdout.buffer)
+        else:
+            with open(args.output, 'wb') as target:
+                routine(args.input, target)
+    elif args.text is None:
+        parser.error('either the text or --input is required')
+    elif args.encrypt:
         print(suite.encrypt(args.text))
     elif args.decrypt:
         print(suite.decrypt(args.text))
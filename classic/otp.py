@@ -6,28 +6,114 @@ one-time-pad.
 
 import argparse
 import unittest
+import mmap
 import os
 
-def generate_key(target_string):
+from tools import instrument
+
+
+# number of bytes that are combined at once while working on files:
+DEFAULT_CHUNK_SIZE = 1 << 20
+
+def generate_key(target_string, pool=None):
     """ Generates a random key that fits the length of the
-    given target string. Uses os.urandom.
+    given target string. Uses os.urandom or, if given, the
+    key pool (see classic/padstore.py).
     """
 
+    if pool is not None:
+        return pool.get(len(target_string))
+
     return os.urandom(len(target_string))
 
 
-def otp(string_a, string_b, comb=lambda x, y: (x ^ y)):
+def xor(string_a, string_b):
+    """ Returns the bytewise xor of the two given bytes-like objects. The result
+    is as long as the shorter one of both.
+
+    Both buffers are xored at once as big integers, so there is no python-level
+    work per byte.
+    """
+
+    length = min(len(string_a), len(string_b))
+
+    if instrument.enabled:
+        instrument.count('otp.bytes', length)
+
+    if len(string_a) != length:
+        string_a = memoryview(string_a)[:length]
+    if len(string_b) != length:
+        string_b = memoryview(string_b)[:length]
+
+    result = int.from_bytes(string_a, 'big') ^ int.from_bytes(string_b, 'big')
+    return result.to_bytes(length, 'big')
+
+
+def otp(string_a, string_b, comb=None):
     """ This function returns the result of applying the given function on each
     symbol of the passed two arrays.
 
     The passed vectors a and b have to be of type bytes and the result is also
     of type bytes. The argument comb is expected to be a function expecting two
-    byte values returning a single byte value.
+    byte values returning a single byte value. If comb isn't given, the symbols
+    are combined by xor (using the fast path of xor()).
     """
 
+    if comb is None:
+        return xor(string_a, string_b)
+
     return bytes([comb(x, y) for x, y in zip(string_a, string_b)])
 
 
+def otp_stream(chunks_a, chunks_b):
+    """ Combines two iterables of bytes chunks by xor and yields the result chunk
+    by chunk. The chunks of both iterables don't need to be aligned, the stream
+    ends with the shorter one of both. Empty chunks are skipped.
+    """
+
+    chunks_a, chunks_b = iter(chunks_a), iter(chunks_b)
+    rest_a = rest_b = b''
+
+    while True:
+        # None marks the end of an iterable, an empty chunk doesn't:
+        while not rest_a:
+            rest_a = next(chunks_a, None)
+            if rest_a is None:
+                return
+        while not rest_b:
+            rest_b = next(chunks_b, None)
+            if rest_b is None:
+                return
+
+        length = min(len(rest_a), len(rest_b))
+        yield xor(rest_a, rest_b)
+
+        rest_a, rest_b = memoryview(rest_a)[length:], memoryview(rest_b)[length:]
+
+
+def otp_file(path_a, path_b, path_out, chunk_size=DEFAULT_CHUNK_SIZE):
+    """ Xors the files at path_a and path_b (e.g. a ciphertext and a pad) into the
+    file at path_out and returns the number of written bytes.
+
+    The input files are memory-mapped and combined in chunks of chunk_size bytes,
+    so none of them is ever loaded completely.
+    """
+
+    with open(path_a, 'rb') as file_a, open(path_b, 'rb') as file_b, open(path_out, 'wb') as out:
+        length = min(os.fstat(file_a.fileno()).st_size, os.fstat(file_b.fileno()).st_size)
+
+        # mmap refuses to map empty files:
+        if not length:
+            return 0
+
+        with mmap.mmap(file_a.fileno(), length, access=mmap.ACCESS_READ) as map_a, \
+                mmap.mmap(file_b.fileno(), length, access=mmap.ACCESS_READ) as map_b:
+            for offset in range(0, length, chunk_size):
+                out.write(xor(map_a[offset:offset + chunk_size], map_b[offset:offset + chunk_size]))
+
+    return length
+
+
 class TestOTP(unittest.TestCase):
     """ Tests this package: the gcd toolchain. """
 
@@ -45,22 +131,96 @@ class TestOTP(unittest.TestCase):
 
         for string_a, string_b, expected_result in vectors:
             self.assertEqual(otp(string_a, string_b), expected_result)
+            self.assertEqual(otp(string_a, string_b, lambda x, y: x ^ y), expected_result)
+
+        self.assertEqual(otp(b'\x00\x01\x02', b'\xff\xff'), b'\xff\xfe')
+        self.assertEqual(otp(b'', b'\xff'), b'')
+
+    def test_stream(self):
+        """ Tests the streaming interfaces against the plain otp function. """
+
+        import tempfile
+
+        string_a, string_b = os.urandom(1000), os.urandom(900)
+        expected_result = otp(string_a, string_b)
+
+        chunks_a = [string_a[i:i + 64] for i in range(0, len(string_a), 64)]
+        chunks_b = [string_b[i:i + 100] for i in range(0, len(string_b), 100)]
+        self.assertEqual(b''.join(otp_stream(chunks_a, chunks_b)), expected_result)
+
+        # empty chunks in the middle of a stream don't end it:
+        chunks_a[3:3] = [b'', b'']
+        chunks_b[5:5] = [b'']
+        self.assertEqual(b''.join(otp_stream(chunks_a, chunks_b)), expected_result)
+
+        with tempfile.TemporaryDirectory() as directory:
+            paths = [os.path.join(directory, name) for name in ('a', 'b', 'out')]
+
+            for path, content in zip(paths, (string_a, string_b)):
+                with open(path, 'wb') as f:
+                    f.write(content)
+
+            self.assertEqual(otp_file(*paths, chunk_size=128), len(expected_result))
+
+            with open(paths[2], 'rb') as f:
+                self.assertEqual(f.read(), expected_result)
+
+
+def hex_or_file(argument):
+    """ Argument type for the cli: the path of an existing file is passed through,
+    everything else is decoded as hexadecimal string.
+    """
+
+    if os.path.isfile(argument):
+        return argument
+
+    return bytes.fromhex(argument)
+
+
+def read_if_file(argument):
+    """ Returns the content of the file if a path was passed, the bytes otherwise. """
+
+    if isinstance(argument, bytes):
+        return argument
+
+    with open(argument, 'rb') as f:
+        return f.read()
 
 
 def cli():
     """ Provides a command line interface. Pass -h as argument to get some
     information.
+
+    Example:
+
+    $ python3 -m classic.otp 1c0111001f010100061a024b53535009181c 686974207468652062756c6c277320657965
+    746865206b696420646f6e277420706c6179
+
+    $ python3 -m classic.otp ciphertext.bin pad.bin --output plaintext.bin
     """
 
     parser = argparse.ArgumentParser(description='Tool to compute the one time pad of a and b.')
 
-    parser.add_argument('string_a', type=bytes.fromhex, help='string a - hexadecimal encoded')
-    parser.add_argument('string_b', type=bytes.fromhex, help='string b - hexadecimal encoded')
+    parser.add_argument('string_a', type=hex_or_file, help='string a - hexadecimal encoded or file')
+    parser.add_argument('string_b', type=hex_or_file, help='string b - hexadecimal encoded or file')
+
+    parser.add_argument(
+        '--output', '-o', help='write the raw result to this file instead of printing it as hex'
+    )
 
     args = parser.parse_args()
 
-    result = otp(args.string_a, args.string_b)
-    print(result.hex())
+    if args.output is not None and isinstance(args.string_a, str) and isinstance(args.string_b, str):
+        otp_file(args.string_a, args.string_b, args.output)
+        return
+
+    result = otp(read_if_file(args.string_a), read_if_file(args.string_b))
+
+    if args.output is not None:
+        with open(args.output, 'wb') as f:
+            f.write(result)
+    else:
+        print(result.hex())
 
 
 if __name__ == "__main__":
@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+
+""" Persistent one-time pads and a pool of random keys.
+
+A pad store is a large file of random bytes together with a sidecar file
+holding the offset of the first unused byte. Slices of the pad are handed out
+as memoryviews of a read-only memory map (no copies). Reserving a slice reads
+and advances the offset under an exclusive lock and replaces the sidecar
+atomically (os.replace), so no pad byte is ever handed out twice, not even to
+concurrent processes or after a crash.
+
+The key pool serves many small keys out of one large random buffer, which is
+refilled by a single call of its source (os.urandom or a pad store).
+"""
+
+import argparse
+import contextlib
+import fcntl
+import mmap
+import os
+import sys
+import threading
+import unittest
+
+
+# number of random bytes generated and written at once while creating pads:
+DEFAULT_BLOCK_SIZE = 1 << 20
+
+# number of random bytes a key pool fetches at once:
+DEFAULT_POOL_SIZE = 1 << 16
+
+
+class PadExhausted(ValueError):
+    """ Raised if a pad has fewer unused bytes left than requested. """
+
+
+class PadStore:
+    """ A pad file of random bytes handing out non-overlapping slices.
+
+    Example:
+    --------
+    >>> from classic.otp import otp
+    >>> message = b'attack at dawn'
+    >>> PadStore.create('pad.bin', 1 << 20).close()
+    >>> with PadStore('pad.bin') as store:
+    ...     offset, key = store.take(len(message))
+    ...     ciphertext = otp(message, key)
+    ...     key.release()
+
+    The memoryviews returned by take() and read() have to be released before
+    the store is closed.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.offset_path = path + '.offset'
+        self.lock_path = path + '.lock'
+
+        with open(path, 'rb') as f:
+            self.size = os.fstat(f.fileno()).st_size
+
+            # mmap refuses to map empty files:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if self.size else None
+
+        self._view = memoryview(self._map) if self._map is not None else memoryview(b'')
+
+    @classmethod
+    def create(cls, path, size, block_size=DEFAULT_BLOCK_SIZE, random=os.urandom):
+        """ Creates a new pad of size random bytes at path (generated and written
+        in blocks of block_size bytes) with all of its bytes unused.
+        """
+
+        with open(path, 'xb') as f:
+            for offset in range(0, size, block_size):
+                f.write(random(min(block_size, size - offset)))
+
+            f.flush()
+            os.fsync(f.fileno())
+
+        store = cls(path)
+        store._write_offset(0)
+
+        return store
+
+    @contextlib.contextmanager
+    def _locked(self):
+        with open(self.lock_path, 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _read_offset(self):
+        try:
+            with open(self.offset_path) as f:
+                return int(f.read())
+        except FileNotFoundError:
+            return 0
+
+    def _write_offset(self, offset):
+        temporary = f'{self.offset_path}.{os.getpid()}.tmp'
+
+        with open(temporary, 'w') as f:
+            f.write(str(offset))
+            f.flush()
+            os.fsync(f.fileno())
+
+        os.replace(temporary, self.offset_path)
+
+    @property
+    def offset(self):
+        """ The offset of the first unused byte of the pad. """
+
+        return self._read_offset()
+
+    @property
+    def remaining(self):
+        """ The number of unused bytes of the pad. """
+
+        return self.size - self._read_offset()
+
+    def reserve(self, length):
+        """ Marks the next length bytes as used and returns their offset.
+        Raises PadExhausted if fewer bytes are left.
+        """
+
+        if length < 0:
+            raise ValueError("the length must not be negative")
+
+        with self._locked():
+            offset = self._read_offset()
+
+            if offset + length > self.size:
+                raise PadExhausted(f"{length} bytes requested, {self.size - offset} left")
+
+            self._write_offset(offset + length)
+
+        return offset
+
+    def take(self, length):
+        """ Reserves the next length bytes and returns the tuple (offset, pad
+        bytes as memoryview). The offset is needed to decrypt, see read().
+        """
+
+        offset = self.reserve(length)
+        return offset, self._view[offset:offset + length]
+
+    def read(self, offset, length):
+        """ Returns the pad bytes at the given offset as memoryview (e.g. to
+        decrypt a message) without reserving them.
+        """
+
+        if offset < 0 or offset + length > self.size:
+            raise ValueError("the slice exceeds the pad")
+
+        return self._view[offset:offset + length]
+
+    def pool(self, size=DEFAULT_POOL_SIZE):
+        """ Returns a KeyPool reserving size bytes of this pad at once. The pool
+        holds copies of the reserved bytes, so it may outlive the store.
+        """
+
+        return KeyPool(self._copy, size)
+
+    def _copy(self, length):
+        _, view = self.take(length)
+
+        with view:
+            return bytes(view)
+
+    def close(self):
+        """ Closes the memory map (all slices have to be released before). """
+
+        self._view.release()
+
+        if self._map is not None:
+            self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class KeyPool:
+    """ Serves keys out of a large buffer of random bytes, which is refilled
+    from source (a function returning the given number of random bytes) once
+    it is used up. Keys longer than the buffer are fetched from the source
+    directly. The pool is thread-safe.
+
+    Example:
+    --------
+    >>> pool = KeyPool()
+    >>> key = pool.get(16)
+    >>> with PadStore('pad.bin') as store:
+    ...     key = store.pool().get(16)
+    """
+
+    def __init__(self, source=os.urandom, size=DEFAULT_POOL_SIZE):
+        self.source = source
+        self.size = size
+
+        self._buffer = b''
+        self._position = 0
+        self._lock = threading.Lock()
+
+    def get(self, length):
+        """ Returns the next length unused random bytes. Raises a ValueError
+        if length is negative.
+        """
+
+        if length < 0:
+            raise ValueError("the length must not be negative")
+
+        if length > self.size:
+            return bytes(self.source(length))
+
+        with self._lock:
+            if self._position + length > len(self._buffer):
+                # the rest of the old buffer is dropped, bytes are never served twice:
+                self._buffer, self._position = self.source(self.size), 0
+
+            key = bytes(self._buffer[self._position:self._position + length])
+            self._position += length
+
+        return key
+
+
+class TestPadStore(unittest.TestCase):
+    """ Some unittests for this package. """
+
+    def setUp(self):
+        import tempfile
+
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'pad.bin')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_take(self):
+        """ Tests that slices don't overlap and the offset persists. """
+
+        with PadStore.create(self.path, 1000, block_size=64) as store:
+            offset_a, a = store.take(300)
+            offset_b, b = store.take(300)
+
+            self.assertEqual((offset_a, offset_b), (0, 300))
+            self.assertEqual(bytes(b), bytes(store.read(300, 300)))
+            self.assertRaises(PadExhausted, store.take, 401)
+            self.assertRaises(ValueError, store.reserve, -40)
+            self.assertEqual(store.offset, 600)
+
+            a.release()
+            b.release()
+
+        with open(self.path, 'rb') as f:
+            content = f.read()
+
+        with PadStore(self.path) as store:
+            self.assertEqual(store.remaining, 400)
+
+            offset, c = store.take(400)
+            self.assertEqual(bytes(c), content[600:])
+            c.release()
+
+    def test_processes(self):
+        """ Tests that concurrent processes never get the same bytes. """
+
+        import multiprocessing
+
+        PadStore.create(self.path, 4000).close()
+
+        with multiprocessing.Pool(4) as pool:
+            offsets = pool.starmap(_reserve, [(self.path, 10)] * 400)
+
+        self.assertEqual(sorted(offsets), list(range(0, 4000, 10)))
+
+    def test_key_pool(self):
+        """ Tests the pool and generate_key() with a pool. """
+
+        from classic.otp import generate_key
+
+        calls = []
+
+        def source(size):
+            calls.append(size)
+            return bytes(range(size))
+
+        pool = KeyPool(source, size=100)
+        keys = [pool.get(30) for _ in range(4)] + [pool.get(200)]
+
+        self.assertEqual(calls, [100, 100, 200])
+        self.assertEqual(keys[:4], [bytes(range(0, 30)), bytes(range(30, 60)), bytes(range(60, 90)), bytes(range(30))])
+        self.assertEqual(len(generate_key(b'message', KeyPool())), 7)
+        self.assertRaises(ValueError, pool.get, -10)
+
+        with PadStore.create(self.path, 1000) as store:
+            pool = store.pool(100)
+            key = pool.get(10)
+
+            with store.read(0, 10) as expected:
+                self.assertEqual(key, bytes(expected))
+
+            self.assertEqual(store.offset, 100)
+
+        # the store is closed while the pool is still alive:
+        self.assertEqual(len(pool.get(90)), 90)
+
+
+def _reserve(path, length):
+    store = PadStore(path)
+
+    try:
+        return store.reserve(length)
+    finally:
+        store.close()
+
+
+def cli():
+    """ Provides a command line interface. Pass -h as argument to get some information.
+
+    Example:
+
+    $ python3 -m classic.padstore create pad.bin 1073741824
+    $ python3 -m classic.padstore take pad.bin 32 -o key.bin
+    [+] offset 0
+    $ python3 -m classic.padstore status pad.bin
+    """
+
+    parser = argparse.ArgumentParser(description='Tool to manage one-time pad files.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    create = commands.add_parser('create', help='create a new pad')
+    create.add_argument('path', help='path of the pad')
+    create.add_argument('size', type=int, help='size of the pad in bytes')
+
+    take = commands.add_parser('take', help='reserve the next bytes of a pad')
+    take.add_argument('path', help='path of the pad')
+    take.add_argument('length', type=int, help='number of bytes')
+    take.add_argument('--output', '-o', type=argparse.FileType('wb'), default=sys.stdout.buffer)
+
+    status = commands.add_parser('status', help='print the used and remaining bytes of a pad')
+    status.add_argument('path', help='path of the pad')
+
+    args = parser.parse_args()
+
+    if args.command == 'create':
+        PadStore.create(args.path, args.size).close()
+        return
+
+    with PadStore(args.path) as store:
+        if args.command == 'take':
+            offset, pad = store.take(args.length)
+            args.output.write(pad)
+            pad.release()
+
+            print(f"[+] offset {offset}", file=sys.stderr)
+        else:
+            print(f"[+] {store.offset} bytes used, {store.remaining} of {store.size} left")
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+
+""" The monoalphabetic substitution cipher replaces every symbol of the alphabet by the symbol at
+the same position of a permutation of the alphabet (the key). The caesar cipher is the special case
+where the permutation is restricted to a cyclic shift. With 26! possible keys a brute force attack
+is infeasible, but the cipher keeps the frequencies of the language, so it is easily broken by
+frequency analysis (see cryptanalysis/substitution_solver.py).
+"""
+
+
+import random
+import string
+import unittest
+
+from tools.convert import TranslationCipher
+
+
+class SubstitutionCipher(TranslationCipher):
+    """ Implementation of the monoalphabetic substitution cipher providing an encryption and a
+    decryption routine.
+
+    Example:
+    --------
+    >>> suite = SubstitutionCipher("QWERTYUIOPASDFGHJKLZXCVBNM")
+    >>> suite.encrypt("FOOBAR")
+    'YGGWQK'
+    >>> suite.decrypt("YGGWQK")
+    'FOOBAR'
+    """
+
+    def __init__(self, key, alphabet=string.ascii_uppercase):
+        """ key has to be a permutation of the alphabet: the i-th symbol of the alphabet is
+        encrypted to the i-th symbol of the key.
+        """
+
+        self.alphabet = alphabet
+        self.key = key
+
+    @classmethod
+    def random(cls, alphabet=string.ascii_uppercase, rng=random):
+        """ Returns a suite with a random key. """
+
+        return cls(''.join(rng.sample(alphabet, len(alphabet))), alphabet)
+
+    def _targets(self, key):
+        """ The i-th symbol of the alphabet is encrypted to key[i]. """
+
+        if len(set(self.alphabet)) != len(self.alphabet) or sorted(key) != sorted(self.alphabet):
+            raise ValueError("the key has to be a permutation of the alphabet")
+
+        return [self.alphabet.index(c) for c in key]
+
+    def encrypt(self, plaintext):
+        """ Encrypts a message (str or bytes-like object) and returns the ciphertext of the same
+        type. Symbols that are not part of the alphabet are passed through unchanged.
+        """
+
+        return self._translate(plaintext, self._encrypt_table, self._encrypt_bytes_table)
+
+    def decrypt(self, ciphertext):
+        """ Decrypts a message (str or bytes-like object) and returns the plaintext of the same
+        type. Symbols that are not part of the alphabet are passed through unchanged.
+        """
+
+        return self._translate(ciphertext, self._decrypt_table, self._decrypt_bytes_table)
+
+
+class TestSubstitutionSuite(unittest.TestCase):
+    """ Tests the implementation of the substitution cipher. """
+
+    def test_known_vectors(self):
+        """ Tests the substitution cipher implementation with a known test vector. """
+
+        suite = SubstitutionCipher("QWERTYUIOPASDFGHJKLZXCVBNM")
+
+        self.assertEqual(suite.encrypt("FOOBAR"), "YGGWQK")
+        self.assertEqual(suite.decrypt("YGGWQK"), "FOOBAR")
+        self.assertEqual(suite.encrypt(b"FOO BAR!"), b"YGG WQK!")
+
+    def test_random(self):
+        """ Tests the substitution cipher implementation using random keys. """
+
+        for _ in range(100):
+            suite = SubstitutionCipher.random(string.printable)
+            message = ''.join(random.choice(string.printable) for _ in range(random.randint(1, 100)))
+
+            self.assertEqual(suite.decrypt(suite.encrypt(message)), message)
+
+    def test_invalid_key(self):
+        """ Tests that keys which are no permutation are rejected. """
+
+        self.assertRaises(ValueError, SubstitutionCipher, "AABC", "ABCD")
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+
+""" The Vigenère cipher is a polyalphabetic substitution cipher: the symbol at position i of the
+message is encrypted by a caesar cipher whose key is the (i mod m)-th symbol of the key of length m.
+It was described by Giovan Battista Bellaso in 1553 and was considered unbreakable until the 19th
+century, when Charles Babbage and Friedrich Kasiski found ways to determine the length of the key.
+Once the length is known, every column of symbols encrypted with the same key symbol is a caesar
+ciphertext (see cryptanalysis/vigenere_cracker.py).
+"""
+
+
+import random
+import re
+import string
+import unittest
+
+
+class VigenereCipher:
+    """ Implementation of the Vigenère cipher providing an encryption and a decryption routine.
+
+    Symbols that are not part of the alphabet are passed through unchanged and don't consume a
+    symbol of the key.
+
+    Example:
+    --------
+    >>> suite = VigenereCipher("LEMON")
+    >>> suite.encrypt("ATTACK AT DAWN")
+    'LXFOPV EF RNHR'
+    >>> suite.decrypt("LXFOPV EF RNHR")
+    'ATTACK AT DAWN'
+    """
+
+    def __init__(self, key, alphabet=string.ascii_uppercase):
+        """ key has to be a non-empty string over the alphabet """
+
+        if not key or any(k not in alphabet for k in key):
+            raise ValueError("the key has to be a non-empty string over the alphabet")
+
+        self.alphabet = alphabet
+        self.key = key
+
+        # one caesar translation table per symbol of the key:
+        self._encrypt_tables = [self._shift_table(alphabet.index(k)) for k in key]
+        self._decrypt_tables = [self._shift_table(-alphabet.index(k)) for k in key]
+
+        self._non_alphabet = re.compile('[^' + re.escape(alphabet) + ']+')
+
+    def _shift_table(self, shift):
+        size = len(self.alphabet)
+        return str.maketrans({m: self.alphabet[(i + shift) % size] for i, m in enumerate(self.alphabet)})
+
+    def _translate(self, text, tables):
+        """ Applies the translation tables column by column on the symbols of the alphabet in
+        text and puts the symbols outside of the alphabet back in place.
+        """
+
+        symbols = self._non_alphabet.sub('', text)
+
+        # the column i holds every symbol encrypted by the i-th key symbol:
+        result = list(symbols)
+        for i, table in enumerate(tables):
+            result[i::len(tables)] = symbols[i::len(tables)].translate(table)
+
+        result = ''.join(result)
+
+        if len(result) == len(text):
+            return result
+
+        pieces, position, last = [], 0, 0
+
+        for match in self._non_alphabet.finditer(text):
+            length = match.start() - last
+
+            pieces.append(result[position:position + length])
+            pieces.append(match.group())
+
+            position, last = position + length, match.end()
+
+        pieces.append(result[position:])
+        return ''.join(pieces)
+
+    def encrypt(self, plaintext):
+        """ Encrypts a message using the Vigenère cipher and returns the corresponding ciphertext. """
+
+        return self._translate(plaintext, self._encrypt_tables)
+
+    def decrypt(self, ciphertext):
+        """ Decrypts a message using the Vigenère cipher and returns the corresponding plaintext. """
+
+        return self._translate(ciphertext, self._decrypt_tables)
+
+
+class TestVigenereSuite(unittest.TestCase):
+    """ Tests the implementation of the Vigenère cipher. """
+
+    def test_known_vectors(self):
+        """ Tests the Vigenère cipher implementation with well known test vectors. """
+
+        suite = VigenereCipher("LEMON")
+
+        self.assertEqual(suite.encrypt("ATTACKATDAWN"), "LXFOPVEFRNHR")
+        self.assertEqual(suite.encrypt("ATTACK AT DAWN!"), "LXFOPV EF RNHR!")
+        self.assertEqual(suite.decrypt("LXFOPV EF RNHR!"), "ATTACK AT DAWN!")
+
+    def test_random(self):
+        """ Tests the Vigenère cipher implementation using randomly generated values. """
+
+        for _ in range(100):
+            key = ''.join(random.choice(string.ascii_uppercase) for _ in range(random.randint(1, 20)))
+            message = ''.join(random.choice(string.printable) for _ in range(random.randint(0, 100)))
+
+            suite = VigenereCipher(key)
+            self.assertEqual(suite.decrypt(suite.encrypt(message)), message)
+
+
+def cli():
+    """ Provides a command line interface. Pass -h as argument to get some information.
+
+    Example:
+    --------
+    $ python3 vigenere.py -e LEMON "ATTACK AT DAWN"
+    LXFOPV EF RNHR
+    """
+
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='Tool to encrypt or decrypt messages using the Vigenère cipher.'
+    )
+
+    parser.add_argument('--decrypt', '-d', action='store_true', help='invoke the decryption routine')
+    parser.add_argument('--encrypt', '-e', action='store_true', help='invoke the encryption routine')
+
+    parser.add_argument(
+        '--alphabet', default=string.ascii_uppercase, help='define the alphabet, default is A-Z'
+    )
+
+    parser.add_argument('key', help='key to be used (string over the alphabet)')
+    parser.add_argument('text', help='text to encrypt or decrypt')
+
+    args = parser.parse_args()
+    suite = VigenereCipher(args.key, args.alphabet)
+
+    if args.encrypt:
+        print(suite.encrypt(args.text))
+    elif args.decrypt:
+        print(suite.decrypt(args.text))
+
+
+if __name__ == "__main__":
+    cli()
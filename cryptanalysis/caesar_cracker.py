@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+
+""" Recovers the key of caesar ciphertexts by frequency analysis.
+
+The ciphertext is counted once into a histogram over the alphabet. Every key k
+of the caesar cipher just rotates this histogram by k positions, so all keys can
+be scored by comparing the rotated histogram with the frequency table of the
+expected language. This makes cracking O(n + |A|^2) instead of decrypting and
+scoring the text for every single key in O(n * |A|).
+"""
+
+import argparse
+import concurrent.futures
+import functools
+import heapq
+import sys
+import unittest
+
+from classic.caesar import CaesarCipher
+from cryptanalysis.frequency import load_frequencies, histogram, SCORING_METHODS
+from tools import instrument
+
+
+def rank_keys(ciphertext, language='english', method='chi2', top=None):
+    """ Scores every key for the given ciphertext (str or bytes) and returns a
+    list of (key, score) tuples, best key first. If top is given, only the top
+    best candidates are returned.
+
+    Scoring ignores the case of the ciphertext and symbols outside of the
+    alphabet of the frequency table. The method is either 'chi2' or
+    'loglikelihood', for both a lower score is better.
+    """
+
+    table = load_frequencies(language)
+    alphabet = sorted(table)
+
+    with instrument.timer('caesar_cracker.histogram'):
+        counts = histogram(ciphertext.upper(), alphabet)
+
+    with instrument.timer('caesar_cracker.score'):
+        scores = SCORING_METHODS[method](counts, [table[s] for s in alphabet])
+
+    if top is None:
+        return sorted(enumerate(scores), key=lambda candidate: candidate[1])
+
+    return heapq.nsmallest(top, enumerate(scores), key=lambda candidate: candidate[1])
+
+
+def crack(ciphertext, language='english', method='chi2'):
+    """ Recovers the most likely key of the given ciphertext and returns the tuple
+    (key, plaintext). Like the scoring, the decryption ignores the case of the
+    ciphertext: the plaintext is decrypted from its uppercase over the alphabet
+    of the frequency table.
+    """
+
+    table = load_frequencies(language)
+    key, _ = rank_keys(ciphertext, language, method, top=1)[0]
+
+    return key, CaesarCipher(key, ''.join(sorted(table))).decrypt(ciphertext.upper())
+
+
+def rank_keys_batch(ciphertexts, language='english', method='chi2', top=3, workers=None):
+    """ Ranks the keys for many ciphertexts at once and returns a list with the
+    top best (key, score) candidates for every ciphertext (same order as the
+    passed ciphertexts).
+
+    If workers is given, the ciphertexts are distributed on a process pool of
+    this size. This pays off for many or long ciphertexts only.
+    """
+
+    rank = functools.partial(rank_keys, language=language, method=method, top=top)
+
+    if not workers:
+        return [rank(ciphertext) for ciphertext in ciphertexts]
+
+    ciphertexts = list(ciphertexts)
+    chunksize = max(1, len(ciphertexts) // (workers * 4))
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(rank, ciphertexts, chunksize=chunksize))
+
+
+class TestCaesarCracker(unittest.TestCase):
+    """ Some unittests for this package. """
+
+    plaintext = (
+        'THE CAESAR CIPHER IS ONE OF THE SIMPLEST AND MOST WIDELY KNOWN ENCRYPTION '
+        'TECHNIQUES. IT IS A TYPE OF SUBSTITUTION CIPHER IN WHICH EACH LETTER IN THE '
+        'PLAINTEXT IS REPLACED BY A LETTER SOME FIXED NUMBER OF POSITIONS DOWN THE ALPHABET.'
+    )
+
+    def test_crack(self):
+        """ Tests that the key of a shifted english text is recovered by both methods. """
+
+        for key in (0, 3, 13, 25):
+            ciphertext = CaesarCipher(key).encrypt(self.plaintext)
+
+            for method in ('chi2', 'loglikelihood'):
+                self.assertEqual(crack(ciphertext, method=method), (key, self.plaintext))
+
+    def test_lowercase(self):
+        """ Tests that lowercase ciphertexts are decrypted as well. """
+
+        ciphertext = CaesarCipher(3).encrypt(self.plaintext).lower()
+
+        self.assertEqual(crack(ciphertext), (3, self.plaintext))
+        self.assertEqual(crack(ciphertext.encode()), (3, self.plaintext.encode()))
+
+    def test_batch(self):
+        """ Tests the batch interface. """
+
+        ciphertexts = [CaesarCipher(key).encrypt(self.plaintext).encode() for key in range(26)]
+        ranking = rank_keys_batch(ciphertexts, top=2)
+
+        self.assertEqual([candidates[0][0] for candidates in ranking], list(range(26)))
+        self.assertTrue(all(len(candidates) == 2 for candidates in ranking))
+
+
+def cli():
+    """ Provides a command line interface. Pass -h as argument to get some information.
+
+    Example:
+
+    $ python3 -m cryptanalysis.caesar_cracker "WKLV LV D VHFUHW PHVVDJH"
+    3	THIS IS A SECRET MESSAGE
+
+    $ python3 -m cryptanalysis.caesar_cracker --top 3 -i ciphertexts.txt
+    """
+
+    parser = argparse.ArgumentParser(description='Tool to recover the key of caesar ciphertexts.')
+
+    parser.add_argument(
+        '--language', default='english', help='frequency table to score against (english, german)'
+    )
+
+    parser.add_argument('--method', choices=sorted(SCORING_METHODS), default='chi2')
+    parser.add_argument('--top', type=int, help='print the top best keys with their scores')
+    parser.add_argument('--workers', type=int, help='size of the process pool for --input')
+
+    parser.add_argument(
+        '--input', '-i', type=argparse.FileType('r'),
+        help='crack every line of this file ("-" for stdin)'
+    )
+
+    parser.add_argument('ciphertext', nargs='?', help='ciphertext to crack')
+    args = parser.parse_args()
+
+    if args.input is not None:
+        ciphertexts = [line.rstrip('\n') for line in args.input]
+    elif args.ciphertext is not None:
+        ciphertexts = [args.ciphertext]
+    else:
+        parser.error('either the ciphertext or --input is required')
+
+    ranking = rank_keys_batch(ciphertexts, args.language, args.method, args.top or 1, args.workers)
+
+    if args.top:
+        for candidates in ranking:
+            print('\t'.join(f'{key}:{score:.2f}' for key, score in candidates))
+        return
+
+    # decrypt like crack() does, with the best key of every ciphertext:
+    suite = CaesarCipher(0, ''.join(sorted(load_frequencies(args.language))))
+
+    for ciphertext, [(key, _)] in zip(ciphertexts, ranking):
+        suite.key = key
+        sys.stdout.write(f'{key}\t{suite.decrypt(ciphertext.upper())}\n')
+
+
+if __name__ == "__main__":
+    cli()
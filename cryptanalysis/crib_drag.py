@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+
+""" Crib dragging against many ciphertexts encrypted with the same one-time pad.
+
+If the keystream k is reused, every ciphertext c_i = p_i ^ k. Guessing a crib w
+(a likely plaintext fragment like " the ") at position j of the message i
+implies the key bytes k[j + t] = c_i[j + t] ^ w[t], which decrypt all other
+messages at the same position. The guess is scored by the likelihood of all
+these plaintext bytes.
+
+That likelihood decomposes into one term per column: decrypting the column j
+(the bytes at position j of all ciphertexts) with the key byte k scores
+S_j[k], which is computed for all 256 key bytes at once by the xor-convolution
+of repeating_xor.score_single_byte_keys(). The arg max of every column is the
+initial (statistical) guess of the keystream.
+
+The ciphertexts are stored as columns of an aligned matrix. Dragging a crib
+over a position then scores all messages at once: the column bytes are
+translated to the implied key bytes (xor table of the crib byte) and further
+to their quantized scores S_j (one byte each), and the per-byte scores of all
+messages are summed as 16 bit lanes packed into a single integer.
+
+Confirmed fragments set the key bytes of their positions, the keystream is
+refined incrementally and positions that are fully known are skipped by
+further drags.
+"""
+
+import argparse
+import array
+import collections
+import heapq
+import sys
+import unittest
+
+from classic.otp import xor
+from cryptanalysis.repeating_xor import WEIGHT_UNEXPECTED, byte_weights, score_single_byte_keys
+from tools import instrument
+
+
+Candidate = collections.namedtuple('Candidate', ['score', 'row', 'position', 'crib', 'key'])
+
+# the quantized scores of a crib are summed in 16 bit lanes:
+MAX_CRIB_LENGTH = 0xffff // 0xff
+
+# translation tables xoring every byte with the index of the table:
+_XOR_TABLES = [bytes(b ^ k for b in range(256)) for k in range(256)]
+
+
+class CribDragger:
+    """ Crib dragging engine for a set of ciphertexts sharing the keystream.
+
+    Example:
+    --------
+    >>> dragger = CribDragger(ciphertexts)
+    >>> best = dragger.drag([b' the ', b' and '], top=5)
+    >>> dragger.accept(best[0])
+    >>> dragger.plaintexts()
+    """
+
+    def __init__(self, ciphertexts, language='english'):
+        self.ciphertexts = [bytes(c) for c in ciphertexts]
+        self.length = max(map(len, self.ciphertexts), default=0)
+
+        weights = byte_weights(language)
+        self.low, self.high = WEIGHT_UNEXPECTED, max(weights)
+
+        # the rows are sorted by length (longest first), so the messages covering
+        # a column are a prefix of the column:
+        self.order = sorted(range(len(self.ciphertexts)), key=lambda i: -len(self.ciphertexts[i]))
+        matrix = b''.join(self.ciphertexts[i].ljust(self.length, b'\x00') for i in self.order)
+
+        self.columns = [matrix[j::self.length] for j in range(self.length)]
+        self.depth = [sum(1 for c in self.ciphertexts if len(c) > j) for j in range(self.length)]
+
+        # S_j for every column and its quantization to 0..255: the average score
+        # per message, where messages not covering the column count as unexpected
+        # bytes (so thinly covered columns can't outweigh the others):
+        self.fitness = [
+            score_single_byte_keys(column[:depth], language) for column, depth in zip(self.columns, self.depth)
+        ]
+
+        rows = len(self.ciphertexts)
+
+        self._quantized = [
+            bytes(self._quantize((score + (rows - depth) * self.low) / rows) for score in scores)
+            for scores, depth in zip(self.fitness, self.depth)
+        ]
+
+        self.keystream = bytearray(max(range(256), key=scores.__getitem__) for scores in self.fitness)
+        self.known = bytearray(self.length)
+
+    def _quantize(self, score):
+        return min(255, max(0, round(255 * (score - self.low) / (self.high - self.low))))
+
+    def _lanes(self, column, byte):
+        """ Returns the quantized scores of the key bytes implied by the crib byte
+        at the given column for all messages, packed as 16 bit lanes.
+        """
+
+        lanes = bytearray(2 * len(self.columns[column]))
+        lanes[0::2] = self.columns[column].translate(_XOR_TABLES[byte]).translate(self._quantized[column])
+
+        return int.from_bytes(lanes, 'little')
+
+    def drag(self, cribs, top=20):
+        """ Drags every crib (bytes or str) over all positions of all messages
+        and returns the top best candidates, best first. The score of a
+        candidate is the average log-likelihood per byte of all messages
+        decrypted by the implied key bytes (quantized, messages too short for
+        the position count as unexpected bytes). Raises a ValueError if top
+        is less than 1.
+        """
+
+        if top < 1:
+            raise ValueError("at least one candidate (top) has to be returned")
+
+        cribs = list(dict.fromkeys(crib.encode() if isinstance(crib, str) else bytes(crib) for crib in cribs))
+
+        if any(not crib or len(crib) > MAX_CRIB_LENGTH for crib in cribs):
+            raise ValueError(f"the cribs have to be 1 to {MAX_CRIB_LENGTH} bytes long")
+
+        best, rows = [], len(self.ciphertexts)
+        implied = set()
+
+        # lanes of the columns of the current window, dropped once the window passed them:
+        cache = collections.defaultdict(dict)
+
+        for position in range(self.length):
+            cache.pop(position - 1, None)
+
+            for crib in cribs:
+                end = position + len(crib)
+
+                if end > self.length or all(self.known[position:end]):
+                    continue
+
+                depth = self.depth[end - 1]
+                total = 0
+
+                for column, byte in enumerate(crib, position):
+                    lanes = cache[column].get(byte)
+
+                    if lanes is None:
+                        lanes = cache[column][byte] = self._lanes(column, byte)
+
+                    total += lanes
+
+                scores = array.array('H', total.to_bytes(2 * rows, 'little'))
+                if sys.byteorder == 'big':
+                    scores.byteswap()
+
+                scores = scores[:depth]
+                threshold = best[0][0] * len(crib) if len(best) == top else -1
+
+                if max(scores) <= threshold:
+                    continue
+
+                for index in heapq.nlargest(top, range(depth), key=scores.__getitem__):
+                    if scores[index] <= threshold:
+                        break
+
+                    # messages with the same ciphertext bytes imply the same key:
+                    row = self.order[index]
+                    implication = (position, xor(self.ciphertexts[row][position:end], crib))
+
+                    if implication in implied:
+                        continue
+
+                    implied.add(implication)
+                    candidate = (scores[index] / len(crib), row, position, crib)
+
+                    if len(best) < top:
+                        heapq.heappush(best, candidate)
+                    else:
+                        heapq.heappushpop(best, candidate)
+
+                    threshold = best[0][0] * len(crib) if len(best) == top else -1
+
+            if instrument.enabled:
+                instrument.count('crib_drag.positions')
+
+        return [self._candidate(*candidate) for candidate in sorted(best, reverse=True)]
+
+    def _candidate(self, score, row, position, crib):
+        key = xor(self.ciphertexts[row][position:position + len(crib)], crib)
+        return Candidate(self.low + score / 255 * (self.high - self.low), row, position, crib, key)
+
+    def confirm(self, row, position, plaintext):
+        """ Confirms that the message row holds plaintext (bytes or str) at the
+        given position and sets the implied key bytes.
+        """
+
+        if isinstance(plaintext, str):
+            plaintext = plaintext.encode()
+
+        end = position + len(plaintext)
+
+        if end > len(self.ciphertexts[row]):
+            raise ValueError("the plaintext exceeds the message")
+
+        self.keystream[position:end] = xor(self.ciphertexts[row][position:end], plaintext)
+        self.known[position:end] = b'\x01' * len(plaintext)
+
+    def accept(self, candidate):
+        """ Confirms the crib of the given candidate. """
+
+        self.confirm(candidate.row, candidate.position, candidate.crib)
+
+    def plaintexts(self):
+        """ Returns all messages decrypted by the current keystream (confirmed key
+        bytes and the statistical guess for all others).
+        """
+
+        return [xor(ciphertext, self.keystream) for ciphertext in self.ciphertexts]
+
+
+class TestCribDrag(unittest.TestCase):
+    """ Some unittests for this package. """
+
+    text = (
+        b"It was the best of times, it was the worst of times, it was the age of wisdom, "
+        b"it was the age of foolishness, it was the epoch of belief, it was the epoch of "
+        b"incredulity, it was the season of Light, it was the season of Darkness, it was "
+        b"the spring of hope, it was the winter of despair, we had everything before us, "
+        b"we had nothing before us, we were all going direct to Heaven, we were all going "
+        b"direct the other way - in short, the period was so far like the present period, "
+        b"that some of its noisiest authorities insisted on its being received, for good "
+        b"or for evil, in the superlative degree of comparison only."
+    )
+
+    def setUp(self):
+        import random
+
+        rng = random.Random(1)
+
+        # messages of 24 to 40 bytes, shifted against each other:
+        self.plaintexts = [self.text[i:i + rng.randint(24, 40)] for i in range(0, 500, 13)]
+        self.key = bytes(rng.getrandbits(8) for _ in range(40))
+        self.dragger = CribDragger([xor(p, self.key) for p in self.plaintexts])
+
+    def test_statistical_keystream(self):
+        """ Tests that the initial guess recovers most of the keystream. """
+
+        correct = sum(1 for a, b in zip(self.dragger.keystream, self.key) if a == b)
+        self.assertGreater(correct, 30)
+
+    def test_drag(self):
+        """ Tests that the best candidate of a crib implies the right key bytes. """
+
+        best = self.dragger.drag([b'the epoch', b'zzqxj'], top=5)
+
+        self.assertEqual(best[0].crib, b'the epoch')
+        self.assertEqual(best[0].key, self.key[best[0].position:best[0].position + 9])
+        self.assertEqual(self.plaintexts[best[0].row][best[0].position:best[0].position + 9], b'the epoch')
+        self.assertEqual(best, sorted(best, reverse=True))
+        self.assertRaises(ValueError, self.dragger.drag, [b'ab'], top=0)
+
+    def test_confirm(self):
+        """ Tests that confirmed fragments refine the keystream and are skipped. """
+
+        for row, plaintext in enumerate(self.plaintexts[:3]):
+            self.dragger.confirm(row, 0, plaintext)
+
+        length = max(map(len, self.plaintexts[:3]))
+
+        self.assertEqual(self.dragger.keystream[:length], self.key[:length])
+        self.assertEqual(self.dragger.plaintexts()[5][:length], self.plaintexts[5][:length])
+        self.assertTrue(all(c.position + len(c.crib) > length for c in self.dragger.drag([b' of '])))
+
+
+def cli():
+    """ Provides a command line interface. Pass -h as argument to get some information.
+
+    Example:
+
+    $ python3 -m cryptanalysis.crib_drag ciphertexts.txt --crib " the " --crib " and "
+    """
+
+    parser = argparse.ArgumentParser(description='Tool to drag cribs over ciphertexts sharing a one-time pad.')
+
+    parser.add_argument('ciphertexts', type=argparse.FileType('r'), help='file with one hex ciphertext per line')
+    parser.add_argument('--crib', action='append', default=[], help='crib to drag (repeatable)')
+    parser.add_argument('--cribs', type=argparse.FileType('rb'), help='file with one crib per line')
+    parser.add_argument('--confirm', action='append', default=[], metavar='ROW:POSITION:TEXT',
+                        help='known plaintext of a message (repeatable)')
+    parser.add_argument('--language', default='english', help='language of the plaintexts')
+    parser.add_argument('--top', type=int, default=20, help='number of candidates to print')
+
+    args = parser.parse_args()
+
+    dragger = CribDragger(
+        [bytes.fromhex(line) for line in (line.strip() for line in args.ciphertexts) if line], args.language
+    )
+
+    for confirmation in args.confirm:
+        row, position, text = confirmation.split(':', 2)
+        dragger.confirm(int(row), int(position), text)
+
+    cribs = [crib.encode() for crib in args.crib]
+    if args.cribs is not None:
+        cribs += [line.rstrip(b'\r\n') for line in args.cribs if line.rstrip(b'\r\n')]
+
+    if cribs:
+        try:
+            candidates = dragger.drag(cribs, args.top)
+        except ValueError as error:
+            parser.error(str(error))
+
+        for candidate in candidates:
+            print(f"{candidate.score:8.3f}  row {candidate.row:>4}  position {candidate.position:>5}  "
+                  f"{candidate.crib!r}  key {candidate.key.hex()}")
+
+    for row, plaintext in enumerate(dragger.plaintexts()):
+        print(f"{row:>4}  {''.join(chr(b) if 0x20 <= b < 0x7f else '.' for b in plaintext)}")
+
+
+if __name__ == "__main__":
+    cli()
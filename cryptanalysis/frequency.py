@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+
+""" Helpers to work with the symbol frequencies of natural languages.
+
+The frequency tables are shipped as JSON files in the frequencies directory next
+to this module. Each table maps the symbols of the alphabet (A-Z) to their
+probability in the corresponding language.
+"""
+
+import functools
+import json
+import math
+import os
+import unittest
+
+from tools.convert import Alphabet, get_alphabet
+
+
+FREQUENCIES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'frequencies')
+
+# probability that is assumed for symbols of the alphabet missing in a table:
+PROBABILITY_FLOOR = 1e-6
+
+
+@functools.lru_cache(maxsize=None)
+def load_frequencies(language='english'):
+    """ Loads and returns the frequency table (dict: symbol -> probability) of the
+    given language. The tables are cached, so the returned dict must not be modified.
+    """
+
+    with open(os.path.join(FREQUENCIES_DIR, language + '.json')) as table:
+        return json.load(table)
+
+
+def histogram(text, alphabet):
+    """ Counts the symbols of the alphabet (symbols or Alphabet codec) in the
+    given text (str or bytes) and returns the counts as list ordered like the
+    alphabet.
+    """
+
+    if not isinstance(alphabet, Alphabet):
+        alphabet = get_alphabet(''.join(alphabet))
+
+    return alphabet.histogram(text)
+
+
+def chi_squared_shifts(counts, probabilities):
+    """ Returns the chi-squared statistic for every cyclic shift of the given
+    histogram against the expected probabilities (both ordered like the alphabet).
+
+    The score at index s compares the observed count of the symbol i + s with the
+    expected count of the symbol i, so s is the shift that was applied to text
+    having the expected distribution. The lower the score, the better the fit.
+    """
+
+    size, total = len(counts), sum(counts)
+    expected = [max(p, PROBABILITY_FLOOR) * total for p in probabilities]
+
+    if not total:
+        return [0.0] * size
+
+    return [
+        sum((counts[(i + s) % size] - e) ** 2 / e for i, e in enumerate(expected))
+        for s in range(size)
+    ]
+
+
+def log_likelihood_shifts(counts, probabilities):
+    """ Returns the negative log-likelihood of every cyclic shift of the given
+    histogram under the expected probabilities. The indexing is the same as for
+    chi_squared_shifts() and again the lower the score, the better the fit.
+    """
+
+    size = len(counts)
+    logs = [math.log(max(p, PROBABILITY_FLOOR)) for p in probabilities]
+
+    return [-sum(counts[(i + s) % size] * l for i, l in enumerate(logs)) for s in range(size)]
+
+
+SCORING_METHODS = {
+    'chi2': chi_squared_shifts,
+    'loglikelihood': log_likelihood_shifts,
+}
+
+
+class TestFrequency(unittest.TestCase):
+    """ Some unittests for this package. """
+
+    def test_tables(self):
+        """ Tests that all shipped tables are (roughly) probability distributions. """
+
+        for language in ('english', 'german'):
+            table = load_frequencies(language)
+
+            self.assertEqual(len(table), 26)
+            self.assertAlmostEqual(sum(table.values()), 1.0, places=2)
+
+    def test_shifts(self):
+        """ Tests that the best shift of a shifted histogram is found by both methods. """
+
+        probabilities = [0.5, 0.3, 0.2]
+        counts = histogram(b'CCCCCAAABB', 'ABC')
+
+        self.assertEqual(counts, [3, 2, 5])
+
+        for method in SCORING_METHODS.values():
+            scores = method(counts, probabilities)
+            self.assertEqual(scores.index(min(scores)), 2)
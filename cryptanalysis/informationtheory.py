@@ -6,7 +6,14 @@ Hint: It is highly recommended for computer scientists to read at least one of
 the great books about information and coding theory.
 """
 
+import array
+import collections
 import math
+import mmap
+import os
+import unittest
+
+from tools import instrument
 
 def compute_information_content(probability, log_base=2):
     """ Computes and returns the value of the information content for the event
@@ -43,3 +50,232 @@ def compute_redundancy(alphabet, entropy, log_base):
     """
 
     return 1 - (entropy / math.log(len(alphabet), log_base))
+
+
+def _clogc_table(size, log_base):
+    """ Returns the list of c * log(c) for c = 0..size (with 0 * log(0) = 0). """
+
+    return [0.0] + [c * math.log(c, log_base) for c in range(1, size + 1)]
+
+
+class _CLogC(dict):
+    """ Lazily filled mapping c -> c * log(c), sparse for large counts. """
+
+    def __init__(self, log_base):
+        super().__init__({0: 0.0})
+        self.log_base = log_base
+
+    def __missing__(self, c):
+        value = self[c] = c * math.log(c, self.log_base)
+        return value
+
+
+def entropy_from_counts(counts, log_base=2):
+    """ Computes and returns the entropy of the empirical distribution given by
+    the passed counts (iterable of ints), e.g. the histogram of some data.
+    """
+
+    counts = [c for c in counts if c]
+    total = sum(counts)
+
+    if not total:
+        return 0.0
+
+    return compute_entropy({i: c / total for i, c in enumerate(counts)},
+                           lambda p: compute_information_content(p, log_base))
+
+
+def compute_entropies(histograms, log_base=2):
+    """ Computes the entropies of many distributions given by their histograms
+    (sequences of counts) at once and returns them as array of doubles.
+
+    With N = sum(c) the entropy is log(N) - sum(c * log(c)) / N, so every
+    distinct count needs only one logarithm for all histograms (the memory
+    depends on the number of distinct counts, not on their size).
+    """
+
+    histograms = [list(h) for h in histograms]
+    totals = [sum(h) for h in histograms]
+    table = _CLogC(log_base)
+
+    return array.array('d', (
+        math.log(total, log_base) - sum(map(table.__getitem__, h)) / total if total else 0.0
+        for h, total in zip(histograms, totals)
+    ))
+
+
+class ByteEntropyEstimator:
+    """ Incremental estimator of the entropy (per byte) of a stream of data.
+
+    Example:
+    --------
+    >>> estimator = ByteEntropyEstimator()
+    >>> estimator.update(b'ABAB')
+    >>> estimator.update(b'CD')
+    >>> estimator.entropy()
+    1.9182958340544893
+    """
+
+    def __init__(self):
+        self.counts = [0] * 256
+        self.total = 0
+
+    def update(self, chunk):
+        """ Adds the bytes of the given chunk to the histogram. """
+
+        for b, c in collections.Counter(bytes(chunk)).items():
+            self.counts[b] += c
+
+        self.total += len(chunk)
+
+    def entropy(self, log_base=2):
+        """ Returns the entropy of the bytes seen so far. """
+
+        return entropy_from_counts(self.counts, log_base)
+
+
+def _check_window(window, step):
+    if window < 1 or (step is not None and step < 1):
+        raise ValueError("the window and the step have to be at least 1 byte")
+
+
+def sliding_window_entropy(data, window=4096, step=None, log_base=2):
+    """ Computes the entropy of every window of the given bytes-like object and
+    returns the entropies as array of doubles (one per window starting at 0,
+    step, 2 * step, ... as long as the window fits into data).
+
+    The counts and the sum of c * log(c) are rolled from window to window, so
+    only the bytes leaving and entering the window are looked at. Raises a
+    ValueError if the window or the step is less than 1.
+    """
+
+    step = window if step is None else step
+    _check_window(window, step)
+
+    windows = (len(data) - window) // step + 1 if len(data) >= window else 0
+    entropies = array.array('d')
+
+    if instrument.enabled:
+        instrument.count('entropy.windows', windows)
+
+    table = _clogc_table(window, log_base)
+    log_window = math.log(window, log_base)
+    counts = [0] * 256
+    clogc = 0.0
+
+    for i in range(windows):
+        start = i * step
+
+        if i == 0 or step >= window:
+            # no overlap with the previous window, count it from scratch:
+            delta = collections.Counter(data[start:start + window])
+            counts, clogc = [0] * 256, 0.0
+        else:
+            delta = collections.Counter(data[start + window - step:start + window])
+            delta.subtract(data[start - step:start])
+
+        for b, c in delta.items():
+            if c:
+                clogc += table[counts[b] + c] - table[counts[b]]
+                counts[b] += c
+
+        entropies.append(log_window - clogc / window)
+
+    return entropies
+
+
+def scan_file(path, window=4096, step=None, log_base=2):
+    """ Memory-maps the file at the given path and returns its sliding window
+    entropies (see sliding_window_entropy()). High entropies indicate encrypted
+    or compressed regions.
+    """
+
+    _check_window(window, step)
+
+    with open(path, 'rb') as f:
+        # mmap refuses to map empty files:
+        if not os.fstat(f.fileno()).st_size:
+            return array.array('d')
+
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            return sliding_window_entropy(mapped, window, step, log_base)
+
+
+class TestInformationTheory(unittest.TestCase):
+    """ Some unittests for this package. """
+
+    def test_entropy(self):
+        """ Tests the entropy of some well known distributions. """
+
+        self.assertAlmostEqual(compute_entropy({'a': 0.5, 'b': 0.5}), 1.0)
+        self.assertAlmostEqual(entropy_from_counts([1] * 256), 8.0)
+        self.assertEqual(entropy_from_counts([0, 10]), 0.0)
+
+        entropies = compute_entropies([[1, 1], [5, 0, 5], [1, 1, 1, 1], [], [1 << 40, 1 << 40]])
+        self.assertEqual([round(e, 6) for e in entropies], [1.0, 1.0, 2.0, 0.0, 1.0])
+
+    def test_estimator(self):
+        """ Tests that the incremental estimator doesn't depend on the chunks. """
+
+        data = os.urandom(1000) + b'A' * 1000
+
+        estimator = ByteEntropyEstimator()
+        for i in range(0, len(data), 300):
+            estimator.update(data[i:i + 300])
+
+        self.assertAlmostEqual(estimator.entropy(), entropy_from_counts(collections.Counter(data).values()))
+
+    def test_sliding_window(self):
+        """ Tests the rolling window entropies against counting every window. """
+
+        data = os.urandom(500) + b'AB' * 500 + os.urandom(500)
+
+        for window, step in ((256, 256), (256, 64), (100, 1), (64, 100)):
+            expected = [
+                entropy_from_counts(collections.Counter(data[i:i + window]).values())
+                for i in range(0, len(data) - window + 1, step)
+            ]
+
+            entropies = sliding_window_entropy(data, window, step)
+            self.assertEqual(len(entropies), len(expected))
+
+            for entropy, expected_entropy in zip(entropies, expected):
+                self.assertAlmostEqual(entropy, expected_entropy)
+
+        self.assertRaises(ValueError, sliding_window_entropy, data, 0)
+        self.assertRaises(ValueError, sliding_window_entropy, data, 16, 0)
+
+
+def cli():
+    """ Provides a command line interface: prints the offset and the entropy of
+    every window of the given file (only the ones above --threshold if given).
+
+    Example:
+
+    $ python3 -m cryptanalysis.informationtheory --window 4096 --threshold 7.5 disk.img
+    """
+
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Sliding window entropy scan of a file.')
+
+    parser.add_argument('path', help='file to scan')
+    parser.add_argument('--window', type=int, default=4096, help='size of a window in bytes')
+    parser.add_argument('--step', type=int, help='distance of the windows (default: window size)')
+    parser.add_argument('--threshold', type=float, help='print only windows above this entropy')
+
+    args = parser.parse_args()
+    step = args.window if args.step is None else args.step
+
+    try:
+        entropies = scan_file(args.path, args.window, step)
+    except ValueError as error:
+        parser.error(str(error))
+
+    for i, entropy in enumerate(entropies):
+        if args.threshold is None or entropy > args.threshold:
+            print(i * step, f'{entropy:.4f}', sep='\t')
+
+
+if __name__ == "__main__":
+    cli()
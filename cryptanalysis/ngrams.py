@@ -0,0 +1,393 @@
+#!/usr/bin/env python3
+
+""" N-gram models of natural languages in a compact binary format.
+
+A model of order n stores the log10-probability of every n-gram over the
+alphabet A-Z in a dense array, the n-gram is the index into it (read as number
+to the base 26). So scoring a text needs one array lookup per n-gram.
+
+File format (little endian):
+
+    magic b'NGRM', version (B), order n (B), alphabet size (B), padding (B),
+    floor (f), alphabet (ascii), 26^n log10-probabilities (f)
+
+The files are memory-mapped when loaded, so loading is a matter of
+milliseconds even for quadgrams. Models are built from text corpora of any
+size which are streamed and counted in chunks on a process pool.
+"""
+
+import argparse
+import array
+import collections
+import concurrent.futures
+import functools
+import math
+import mmap
+import os
+import re
+import string
+import struct
+import sys
+import unittest
+
+from cryptanalysis.frequency import FREQUENCIES_DIR, load_frequencies
+from tools.convert import get_alphabet
+
+
+ALPHABET = string.ascii_uppercase
+MAX_ORDER = 4
+
+MAGIC, VERSION = b'NGRM', 1
+HEADER = struct.Struct('<4sBBBxf')
+
+# number of characters of a corpus that are read and counted at once:
+DEFAULT_CHUNK_SIZE = 1 << 22
+
+_NON_ALPHABET = re.compile('[^A-Z]+')
+_CODEC = get_alphabet(ALPHABET)
+
+
+def normalize(text):
+    """ Returns the text in uppercase with all symbols outside of A-Z removed. """
+
+    return _NON_ALPHABET.sub('', text.upper())
+
+
+def to_indexes(text):
+    """ Returns the indexes of the symbols of the normalized text as bytes. """
+
+    return _CODEC.encode(text, 'skip')
+
+
+class NGramModel:
+    """ Log10-probabilities of all n-grams of the given order over ALPHABET.
+
+    The table is any sequence of floats of length 26^n (an array, or a
+    memoryview of a memory-mapped file). N-grams that didn't occur in the
+    corpus have the probability of the floor.
+    """
+
+    def __init__(self, order, table, floor, alphabet=ALPHABET, path=None):
+        self.order = order
+        self.table = table
+        self.floor = floor
+        self.alphabet = alphabet
+        self.path = path
+
+    def __reduce__(self):
+        # memory-mapped models are pickled by their path (e.g. to pass them to a process pool):
+        if self.path is not None:
+            return load_model, (self.path,)
+
+        return NGramModel, (self.order, self.table, self.floor, self.alphabet)
+
+    @classmethod
+    def from_counts(cls, order, counts):
+        """ Returns the model for the given Counter of n-grams (str) of the order.
+        Raises a ValueError if there are no n-grams to build the model of.
+        """
+
+        total = sum(counts.values())
+
+        if not total:
+            raise ValueError(f"no {order}-grams counted, the corpus is empty or too short")
+        floor = math.log10(0.01 / total)
+
+        table = array.array('f', [floor]) * len(ALPHABET) ** order
+
+        for gram, count in counts.items():
+            table[cls.index(gram)] = math.log10(count / total)
+
+        return cls(order, table, floor)
+
+    @classmethod
+    def from_unigrams(cls, language='english'):
+        """ Returns the unigram model of the frequency table of the given language. """
+
+        table = load_frequencies(language)
+        return cls.from_counts(1, collections.Counter({s: p * 1e6 for s, p in table.items()}))
+
+    @staticmethod
+    def index(gram):
+        """ Returns the index of the given n-gram (str over ALPHABET) into the table. """
+
+        index = 0
+
+        for i in to_indexes(gram):
+            index = index * len(ALPHABET) + i
+
+        return index
+
+    def __getitem__(self, gram):
+        return self.table[self.index(gram)]
+
+    def score_indexes(self, indexes):
+        """ Returns the log10-probability of a text given by its symbol indexes. """
+
+        size, table = len(ALPHABET), self.table
+        modulus = size ** self.order
+
+        index, score = 0, 0.0
+
+        for i, symbol in enumerate(indexes):
+            index = (index * size + symbol) % modulus
+
+            if i >= self.order - 1:
+                score += table[index]
+
+        return score
+
+    def score(self, text):
+        """ Returns the log10-probability of the given text (normalized before). """
+
+        return self.score_indexes(to_indexes(normalize(text)))
+
+    def save(self, path):
+        """ Writes the model in the binary format to the given path. """
+
+        table = array.array('f', self.table)
+        if sys.byteorder != 'little':
+            table.byteswap()
+
+        with open(path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, VERSION, self.order, len(self.alphabet), self.floor))
+            f.write(self.alphabet.encode('ascii'))
+            table.tofile(f)
+
+
+@functools.lru_cache(maxsize=None)
+def load_model(path):
+    """ Loads (memory-maps) the model at the given path. Models are cached, so
+    loading the same path again is free.
+    """
+
+    with open(path, 'rb') as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    magic, version, order, size, floor = HEADER.unpack_from(mapped)
+
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"{path} is not an n-gram model of version {VERSION}")
+
+    alphabet = mapped[HEADER.size:HEADER.size + size].decode('ascii')
+    table = memoryview(mapped)[HEADER.size + size:].cast('f')
+
+    if len(table) != size ** order:
+        raise ValueError(f"{path} is truncated")
+
+    # the table is stored little endian, on other machines it has to be converted:
+    if sys.byteorder != 'little':
+        table = array.array('f', table)
+        table.byteswap()
+
+    return NGramModel(order, table, floor, alphabet, path)
+
+
+def model_path(language, order):
+    """ Returns the path of the model of the given language and order next to
+    the frequency tables.
+    """
+
+    return os.path.join(FREQUENCIES_DIR, f'{language}.{order}gram')
+
+
+def load_language_model(language='english', order=MAX_ORDER):
+    """ Loads the model of the given language and order. For unigrams the
+    frequency table is used if no model was built.
+    """
+
+    path = model_path(language, order)
+
+    if order == 1 and not os.path.exists(path):
+        return NGramModel.from_unigrams(language)
+
+    return load_model(path)
+
+
+def count_chunk(text, skip, orders):
+    """ Counts the n-grams of all orders in the normalized text. The first skip
+    symbols are the tail of the previous chunk, only n-grams reaching into the
+    new symbols are counted. Returns the list of Counters (one per order).
+    """
+
+    return [
+        collections.Counter(text[i:i + n] for i in range(max(0, skip - n + 1), len(text) - n + 1))
+        for n in orders
+    ]
+
+
+def read_corpus(paths, chunk_size=DEFAULT_CHUNK_SIZE, overlap=MAX_ORDER - 1):
+    """ Streams the given text files and yields the tuples (normalized chunk,
+    number of symbols carried over from the previous chunk of the same file).
+    """
+
+    for path in paths:
+        # n-grams don't span two files:
+        tail = ''
+
+        with open(path, errors='replace') as f:
+            for chunk in iter(lambda: f.read(chunk_size), ''):
+                text = tail + normalize(chunk)
+
+                yield text, len(tail)
+                tail = text[-overlap:] if overlap else ''
+
+
+def count_corpus(paths, orders=range(1, MAX_ORDER + 1), workers=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """ Counts the n-grams of all orders in the given text files and returns a
+    dict mapping every order to its Counter.
+
+    The files are read in chunks, if workers is given the chunks are counted on
+    a process pool (map) and merged afterwards (reduce). At most two chunks per
+    worker are pending, so the memory usage doesn't depend on the corpus size.
+    """
+
+    orders = list(orders)
+    totals = {n: collections.Counter() for n in orders}
+    chunks = read_corpus(paths, chunk_size, max(orders) - 1)
+
+    def merge(counts):
+        for n, counter in zip(orders, counts):
+            totals[n].update(counter)
+
+    if not workers:
+        for text, skip in chunks:
+            merge(count_chunk(text, skip, orders))
+        return totals
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+
+        for text, skip in chunks:
+            pending.add(pool.submit(count_chunk, text, skip, orders))
+
+            if len(pending) >= 2 * workers:
+                done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    merge(future.result())
+
+        for future in concurrent.futures.as_completed(pending):
+            merge(future.result())
+
+    return totals
+
+
+def build(paths, output, orders=range(1, MAX_ORDER + 1), workers=None):
+    """ Builds the models of all orders of the given corpus and saves them to
+    <output>.<n>gram. Returns the list of written paths.
+    """
+
+    written = []
+
+    for order, counts in count_corpus(paths, orders, workers).items():
+        path = f'{output}.{order}gram'
+
+        NGramModel.from_counts(order, counts).save(path)
+        written.append(path)
+
+    return written
+
+
+class TestNGrams(unittest.TestCase):
+    """ Some unittests for this package. """
+
+    corpus = (
+        "It is a truth universally acknowledged, that a single man in possession of a good "
+        "fortune, must be in want of a wife. However little known the feelings or views of "
+        "such a man may be on his first entering a neighbourhood, this truth is so well fixed "
+        "in the minds of the surrounding families, that he is considered as the rightful "
+        "property of some one or other of their daughters."
+    )
+
+    def test_counting(self):
+        """ Tests that chunked counting equals counting the whole text. """
+
+        import tempfile
+
+        text = normalize(self.corpus)
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'corpus.txt')
+            with open(path, 'w') as f:
+                f.write(self.corpus)
+
+            for workers in (None, 2):
+                totals = count_corpus([path], workers=workers, chunk_size=37)
+
+                for n, counts in totals.items():
+                    self.assertEqual(counts, collections.Counter(text[i:i + n] for i in range(len(text) - n + 1)))
+
+            other = os.path.join(directory, 'other.txt')
+            with open(other, 'w') as f:
+                f.write('zq')
+
+            totals = count_corpus([path, other], orders=[2], chunk_size=37)
+            self.assertEqual(totals[2]['ZQ'], 1)
+            # the bigrams of the corpus and ZQ, but none spanning both files:
+            self.assertEqual(sum(totals[2].values()), len(text))
+
+        self.assertRaises(ValueError, NGramModel.from_counts, 2, collections.Counter())
+
+    def test_model(self):
+        """ Tests saving, loading and scoring of a model. """
+
+        import pickle
+        import tempfile
+
+        text = normalize(self.corpus)
+        counts = collections.Counter(text[i:i + 2] for i in range(len(text) - 1))
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'model.2gram')
+            NGramModel.from_counts(2, counts).save(path)
+
+            model = load_model(path)
+            self.assertIs(load_model(path), model)
+
+            self.assertAlmostEqual(model['TH'], math.log10(counts['TH'] / sum(counts.values())), places=5)
+            self.assertAlmostEqual(model['QX'], model.floor, places=5)
+            self.assertGreater(model.score('the truth'), model.score('xqz jvkpw'))
+            self.assertIs(pickle.loads(pickle.dumps(model)), model)
+
+            load_model.cache_clear()
+
+        self.assertAlmostEqual(NGramModel.from_unigrams()['E'], math.log10(0.127), places=2)
+
+
+def cli():
+    """ Provides a command line interface. Pass -h as argument to get some information.
+
+    Example:
+
+    $ python3 -m cryptanalysis.ngrams build --workers 4 --output cryptanalysis/frequencies/english corpus/*.txt
+    $ python3 -m cryptanalysis.ngrams score --order 4 "ATTACK AT DAWN"
+    """
+
+    parser = argparse.ArgumentParser(description='Tool to build and use n-gram models.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build_parser = subparsers.add_parser('build', help='build the models of a text corpus')
+    build_parser.add_argument('corpus', nargs='+', help='text files of the corpus')
+    build_parser.add_argument('--output', required=True, help='writes the models to <output>.<n>gram')
+    build_parser.add_argument('--orders', type=int, nargs='+', default=list(range(1, MAX_ORDER + 1)))
+    build_parser.add_argument('--workers', type=int, help='count on a process pool of this size')
+
+    score_parser = subparsers.add_parser('score', help='score a text with a model')
+    score_parser.add_argument('text')
+    score_parser.add_argument('--language', default='english')
+    score_parser.add_argument('--order', type=int, default=MAX_ORDER)
+
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        try:
+            for path in build(args.corpus, args.output, args.orders, args.workers):
+                print("[+] written", path)
+        except ValueError as error:
+            parser.error(str(error))
+    else:
+        print(load_language_model(args.language, args.order).score(args.text))
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+
+""" Breaks repeating-key xor (vigenere over bytes) ciphertexts of natural language.
+
+The attack works in two steps:
+
+1. The key size is estimated by the normalized hamming distance of consecutive
+   blocks of the ciphertext. For the right key size the blocks are xored with
+   the same key, so their distance is the distance of the plaintext blocks
+   which is lower than the one of random bytes.
+2. The ciphertext is transposed into one column per key byte. Each column is a
+   single-byte xor ciphertext which is solved by frequency analysis.
+
+Scoring a column for all 256 key bytes at once is a xor-convolution of the
+byte histogram of the column with the weights of the plaintext bytes. This is
+computed by Walsh-Hadamard transforms in O(256 log 256) per column, no matter
+how long the column is.
+"""
+
+import argparse
+import collections
+import concurrent.futures
+import functools
+import math
+import unittest
+
+from classic.otp import xor
+from cryptanalysis.frequency import load_frequencies
+from tools import instrument
+from tools.hamming import hamming
+
+
+# rough share of symbol classes in english text; the letters are split by the frequency table:
+SHARE_LETTERS, SHARE_SPACE, SHARE_PUNCTUATION, SHARE_WHITESPACE = 0.76, 0.17, 0.06, 0.01
+SHARE_UPPERCASE = 0.05
+
+# log weight of a plaintext byte that is not expected in text at all:
+WEIGHT_UNEXPECTED = math.log(1e-6)
+
+
+def walsh_hadamard(vector):
+    """ Returns the (unnormalized) Walsh-Hadamard transform of the given vector.
+    The length of the vector has to be a power of two. Applying the transform
+    twice yields the vector multiplied by its length.
+    """
+
+    vector = list(vector)
+    h = 1
+
+    while h < len(vector):
+        for i in range(0, len(vector), 2 * h):
+            for j in range(i, i + h):
+                x, y = vector[j], vector[j + h]
+                vector[j], vector[j + h] = x + y, x - y
+        h *= 2
+
+    return vector
+
+
+@functools.lru_cache(maxsize=None)
+def byte_weights(language='english'):
+    """ Returns a list of 256 log-probabilities of plaintext bytes in text of the
+    given language (ASCII encoded).
+    """
+
+    table = load_frequencies(language)
+    weights = [WEIGHT_UNEXPECTED] * 256
+
+    punctuation = [c for c in range(0x21, 0x7f) if not chr(c).isalpha()]
+    for c in punctuation:
+        weights[c] = math.log(SHARE_PUNCTUATION / len(punctuation))
+
+    for c in b'\t\n\r':
+        weights[c] = math.log(SHARE_WHITESPACE / 3)
+
+    weights[ord(' ')] = math.log(SHARE_SPACE)
+
+    for symbol, p in table.items():
+        weights[ord(symbol.upper())] = math.log(SHARE_LETTERS * SHARE_UPPERCASE * p)
+        weights[ord(symbol.lower())] = math.log(SHARE_LETTERS * (1 - SHARE_UPPERCASE) * p)
+
+    return weights
+
+
+@functools.lru_cache(maxsize=None)
+def _transformed_weights(language):
+    return walsh_hadamard(byte_weights(language))
+
+
+def score_single_byte_keys(column, language='english'):
+    """ Returns the log-likelihood score of the plaintext for every key byte
+    0..255 of the given single-byte xor ciphertext. A higher score is better.
+    """
+
+    counts = collections.Counter(column)
+    histogram = walsh_hadamard([counts[b] for b in range(256)])
+
+    transformed = [x * y for x, y in zip(histogram, _transformed_weights(language))]
+    return [score / 256 for score in walsh_hadamard(transformed)]
+
+
+def break_single_byte_xor(column, language='english'):
+    """ Returns the tuple (key byte, score) of the most likely key of the given
+    single-byte xor ciphertext.
+    """
+
+    scores = score_single_byte_keys(column, language)
+    key = max(range(256), key=scores.__getitem__)
+
+    return key, scores[key]
+
+
+def rank_keysizes(ciphertext, max_keysize=40, max_blocks=64):
+    """ Ranks the key sizes 1..max_keysize by their normalized hamming distance
+    (averaged over up to max_blocks consecutive block pairs) and returns a list
+    of (keysize, distance) tuples, most likely key size first.
+    """
+
+    ranking = []
+
+    for keysize in range(1, min(max_keysize, len(ciphertext) // 2) + 1):
+        blocks = [
+            ciphertext[i:i + keysize]
+            for i in range(0, min(len(ciphertext) - keysize + 1, max_blocks * keysize), keysize)
+        ]
+
+        distances = [hamming(a, b) for a, b in zip(blocks, blocks[1:])]
+        ranking.append((keysize, sum(distances) / (len(distances) * keysize)))
+
+    return sorted(ranking, key=lambda candidate: candidate[1])
+
+
+def break_with_keysize(ciphertext, keysize, language='english'):
+    """ Recovers the key for the given key size and returns the tuple (key,
+    score) where the score is the average log-likelihood per plaintext byte.
+    """
+
+    key, score = bytearray(), 0.0
+
+    for i in range(keysize):
+        column = ciphertext[i::keysize]
+        key_byte, column_score = break_single_byte_xor(column, language)
+
+        key.append(key_byte)
+        score += column_score
+
+    return bytes(key), score / len(ciphertext)
+
+
+def repeat_key(key, length):
+    """ Returns the key repeated to the given length. """
+
+    return (key * (length // len(key) + 1))[:length]
+
+
+def break_repeating_xor(ciphertext, language='english', max_keysize=40, candidates=3, workers=None):
+    """ Breaks the given repeating-key xor ciphertext and returns the tuple (key,
+    plaintext).
+
+    The candidates best key sizes of the hamming ranking are solved and the one
+    with the most likely plaintext wins. Multiples of the real key size solve as
+    well, so the shortest period of the winning key is returned. If workers is
+    given, the candidate key sizes are solved on a process pool of this size.
+    Raises a ValueError for ciphertexts shorter than two bytes, which have no
+    pair of blocks to rank a key size by, and if max_keysize or candidates is
+    less than 1.
+    """
+
+    ciphertext = bytes(ciphertext)
+
+    if len(ciphertext) < 2:
+        raise ValueError("the ciphertext has to be at least 2 bytes long")
+
+    if max_keysize < 1:
+        raise ValueError("the largest key size has to be at least 1")
+
+    if candidates < 1:
+        raise ValueError("at least one key size candidate has to be solved")
+
+    with instrument.timer('repeating_xor.keysizes'):
+        keysizes = [keysize for keysize, _ in rank_keysizes(ciphertext, max_keysize)[:candidates]]
+
+    solve = functools.partial(break_with_keysize, ciphertext, language=language)
+
+    with instrument.timer('repeating_xor.solve'):
+        if workers:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+                solutions = list(pool.map(solve, keysizes))
+        else:
+            solutions = [solve(keysize) for keysize in keysizes]
+
+    key, _ = max(solutions, key=lambda solution: solution[1])
+
+    # reduce a key like b'ICEICE' to its period b'ICE':
+    for period in range(1, len(key)):
+        if len(key) % period == 0 and key == repeat_key(key[:period], len(key)):
+            key = key[:period]
+            break
+
+    return key, xor(ciphertext, repeat_key(key, len(ciphertext)))
+
+
+class TestRepeatingXor(unittest.TestCase):
+    """ Some unittests for this package. """
+
+    plaintext = (
+        b"It was the best of times, it was the worst of times, it was the age of wisdom, "
+        b"it was the age of foolishness, it was the epoch of belief, it was the epoch of "
+        b"incredulity, it was the season of Light, it was the season of Darkness, it was "
+        b"the spring of hope, it was the winter of despair, we had everything before us, "
+        b"we had nothing before us, we were all going direct to Heaven, we were all going "
+        b"direct the other way - in short, the period was so far like the present period, "
+        b"that some of its noisiest authorities insisted on its being received, for good "
+        b"or for evil, in the superlative degree of comparison only."
+    )
+
+    def test_single_byte(self):
+        """ Tests the transform based scoring against the naive one. """
+
+        column = xor(self.plaintext, bytes([0x5a]) * len(self.plaintext))
+        weights = byte_weights()
+
+        scores = score_single_byte_keys(column)
+
+        for key in (0, 0x5a, 0xff):
+            naive = sum(weights[b ^ key] for b in column)
+            self.assertAlmostEqual(scores[key], naive, places=6)
+
+        self.assertEqual(break_single_byte_xor(column)[0], 0x5a)
+
+    def test_break(self):
+        """ Tests that the key and the plaintext are recovered. """
+
+        for key in (b'ICE', b'crypto', b'Terminator X: Bring the noise'):
+            ciphertext = xor(self.plaintext, repeat_key(key, len(self.plaintext)))
+            self.assertEqual(break_repeating_xor(ciphertext), (key, self.plaintext))
+
+        for ciphertext in (b'', b'x'):
+            self.assertRaises(ValueError, break_repeating_xor, ciphertext)
+
+        self.assertRaises(ValueError, break_repeating_xor, self.plaintext, max_keysize=0)
+        self.assertRaises(ValueError, break_repeating_xor, self.plaintext, candidates=0)
+
+
+def cli():
+    """ Provides a command line interface. Pass -h as argument to get some information.
+
+    Example:
+
+    $ python3 -m cryptanalysis.repeating_xor ciphertext.bin
+    key: b'ICE'
+    """
+
+    parser = argparse.ArgumentParser(description='Tool to break repeating-key xor ciphertexts.')
+
+    parser.add_argument('ciphertext', type=argparse.FileType('rb'), help='file with the raw ciphertext')
+    parser.add_argument('--language', default='english', help='language of the plaintext')
+    parser.add_argument('--max-keysize', type=int, default=40, help='largest key size to try')
+    parser.add_argument('--candidates', type=int, default=3, help='number of key sizes to solve')
+    parser.add_argument('--workers', type=int, help='solve the key sizes on a process pool')
+    parser.add_argument('--plaintext', '-p', action='store_true', help='print the plaintext as well')
+
+    args = parser.parse_args()
+
+    try:
+        key, plaintext = break_repeating_xor(
+            args.ciphertext.read(), args.language, args.max_keysize, args.candidates, args.workers
+        )
+    except ValueError as error:
+        parser.error(str(error))
+
+    print("key:", key)
+
+    if args.plaintext:
+        print(plaintext.decode(errors='replace'))
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+
+""" Breaks monoalphabetic substitution ciphertexts by hill climbing.
+
+Starting with a random key, two symbols of the key are swapped whenever this
+improves the n-gram fitness of the plaintext, until no swap improves it any
+further. Swapping the plaintext symbols of the cipher symbols a and b only
+changes the n-grams covering an occurrence of a or b, so only those are
+rescored instead of decrypting and scoring the whole text for every candidate.
+
+A single climb can get stuck in a local optimum, so independent climbs from
+random keys (restarts) are run on a process pool. The search stops after the
+time budget or as soon as several restarts agree on the best score.
+"""
+
+import argparse
+import collections
+import concurrent.futures
+import os
+import random
+import time
+import unittest
+
+from classic.substitution import SubstitutionCipher
+from cryptanalysis.ngrams import ALPHABET, MAX_ORDER, NGramModel, load_language_model, load_model
+from cryptanalysis.ngrams import model_path, normalize, to_indexes
+from tools import instrument
+
+
+SolverResult = collections.namedtuple('SolverResult', ['key', 'plaintext', 'score', 'restarts', 'elapsed'])
+
+
+def default_model(language='english'):
+    """ Returns the n-gram model of the highest order built for the given
+    language. Unigrams can't break a substitution cipher, so a FileNotFoundError
+    is raised if there is no model of order 2 or higher. No such model ships
+    with the repository, it has to be built from a text corpus (see ngrams.py).
+    """
+
+    for order in range(MAX_ORDER, 1, -1):
+        if os.path.exists(model_path(language, order)):
+            return load_language_model(language, order)
+
+    raise FileNotFoundError(
+        f"no n-gram model of order 2 to {MAX_ORDER} for {language} (none ships with the repository), build one "
+        f"from text files in {language} with: python3 -m cryptanalysis.ngrams build "
+        f"--output {os.path.splitext(model_path(language, 1))[0]} <text files>"
+    )
+
+
+class HillClimber:
+    """ Hill climbing over the keys of a ciphertext (given as symbol indexes)
+    using the given n-gram model as fitness.
+    """
+
+    def __init__(self, indexes, model):
+        self.indexes = list(indexes)
+        self.model = model
+
+        n, length = model.order, len(self.indexes)
+
+        self.positions = [[] for _ in ALPHABET]
+        for i, symbol in enumerate(self.indexes):
+            self.positions[symbol].append(i)
+
+        # the start positions of all n-grams covering an occurrence of a symbol:
+        self.starts = [
+            frozenset(j for i in positions for j in range(max(0, i - n + 1), min(i, length - n) + 1))
+            for positions in self.positions
+        ]
+
+    def _ngram_score(self, plaintext, start):
+        index = 0
+
+        for symbol in plaintext[start:start + self.model.order]:
+            index = index * len(ALPHABET) + symbol
+
+        return self.model.table[index]
+
+    def climb(self, rng, deadline=None):
+        """ Climbs from a random key to a local optimum (or until the deadline)
+        and returns the tuple (decryption key, score). The decryption key maps
+        every cipher symbol index to a plaintext symbol index.
+        """
+
+        key = list(range(len(ALPHABET)))
+        rng.shuffle(key)
+
+        plaintext = [key[symbol] for symbol in self.indexes]
+        scores = [self._ngram_score(plaintext, j) for j in range(len(plaintext) - self.model.order + 1)]
+        total = sum(scores)
+
+        pairs = [
+            (a, b) for a in range(len(ALPHABET)) for b in range(a + 1, len(ALPHABET))
+            if self.positions[a] or self.positions[b]
+        ]
+
+        improved, swaps = True, 0
+
+        while improved and (deadline is None or time.time() < deadline):
+            improved = False
+            rng.shuffle(pairs)
+            swaps += len(pairs)
+
+            for a, b in pairs:
+                affected = self.starts[a] | self.starts[b]
+                old = sum(scores[j] for j in affected)
+
+                # swap the plaintext symbols of a and b, score and revert if it got worse:
+                for i in self.positions[a]:
+                    plaintext[i] = key[b]
+                for i in self.positions[b]:
+                    plaintext[i] = key[a]
+
+                new_scores = [(j, self._ngram_score(plaintext, j)) for j in affected]
+                new = sum(score for _, score in new_scores)
+
+                if new > old + 1e-9:
+                    key[a], key[b] = key[b], key[a]
+                    total += new - old
+                    improved = True
+
+                    for j, score in new_scores:
+                        scores[j] = score
+                else:
+                    for i in self.positions[a]:
+                        plaintext[i] = key[a]
+                    for i in self.positions[b]:
+                        plaintext[i] = key[b]
+
+        if instrument.enabled:
+            instrument.count('substitution_solver.climbs')
+            instrument.count('substitution_solver.swaps', swaps)
+
+        return key, total
+
+
+def _restart(indexes, model, seed, deadline):
+    """ Runs a single restart, the entry point for the workers of the pool. """
+
+    return HillClimber(indexes, model).climb(random.Random(seed), deadline)
+
+
+def solve(ciphertext, model=None, language='english', restarts=20, workers=None,
+          time_budget=None, consensus=3, seed=None):
+    """ Breaks the given substitution ciphertext and returns a SolverResult with
+    the encryption key (see SubstitutionCipher), the plaintext and its score.
+
+    Up to restarts climbs are run (on a process pool if workers is given).
+    The search stops early after time_budget seconds or as soon as consensus
+    restarts reached the same best score. The model has to be of order 2 or
+    higher and restarts at least 1 (a ValueError is raised otherwise).
+    """
+
+    if restarts < 1:
+        raise ValueError("at least one restart is required")
+
+    start = time.time()
+    deadline = start + time_budget if time_budget else None
+
+    model = model or default_model(language)
+
+    if model.order < 2:
+        raise ValueError("unigram models can't break substitution ciphers, use a model of order 2 or higher")
+
+    indexes = to_indexes(normalize(ciphertext))
+    seeds = random.Random(seed).sample(range(1 << 30), restarts)
+
+    best, agreeing, done = None, 0, 0
+
+    def consider(result):
+        nonlocal best, agreeing, done
+        done += 1
+
+        if best is None or result[1] > best[1] + 1e-6:
+            best, agreeing = result, 1
+        elif abs(result[1] - best[1]) <= 1e-6:
+            agreeing += 1
+
+        return agreeing >= consensus or (deadline is not None and time.time() >= deadline)
+
+    if not workers:
+        for s in seeds:
+            if consider(_restart(indexes, model, s, deadline)):
+                break
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_restart, indexes, model, s, deadline) for s in seeds]
+
+            for future in concurrent.futures.as_completed(futures):
+                if consider(future.result()):
+                    break
+
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    decryption_key, score = best
+
+    # the cipher symbol c decrypts to the plaintext symbol decryption_key[c]:
+    key = [None] * len(ALPHABET)
+    for c, p in enumerate(decryption_key):
+        key[p] = ALPHABET[c]
+
+    key = ''.join(key)
+    plaintext = SubstitutionCipher(key).decrypt(ciphertext.upper())
+
+    return SolverResult(key, plaintext, score, done, time.time() - start)
+
+
+class TestSubstitutionSolver(unittest.TestCase):
+    """ Some unittests for this package. """
+
+    plaintext = (
+        "IT IS A TRUTH UNIVERSALLY ACKNOWLEDGED, THAT A SINGLE MAN IN POSSESSION OF A GOOD "
+        "FORTUNE, MUST BE IN WANT OF A WIFE. HOWEVER LITTLE KNOWN THE FEELINGS OR VIEWS OF "
+        "SUCH A MAN MAY BE ON HIS FIRST ENTERING A NEIGHBOURHOOD, THIS TRUTH IS SO WELL FIXED "
+        "IN THE MINDS OF THE SURROUNDING FAMILIES, THAT HE IS CONSIDERED AS THE RIGHTFUL "
+        "PROPERTY OF SOME ONE OR OTHER OF THEIR DAUGHTERS."
+    )
+
+    def model(self):
+        text = normalize(self.plaintext)
+        return NGramModel.from_counts(3, collections.Counter(text[i:i + 3] for i in range(len(text) - 2)))
+
+    def test_incremental_score(self):
+        """ Tests that the incrementally updated score equals scoring the final plaintext. """
+
+        model = self.model()
+        indexes = to_indexes(normalize(SubstitutionCipher.random(rng=random.Random(1)).encrypt(self.plaintext)))
+
+        key, score = HillClimber(indexes, model).climb(random.Random(2))
+        plaintext = bytes(key[symbol] for symbol in indexes)
+
+        self.assertAlmostEqual(score, model.score_indexes(plaintext), places=3)
+
+    def test_solve(self):
+        """ Tests that the plaintext is recovered (with a model of the plaintext itself). """
+
+        suite = SubstitutionCipher.random(rng=random.Random(3))
+        result = solve(suite.encrypt(self.plaintext), self.model(), restarts=10, seed=4)
+
+        self.assertEqual(result.plaintext, self.plaintext)
+
+    def test_default_model(self):
+        """ Tests that the default path uses the best model built and refuses to
+        run without a model of order 2 or higher.
+        """
+
+        import tempfile
+        from unittest import mock
+
+        ciphertext = SubstitutionCipher.random(rng=random.Random(3)).encrypt(self.plaintext)
+
+        with tempfile.TemporaryDirectory() as directory:
+            def path(language, order):
+                return os.path.join(directory, f'{language}.{order}gram')
+
+            with mock.patch(f'{__name__}.model_path', path), mock.patch('cryptanalysis.ngrams.model_path', path):
+                self.assertRaises(FileNotFoundError, solve, ciphertext)
+
+                self.model().save(path('english', 3))
+                result = solve(ciphertext, restarts=10, seed=4)
+
+        self.assertEqual(result.plaintext, self.plaintext)
+        self.assertRaises(ValueError, solve, ciphertext, NGramModel.from_unigrams())
+        self.assertRaises(ValueError, solve, ciphertext, self.model(), restarts=0)
+
+
+def cli():
+    """ Provides a command line interface. Pass -h as argument to get some information.
+
+    Example:
+
+    $ python3 -m cryptanalysis.substitution_solver --workers 4 --time-budget 30 -i ciphertext.txt
+    """
+
+    parser = argparse.ArgumentParser(description='Tool to break substitution ciphertexts.')
+
+    parser.add_argument('ciphertext', nargs='?', help='ciphertext to break')
+    parser.add_argument('--input', '-i', type=argparse.FileType('r'), help='read the ciphertext from this file')
+    parser.add_argument('--language', default='english', help='language of the plaintext')
+    parser.add_argument('--model', help='path of the n-gram model (default: best model of the language)')
+    parser.add_argument('--restarts', type=int, default=20, help='maximal number of restarts')
+    parser.add_argument('--workers', type=int, help='run the restarts on a process pool of this size')
+    parser.add_argument('--time-budget', type=float, help='stop after this many seconds')
+    parser.add_argument('--consensus', type=int, default=3, help='stop if this many restarts agree')
+
+    args = parser.parse_args()
+
+    if args.input is not None:
+        ciphertext = args.input.read()
+    elif args.ciphertext is not None:
+        ciphertext = args.ciphertext
+    else:
+        parser.error('either the ciphertext or --input is required')
+
+    model = load_model(args.model) if args.model else None
+
+    try:
+        result = solve(
+            ciphertext, model, args.language, args.restarts, args.workers, args.time_budget, args.consensus
+        )
+    except (FileNotFoundError, ValueError) as error:
+        parser.error(str(error))
+
+    print(f"[+] {result.restarts} restarts in {result.elapsed:.2f}s, score {result.score:.2f}")
+    print("[+] key:", result.key)
+    print(result.plaintext)
+
+
+if __name__ == "__main__":
+    cli()
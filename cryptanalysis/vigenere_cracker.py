@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+
+""" Recovers the key of Vigenère ciphertexts.
+
+1. The key length is estimated by the index of coincidence (IC): splitting the
+   ciphertext into m columns (every m-th symbol), the columns of the right key
+   length (and its multiples) are caesar ciphertexts and keep the IC of the
+   language, while wrong lengths mix the shifts and approach the IC of random
+   text. The Kasiski test (distances of repeated trigrams are multiples of the
+   key length) is reported as well to support the decision.
+2. Every column is a caesar ciphertext, so its shift is found by scoring the
+   rotated column histogram against the frequency table of the language.
+
+The ciphertext is encoded into symbol indexes (bytes) once. The histograms of
+the columns of every candidate key length are counted from slices of these
+indexes by bytes.count, so no symbol is counted in python code.
+"""
+
+import argparse
+import collections
+import re
+import string
+import unittest
+
+from classic.vigenere import VigenereCipher
+from cryptanalysis.frequency import load_frequencies, SCORING_METHODS
+from tools import instrument
+from tools.convert import get_alphabet
+
+
+KeyLength = collections.namedtuple('KeyLength', ['length', 'ic', 'kasiski'])
+
+# fraction of the way from the IC of random text to the best IC of all key
+# lengths the average IC of the columns has to reach to accept a key length
+# (divisors of the key length mix at least two shifts and stay below):
+IC_THRESHOLD = 0.8
+
+_NON_ALPHABET = re.compile('[^A-Z]+')
+
+
+def column_histograms(text, length, alphabet=string.ascii_uppercase):
+    """ Returns the histograms (lists ordered like the alphabet) of the length
+    columns of the text.
+    """
+
+    return _index_histograms(get_alphabet(alphabet).encode(text, 'skip'), length, len(alphabet))
+
+
+def _index_histograms(indexes, length, size):
+    """ Returns the histograms of the length columns of the symbol indexes
+    (bytes) over an alphabet of the given size.
+    """
+
+    histograms = []
+
+    for i in range(length):
+        column = indexes[i::length]
+        histograms.append([column.count(s) for s in range(size)])
+
+    return histograms
+
+
+def index_of_coincidence(histogram):
+    """ Returns the probability that two random symbols of the histogram are equal. """
+
+    total = sum(histogram)
+
+    if total < 2:
+        return 0.0
+
+    return sum(c * (c - 1) for c in histogram) / (total * (total - 1))
+
+
+def kasiski(text, max_length):
+    """ Returns the Kasiski statistic for every key length 1..max_length (list
+    indexed by the key length): the share of distances between consecutive
+    occurrences of repeated trigrams that are a multiple of the key length.
+    """
+
+    last, distances = {}, []
+
+    for i in range(len(text) - 2):
+        trigram = text[i:i + 3]
+
+        if trigram in last:
+            distances.append(i - last[trigram])
+        last[trigram] = i
+
+    if not distances:
+        return [0.0] * (max_length + 1)
+
+    return [0.0] + [sum(1 for d in distances if d % m == 0) / len(distances) for m in range(1, max_length + 1)]
+
+
+def rank_key_lengths(text, max_length=20):
+    """ Returns a KeyLength (length, average column IC, Kasiski statistic) for
+    every candidate key length of the normalized text, ordered by the length.
+    """
+
+    max_length = max(1, min(max_length, len(text) // 2))
+    kasiski_statistic = kasiski(text, max_length)
+
+    # encoded once, the columns of all candidate lengths are sliced from it:
+    alphabet = get_alphabet(string.ascii_uppercase)
+    indexes = alphabet.encode(text, 'skip')
+
+    return [
+        KeyLength(
+            length,
+            sum(map(index_of_coincidence, _index_histograms(indexes, length, len(alphabet)))) / length,
+            kasiski_statistic[length]
+        )
+        for length in range(1, max_length + 1)
+    ]
+
+
+def estimate_key_length(text, language='english', max_length=20):
+    """ Returns the estimated key length of the normalized text: the shortest
+    length whose columns come close to the best IC of all lengths (multiples of
+    the key length reach the same IC, see IC_THRESHOLD). If no length reaches
+    the IC of the language, the Kasiski statistic decides.
+    """
+
+    table = load_frequencies(language)
+
+    ic_random = 1 / len(table)
+    ic_language = sum(p * p for p in table.values())
+
+    ranking = rank_key_lengths(text, max_length)
+    best = max(candidate.ic for candidate in ranking)
+
+    if best < ic_random + IC_THRESHOLD * (ic_language - ic_random):
+        return max(ranking, key=lambda candidate: (candidate.kasiski, candidate.ic)).length
+
+    threshold = ic_random + IC_THRESHOLD * (best - ic_random)
+    return next(candidate.length for candidate in ranking if candidate.ic >= threshold)
+
+
+def crack(ciphertext, language='english', method='chi2', max_length=20, key_length=None):
+    """ Recovers the key of the given ciphertext and returns the tuple (key,
+    plaintext). The key length is estimated unless it is given.
+    """
+
+    table = load_frequencies(language)
+    alphabet = ''.join(sorted(table))
+    probabilities = [table[s] for s in alphabet]
+
+    ciphertext = ciphertext.upper()
+    text = _NON_ALPHABET.sub('', ciphertext)
+
+    with instrument.timer('vigenere_cracker.key_length'):
+        key_length = key_length or estimate_key_length(text, language, max_length)
+
+    key = ''
+
+    with instrument.timer('vigenere_cracker.columns'):
+        for histogram in column_histograms(text, key_length, alphabet):
+            scores = SCORING_METHODS[method](histogram, probabilities)
+            key += alphabet[scores.index(min(scores))]
+
+    with instrument.timer('vigenere_cracker.decrypt'):
+        return key, VigenereCipher(key, alphabet).decrypt(ciphertext)
+
+
+class TestVigenereCracker(unittest.TestCase):
+    """ Some unittests for this package. """
+
+    plaintext = (
+        "IT IS A TRUTH UNIVERSALLY ACKNOWLEDGED, THAT A SINGLE MAN IN POSSESSION OF A GOOD "
+        "FORTUNE, MUST BE IN WANT OF A WIFE. HOWEVER LITTLE KNOWN THE FEELINGS OR VIEWS OF "
+        "SUCH A MAN MAY BE ON HIS FIRST ENTERING A NEIGHBOURHOOD, THIS TRUTH IS SO WELL FIXED "
+        "IN THE MINDS OF THE SURROUNDING FAMILIES, THAT HE IS CONSIDERED AS THE RIGHTFUL "
+        "PROPERTY OF SOME ONE OR OTHER OF THEIR DAUGHTERS. MY DEAR MR. BENNET, SAID HIS LADY "
+        "TO HIM ONE DAY, HAVE YOU HEARD THAT NETHERFIELD PARK IS LET AT LAST? MR. BENNET "
+        "REPLIED THAT HE HAD NOT. BUT IT IS, RETURNED SHE; FOR MRS. LONG HAS JUST BEEN HERE, "
+        "AND SHE TOLD ME ALL ABOUT IT."
+    )
+
+    def test_key_length(self):
+        """ Tests the key length estimation. """
+
+        for key in ('LEMON', 'SECRET', 'CRYPTO'):
+            text = _NON_ALPHABET.sub('', VigenereCipher(key).encrypt(self.plaintext))
+            self.assertEqual(estimate_key_length(text), len(key))
+
+    def test_crack(self):
+        """ Tests that the key and the plaintext are recovered. """
+
+        for key in ('LEMON', 'ENIGMA', 'VIGENERE'):
+            ciphertext = VigenereCipher(key).encrypt(self.plaintext)
+            self.assertEqual(crack(ciphertext), (key, self.plaintext))
+
+
+def cli():
+    """ Provides a command line interface. Pass -h as argument to get some information.
+
+    Example:
+
+    $ python3 -m cryptanalysis.vigenere_cracker -i ciphertext.txt
+    """
+
+    parser = argparse.ArgumentParser(description='Tool to recover the key of Vigenère ciphertexts.')
+
+    parser.add_argument('ciphertext', nargs='?', help='ciphertext to crack')
+    parser.add_argument('--input', '-i', type=argparse.FileType('r'), help='read the ciphertext from this file')
+    parser.add_argument('--language', default='english', help='frequency table to score against')
+    parser.add_argument('--method', choices=sorted(SCORING_METHODS), default='chi2')
+    parser.add_argument('--max-length', type=int, default=20, help='longest key length to consider')
+    parser.add_argument('--key-length', type=int, help='skip the estimation and use this key length')
+    parser.add_argument('--ranking', action='store_true', help='print the statistics of all key lengths')
+
+    args = parser.parse_args()
+
+    if args.input is not None:
+        ciphertext = args.input.read()
+    elif args.ciphertext is not None:
+        ciphertext = args.ciphertext
+    else:
+        parser.error('either the ciphertext or --input is required')
+
+    if args.ranking:
+        for candidate in rank_key_lengths(_NON_ALPHABET.sub('', ciphertext.upper()), args.max_length):
+            print(f'{candidate.length:>3}  IC {candidate.ic:.4f}  Kasiski {candidate.kasiski:.2f}')
+
+    key, plaintext = crack(ciphertext, args.language, args.method, args.max_length, args.key_length)
+
+    print("[+] key:", key)
+    print(plaintext)
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,403 @@
+#!/usr/bin/env python3
+
+""" Single entry point for the tools of this repository.
+
+    $ python3 -m cryptolib <command> [options]
+
+Every command imports only the module it needs, so an invocation doesn't pay
+for the rest of the library. The input is read from --input (default: stdin)
+and the output is written to --output (default: stdout) in chunks of
+--chunk-size bytes, so large files are processed with constant memory.
+With --profile, the counters and timers of the library (see tools/instrument.py)
+and a cProfile profile of the command are printed to stderr or written to the
+given file.
+
+The batch command works through many jobs in a single process: it reads one
+JSON object per line, e.g.
+
+    {"id": 1, "args": ["caesar", "-e", "3"], "input": "HELLO"}
+    {"id": 2, "args": ["sha1"], "input_hex": "616263"}
+
+runs the given command on the input (text or hex) and writes one JSON object
+per job with its output (or output_hex if it isn't valid utf-8) or the error.
+"""
+
+import argparse
+import io
+import json
+import sys
+import unittest
+
+
+# number of bytes that are read at once from the input:
+DEFAULT_CHUNK_SIZE = 1 << 20
+
+
+def read_chunks(fileobj, chunk_size=DEFAULT_CHUNK_SIZE):
+    """ Reads the given binary file object and yields its content in chunks of
+    chunk_size bytes (only the last one may be shorter).
+    """
+
+    return iter(lambda: fileobj.read(chunk_size), b'')
+
+
+def _caesar(args, source, target):
+    from classic.caesar import CaesarCipher
+
+    suite = CaesarCipher(args.key, args.alphabet)
+    stream = suite.decrypt_stream if args.decrypt else suite.encrypt_stream
+
+    target.writelines(stream(read_chunks(source, args.chunk_size)))
+
+
+def _otp(args, source, target):
+    from classic.otp import otp_stream
+
+    with open(args.pad, 'rb') as pad:
+        target.writelines(otp_stream(read_chunks(source, args.chunk_size), read_chunks(pad, args.chunk_size)))
+
+
+def _hamming(args, source, target):
+    from tools.hamming import hamming
+
+    distance = 0
+
+    with open(args.other, 'rb') as other:
+        # both files are read in chunks of the same size, so the chunks are aligned:
+        for chunk_a, chunk_b in zip(read_chunks(source, args.chunk_size), read_chunks(other, args.chunk_size)):
+            distance += hamming(chunk_a, chunk_b)
+
+    target.write(f"{distance}\n".encode())
+
+
+def _sha1(args, source, target):
+    from hashing.sha1_lea import SHA1
+
+    target.write(f"{SHA1().update_file(source, args.chunk_size).hexdigest()}\n".encode())
+
+
+def _lea(args, source, target):
+    from hashing.sha1_lea import sha1_lea
+
+    digest, payload = sha1_lea(args.hexdigest, source.read(), args.appendix.encode(), args.prefix_length)
+    target.write(f"{digest}\n{payload.hex()}\n".encode())
+
+
+def _rsa(args, source, target):
+    from tools.rsa_attack import factor_keys, read_keys
+
+    text = None
+
+    if args.n is not None:
+        keys = [(args.n, args.e) if args.e is not None else args.n]
+    else:
+        text = io.TextIOWrapper(source, encoding='ascii')
+        keys = read_keys(text)
+
+    try:
+        for result in factor_keys(keys, args.methods, args.budget):
+            factors = '-' if result.factors is None else ' '.join(map(str, result.factors))
+            target.write(f"{result.n} {factors} {result.method or '-'}\n".encode())
+    finally:
+        # the wrapper would close the source once it is garbage collected:
+        if text is not None:
+            text.detach()
+
+
+def _entropy(args, source, target):
+    from cryptanalysis.informationtheory import ByteEntropyEstimator, sliding_window_entropy
+
+    if args.window is None:
+        estimator = ByteEntropyEstimator()
+
+        for chunk in read_chunks(source, args.chunk_size):
+            estimator.update(chunk)
+
+        target.write(f"{estimator.entropy():.6f}\n".encode())
+        return
+
+    step = args.step or args.window
+
+    # offset is the position of the next window, the bytes of it that are
+    # already read are carried over (rest), the gap up to it is skipped (skip):
+    offset, rest, skip = 0, b'', 0
+
+    for chunk in read_chunks(source, args.chunk_size):
+        if skip:
+            skipped = min(skip, len(chunk))
+            chunk, skip = chunk[skipped:], skip - skipped
+
+        data = rest + chunk
+        entropies = sliding_window_entropy(data, args.window, step)
+
+        for i, entropy in enumerate(entropies):
+            target.write(f"{offset + i * step} {entropy:.6f}\n".encode())
+
+        consumed = len(entropies) * step
+        offset += consumed
+        rest, skip = data[consumed:], skip + max(consumed - len(data), 0)
+
+
+def _batch(args, source, target):
+    text = io.TextIOWrapper(source, encoding='utf-8')
+
+    try:
+        for line in text:
+            if line.strip():
+                target.write(json.dumps(run_job(json.loads(line))).encode() + b'\n')
+                target.flush()
+    finally:
+        # the wrapper would close the source once it is garbage collected:
+        text.detach()
+
+
+def _int(argument):
+    return int(argument, 0)
+
+
+def _positive(argument):
+    value = int(argument)
+
+    if value < 1:
+        raise argparse.ArgumentTypeError(f"{argument} is less than 1")
+
+    return value
+
+
+def _caesar_arguments(parser):
+    parser.add_argument('key', type=int, help='key (shift) to be used')
+    parser.add_argument('--decrypt', '-d', action='store_true', help='decrypt instead of encrypt')
+    parser.add_argument('--alphabet', default='ABCDEFGHIJKLMNOPQRSTUVWXYZ', help='default is A-Z')
+
+
+def _otp_arguments(parser):
+    parser.add_argument('pad', help='file to xor the input with')
+
+
+def _hamming_arguments(parser):
+    parser.add_argument('other', help='file to compare the input with')
+
+
+def _sha1_arguments(parser):
+    pass
+
+
+def _lea_arguments(parser):
+    parser.add_argument('hexdigest', help='known hash of the secret prefix and the input')
+    parser.add_argument('appendix', help='data to append')
+    parser.add_argument('prefix_length', type=int, help='length of the unknown prefix')
+
+
+def _rsa_arguments(parser):
+    parser.add_argument('n', nargs='?', type=_int, help='modulus (default: read "n [e]" lines)')
+    parser.add_argument('e', nargs='?', type=_int, help='public exponent')
+    parser.add_argument('--methods', nargs='+', choices=_RSAMethods(), metavar='METHOD',
+                        help='factoring methods to run (default: all)')
+    parser.add_argument('--budget', type=float, default=60, help='seconds per key')
+
+
+class _RSAMethods:
+    """ The methods of tools/rsa_attack.py as choices, imported on first use
+    (so other commands don't pay for the import).
+    """
+
+    def __iter__(self):
+        from tools.rsa_attack import METHODS
+
+        return iter(METHODS)
+
+    def __contains__(self, name):
+        return name in list(self)
+
+
+def _entropy_arguments(parser):
+    parser.add_argument('--window', type=_positive, help='print the entropy of every window of this size')
+    parser.add_argument('--step', type=_positive, help='distance of the windows (default: window)')
+
+
+def _batch_arguments(parser):
+    pass
+
+
+# name -> (help, function adding the arguments, function running the command):
+COMMANDS = {
+    'caesar': ('encrypt or decrypt with the caesar cipher', _caesar_arguments, _caesar),
+    'otp': ('xor the input with a pad', _otp_arguments, _otp),
+    'hamming': ('hamming distance of the input and a file', _hamming_arguments, _hamming),
+    'sha1': ('sha1 hash of the input', _sha1_arguments, _sha1),
+    'lea': ('sha1 length extension of the input', _lea_arguments, _lea),
+    'rsa': ('factor weak rsa moduli', _rsa_arguments, _rsa),
+    'entropy': ('entropy of the input (per byte)', _entropy_arguments, _entropy),
+    'batch': ('run the JSONL jobs of the input', _batch_arguments, _batch),
+}
+
+
+class _BatchParser(argparse.ArgumentParser):
+    """ Parser raising errors instead of exiting (or printing the help), used
+    for the jobs of a batch.
+    """
+
+    def error(self, message):
+        raise ValueError(message)
+
+    def exit(self, status=0, message=None):
+        raise ValueError(message or "no command was run")
+
+    def _print_message(self, message, file=None):
+        pass
+
+
+def build_parser(parser_class=argparse.ArgumentParser):
+    """ Returns the parser of all commands. """
+
+    common = parser_class(add_help=False)
+    common.add_argument('--input', '-i', type=argparse.FileType('rb'), help='input file (default: stdin)')
+    common.add_argument('--output', '-o', type=argparse.FileType('wb'), help='output file (default: stdout)')
+    common.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='bytes read at once')
+    common.add_argument(
+        '--profile', nargs='?', const='-', help='profile the command: - for stderr, .json or cProfile stats file'
+    )
+
+    parser = parser_class(prog='python3 -m cryptolib', description='Tools of the cryptolib.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    for name, (description, add_arguments, _) in COMMANDS.items():
+        add_arguments(commands.add_parser(name, help=description, parents=[common]))
+
+    return parser
+
+
+def run(args, source, target):
+    """ Runs the command of the parsed arguments reading from source and
+    writing to target (binary file objects) unless the arguments name files.
+    """
+
+    source = args.input or source
+    target = args.output or target
+
+    try:
+        if args.profile is None:
+            COMMANDS[args.command][2](args, source, target)
+        else:
+            from tools import instrument
+
+            with instrument.measure(profile=True) as measurement:
+                COMMANDS[args.command][2](args, source, target)
+
+            instrument.report(measurement, args.profile)
+    finally:
+        for f in (args.input, args.output):
+            if f is not None:
+                f.close()
+
+
+def run_job(job):
+    """ Runs a single job of a batch (see the description of this module) and
+    returns its result as dict.
+    """
+
+    result = {'id': job.get('id')}
+
+    try:
+        args = build_parser(_BatchParser).parse_args(job['args'])
+
+        if args.command == 'batch':
+            raise ValueError("batches can't be nested")
+
+        if 'input_hex' in job:
+            source = io.BytesIO(bytes.fromhex(job['input_hex']))
+        else:
+            source = io.BytesIO(job.get('input', '').encode())
+
+        target = io.BytesIO()
+        run(args, source, target)
+    except Exception as error:  # pylint: disable=broad-except
+        result['error'] = f'{type(error).__name__}: {error}'
+        return result
+
+    try:
+        result['output'] = target.getvalue().decode()
+    except UnicodeDecodeError:
+        result['output_hex'] = target.getvalue().hex()
+
+    return result
+
+
+class TestCryptolib(unittest.TestCase):
+    """ Some unittests for this package. """
+
+    def run_command(self, argv, data):
+        target = io.BytesIO()
+        run(build_parser().parse_args(argv), io.BytesIO(data), target)
+
+        return target.getvalue()
+
+    def test_commands(self):
+        """ Tests some commands on in-memory streams with tiny chunks. """
+
+        import hashlib
+
+        self.assertEqual(self.run_command(['caesar', '3', '--chunk-size', '2'], b'HELLO, WORLD'), b'KHOOR, ZRUOG')
+        self.assertEqual(self.run_command(['caesar', '-d', '3'], b'KHOOR'), b'HELLO')
+        self.assertEqual(
+            self.run_command(['sha1', '--chunk-size', '7'], b'abc' * 100),
+            hashlib.sha1(b'abc' * 100).hexdigest().encode() + b'\n'
+        )
+        self.assertEqual(self.run_command(['entropy'], b'ABAB'), b'1.000000\n')
+        self.assertEqual(
+            self.run_command(['entropy', '--window', '4', '--chunk-size', '3'], b'AAAAABABABCD'),
+            b'0 0.000000\n4 1.000000\n8 2.000000\n'
+        )
+
+    def test_entropy_gaps(self):
+        """ Tests windows further apart than a chunk against the in-memory scan. """
+
+        from cryptanalysis.informationtheory import sliding_window_entropy
+
+        data = bytes(range(256)) * 2 + b'A' * 200
+        expected = ''.join(
+            f"{i * 40} {entropy:.6f}\n" for i, entropy in enumerate(sliding_window_entropy(data, 16, 40))
+        )
+
+        for chunk_size in ('7', '33', '100'):
+            output = self.run_command(['entropy', '--window', '16', '--step', '40', '--chunk-size', chunk_size], data)
+            self.assertEqual(output.decode(), expected)
+
+    def test_batch(self):
+        """ Tests that the jobs of a batch are run one after another and errors are reported. """
+
+        jobs = [
+            {'id': 1, 'args': ['caesar', '3'], 'input': 'HELLO'},
+            {'id': 2, 'args': ['sha1'], 'input_hex': '616263'},
+            {'id': 3, 'args': ['caesar', 'x']},
+        ]
+
+        output = self.run_command(['batch'], ''.join(json.dumps(job) + '\n' for job in jobs).encode())
+        results = [json.loads(line) for line in output.splitlines()]
+
+        self.assertEqual(results[0], {'id': 1, 'output': 'KHOOR'})
+        self.assertEqual(results[1], {'id': 2, 'output': 'a9993e364706816aba3e25717850c26c9cd0d89d\n'})
+        self.assertEqual(results[2]['id'], 3)
+        self.assertIn('invalid int value', results[2]['error'])
+
+        self.assertIn("invalid choice: 'nope'", run_job({'args': ['rsa', '15', '--methods', 'nope']})['error'])
+        self.assertIn("0 is less than 1", run_job({'args': ['entropy', '--window', '0']})['error'])
+
+
+def cli():
+    """ Provides the command line interface. Pass -h as argument to get some information.
+
+    Example:
+
+    $ echo -n HELLO | python3 -m cryptolib caesar 3
+    KHOOR
+    $ python3 -m cryptolib sha1 -i large.bin
+    $ python3 -m cryptolib batch -i jobs.jsonl -o results.jsonl
+    """
+
+    args = build_parser().parse_args()
+    run(args, sys.stdin.buffer, sys.stdout.buffer)
+
+
+if __name__ == "__main__":
+    cli()
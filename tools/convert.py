@@ -2,8 +2,266 @@
 
 """ Common functions to convert stuff """
 
+import functools
 import unittest
 
+from tools import instrument
+
+
+class Alphabet:
+    """ Codec between messages (str or bytes) and the indexes of their symbols
+    in an alphabet of single character symbols. As the indexes are encoded by a
+    single byte, encode() and decode() are limited to alphabets of at most 255
+    symbols.
+
+    The mappings are precomputed once as translation tables, so whole messages
+    are converted by str.translate / bytes.translate instead of looking up every
+    symbol on its own. The indexes are returned as bytes, which can be used as
+    buffer directly (e.g. array('B', indexes) or memoryview(indexes)).
+
+    Symbols outside of the alphabet are handled depending on unknown:
+
+    - 'strict': raise a ValueError
+    - 'skip': drop them
+    - 'keep': encode them to the index len(alphabet), which is decoded to the
+      placeholder of the alphabet
+
+    Example:
+    >>> codec = Alphabet(string.ascii_uppercase)
+    >>> codec.encode("HELLO")
+    b'\\x07\\x04\\x0b\\x0b\\x0e'
+    >>> codec.decode(b'\\x07\\x04\\x0b\\x0b\\x0e')
+    'HELLO'
+    """
+
+    def __init__(self, symbols, placeholder='?'):
+        self.symbols = ''.join(symbols)
+        self.placeholder = placeholder
+
+        if len(set(self.symbols)) != len(self.symbols):
+            raise ValueError("the symbols of an alphabet have to be unique")
+
+        self.unknown = len(self.symbols)
+
+        if self.unknown > 0xff:
+            # only the translation tables are available for larger alphabets:
+            self._indexes = {ord(s): i for i, s in enumerate(self.symbols)}
+            return
+
+        # str -> indexes (as characters, so the result is encoded by latin-1):
+        self._indexes = {ord(s): chr(i) for i, s in enumerate(self.symbols)}
+        self._encode_table = _Table(self._indexes, chr(self.unknown))
+        self._encode_skip_table = _Table(self._indexes, None)
+
+        # bytes -> indexes, for the symbols representable by a single byte:
+        self._encode_bytes_table = bytearray([self.unknown]) * 256
+        for i, s in enumerate(self.symbols):
+            if ord(s) <= 0xff:
+                self._encode_bytes_table[ord(s)] = i
+
+        self._encode_bytes_table = bytes(self._encode_bytes_table)
+        self._unknown_bytes = bytes(b for b in range(256) if self._encode_bytes_table[b] == self.unknown)
+
+        # indexes -> str (the unknown index and beyond are mapped separately):
+        self._decode_table = {i: s for i, s in enumerate(self.symbols)}
+        self._decode_keep_table = _Table(self._decode_table, placeholder)
+        self._decode_skip_table = _Table(self._decode_table, None)
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def __contains__(self, symbol):
+        return len(symbol) == 1 and ord(symbol) in self._indexes
+
+    def __repr__(self):
+        return f'Alphabet({self.symbols!r})'
+
+    def index(self, symbol):
+        """ Returns the index of a single symbol. """
+
+        if symbol not in self:
+            raise ValueError(f"{symbol!r} is not part of the alphabet")
+
+        index = self._indexes[ord(symbol)]
+        return index if isinstance(index, int) else ord(index)
+
+    def encode(self, message, unknown='strict'):
+        """ Returns the indexes of the symbols of the message (str or bytes-like
+        object) as bytes.
+        """
+
+        self._check_size()
+
+        if isinstance(message, str):
+            if unknown == 'skip':
+                return message.translate(self._encode_skip_table).encode('latin-1')
+
+            indexes = message.translate(self._encode_table).encode('latin-1')
+        elif unknown == 'skip':
+            return bytes(message).translate(self._encode_bytes_table, self._unknown_bytes)
+        else:
+            indexes = bytes(message).translate(self._encode_bytes_table)
+
+        if unknown == 'strict' and self.unknown in indexes:
+            symbol = message[indexes.index(self.unknown)]
+            raise ValueError(f"{symbol!r} is not part of the alphabet")
+
+        return indexes
+
+    def decode(self, indexes, unknown='strict'):
+        """ Returns the message (str) of the given indexes (bytes-like object or
+        iterable of ints below 256). Indexes beyond the alphabet are handled
+        like unknown symbols by encode().
+        """
+
+        self._check_size()
+        indexes = bytes(indexes)
+
+        if unknown == 'skip':
+            return indexes.decode('latin-1').translate(self._decode_skip_table)
+        if unknown == 'keep':
+            return indexes.decode('latin-1').translate(self._decode_keep_table)
+
+        if max(indexes, default=0) >= self.unknown:
+            raise ValueError(f"index {max(indexes)} is out of the alphabet")
+
+        return indexes.decode('latin-1').translate(self._decode_table)
+
+    def _check_size(self):
+        if self.unknown > 0xff:
+            raise ValueError("the indexes of alphabets with more than 255 symbols don't fit into bytes")
+
+    def histogram(self, message):
+        """ Counts the symbols of the alphabet in the message (str or bytes) and
+        returns the counts as list ordered like the alphabet.
+        """
+
+        indexes = self.encode(message, 'skip')
+        return [indexes.count(i) for i in range(len(self))]
+
+    def translation(self, targets):
+        """ Returns the translation tables (str and bytes) mapping the i-th symbol
+        of the alphabet to the symbol with the index targets[i], see translation().
+        """
+
+        return translation(self.symbols, targets)
+
+
+def translation(symbols, targets):
+    """ Returns the translation tables (str and bytes) mapping the i-th of the
+    given symbols to the symbol with the index targets[i]. A symbol occurring
+    more than once is mapped like its first occurrence (as by symbols.index).
+    Other symbols are passed through unchanged. The bytes table is None if the
+    symbols contain one that can't be represented by a single byte.
+    """
+
+    mapping = {}
+    for s, t in zip(symbols, targets):
+        mapping.setdefault(s, symbols[t])
+
+    str_table = str.maketrans(mapping)
+
+    if any(ord(s) > 0xff for s in mapping):
+        return str_table, None
+
+    bytes_table = bytearray(range(256))
+    for m, c in mapping.items():
+        bytes_table[ord(m)] = ord(c)
+
+    return str_table, bytes(bytes_table)
+
+
+class TranslationCipher:
+    """ Base of the ciphers encrypting every symbol of the alphabet on its own
+    (caesar, substitution) by the translation tables of translation().
+
+    Subclasses implement _targets(key), returning the index of the symbol every
+    symbol of the alphabet is encrypted to (raising a ValueError for invalid
+    keys), and encrypt/decrypt by _translate() with the tables of this class.
+    """
+
+    # name of the counter of the translated symbols (see tools/instrument.py):
+    counter = None
+
+    @property
+    def alphabet(self):
+        """ The alphabet of this suite. Assigning a new alphabet rebuilds the translation tables. """
+
+        return self._alphabet
+
+    @alphabet.setter
+    def alphabet(self, alphabet):
+        self._alphabet = alphabet
+
+        # the tables depend on the key as well, so rebuild them if there is already one:
+        if hasattr(self, '_key'):
+            self.key = self._key
+
+    @property
+    def key(self):
+        """ The key of this suite. Assigning a new key rebuilds the translation tables. """
+
+        return self._key
+
+    @key.setter
+    def key(self, key):
+        targets = self._targets(key)
+
+        # the symbol with the index targets[i] is decrypted to the i-th symbol:
+        inverse = [0] * len(targets)
+        for i, t in enumerate(targets):
+            inverse[t] = i
+
+        self._key = key
+        self._encrypt_table, self._encrypt_bytes_table = translation(self.alphabet, targets)
+        self._decrypt_table, self._decrypt_bytes_table = translation(self.alphabet, inverse)
+
+    def _targets(self, key):
+        raise NotImplementedError
+
+    def _translate(self, text, str_table, bytes_table):
+        """ Applies the matching translation table on the given str or bytes-like object. """
+
+        if instrument.enabled and self.counter is not None:
+            instrument.count(self.counter, len(text))
+
+        if isinstance(text, str):
+            return text.translate(str_table)
+
+        if bytes_table is None:
+            raise ValueError("the alphabet can't be applied on bytes (symbols beyond 0xff)")
+
+        return bytes(text).translate(bytes_table)
+
+
+class _Table(dict):
+    """ Translation table for str.translate mapping all keys missing in the
+    given mapping to default (None deletes the symbol). The results of the
+    misses are stored, so every distinct unknown symbol is only looked up once.
+    """
+
+    def __init__(self, mapping, default):
+        super().__init__(mapping)
+        self.default = default
+
+    def __missing__(self, key):
+        self[key] = self.default
+        return self.default
+
+
+@functools.lru_cache(maxsize=64)
+def get_alphabet(symbols):
+    """ Returns the shared (cached) codec of the given symbols (str). """
+
+    return Alphabet(symbols)
+
+
+def _is_codec_alphabet(alphabet):
+    """ Returns whether the given alphabet can be converted by an Alphabet codec. """
+
+    return isinstance(alphabet, str) and len(alphabet) <= 0xff and len(set(alphabet)) == len(alphabet)
+
+
 def message_to_indexlist(string, alphabet):
     """ Converts a message to a list of indexes regarding the given alphabet.
 
@@ -12,7 +270,12 @@ def message_to_indexlist(string, alphabet):
     [7, 4, 11, 11, 14]
     """
 
-    return [alphabet.index(s) for s in string]
+    # the codec encodes the indexes as bytes and requires unique symbols, other
+    # alphabets are looked up symbol by symbol:
+    if not _is_codec_alphabet(alphabet):
+        return [alphabet.index(s) for s in string]
+
+    return list(get_alphabet(alphabet).encode(string))
 
 
 def indexlist_to_message(stream, alphabet, seperator):
@@ -22,7 +285,11 @@ def indexlist_to_message(stream, alphabet, seperator):
     'HELLO'
     """
 
-    return seperator.join(alphabet[c] for c in stream)
+    if not _is_codec_alphabet(alphabet):
+        return seperator.join(alphabet[c] for c in stream)
+
+    message = get_alphabet(alphabet).decode(stream)
+    return seperator.join(message) if seperator else message
 
 
 class TestHamming(unittest.TestCase):
@@ -32,8 +299,47 @@ class TestHamming(unittest.TestCase):
         """ Tests message_to_indexlist() """
 
         self.assertEqual(message_to_indexlist("abec", "abcde"), [0, 1, 4, 2])
+        self.assertRaises(ValueError, message_to_indexlist, "abx", "abcde")
+
+        alphabet = ''.join(map(chr, range(300)))
+        self.assertEqual(message_to_indexlist(chr(299) + chr(0), alphabet), [299, 0])
+        self.assertEqual(message_to_indexlist(['b', 'a'], ['a', 'b']), [1, 0])
+        self.assertEqual(message_to_indexlist("AB", "AAB"), [0, 2])
 
     def test_indexlist_to_message(self):
         """ Tests the indexlist_to_message() function """
 
         self.assertEqual(indexlist_to_message([0, 1, 4, 2], "abcde", ''), "abec")
+        self.assertEqual(indexlist_to_message([0, 1, 4, 2], "abcde", '-'), "a-b-e-c")
+        self.assertEqual(indexlist_to_message([299, 0], ''.join(map(chr, range(300))), ''), chr(299) + chr(0))
+        self.assertEqual(indexlist_to_message([1, 2], "AAB", ''), "AB")
+
+    def test_alphabet(self):
+        """ Tests the Alphabet codec with str and bytes and unknown symbols. """
+
+        codec = Alphabet("abcde")
+
+        self.assertEqual(codec.encode("abec"), b'\x00\x01\x04\x02')
+        self.assertEqual(Alphabet(map(chr, range(1000))).index(chr(999)), 999)
+        self.assertRaises(ValueError, Alphabet(map(chr, range(1000))).encode, "abc")
+        self.assertEqual(codec.encode(b"abec"), b'\x00\x01\x04\x02')
+        self.assertEqual(codec.encode("a-b e", 'skip'), b'\x00\x01\x04')
+        self.assertEqual(codec.encode(b"a-b e", 'skip'), b'\x00\x01\x04')
+        self.assertEqual(codec.encode("a-b", 'keep'), b'\x00\x05\x01')
+        self.assertRaises(ValueError, codec.encode, "a-b")
+        self.assertRaises(ValueError, codec.encode, b"a-b")
+
+        self.assertEqual(codec.decode(b'\x00\x05\x01', 'keep'), "a?b")
+        self.assertEqual(codec.decode(b'\x00\x05\x01', 'skip'), "ab")
+        self.assertRaises(ValueError, codec.decode, b'\x00\x05\x01')
+
+        self.assertEqual(codec.histogram("abba, cab!"), [3, 3, 1, 0, 0])
+        self.assertEqual(codec.index('e'), 4)
+        self.assertNotIn('x', codec)
+
+        str_table, bytes_table = codec.translation([1, 2, 3, 4, 0])
+        self.assertEqual("abe-x".translate(str_table), "bca-x")
+        self.assertEqual(b"abe-x".translate(bytes_table), b"bca-x")
+
+        str_table, _ = translation("aab", [1, 2, 0])
+        self.assertEqual("ab".translate(str_table), "aa")
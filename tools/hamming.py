@@ -7,14 +7,101 @@ of positions at which the corresponding symbols are different.
 """
 
 import argparse
+import heapq
+import sys
 import unittest
 
+from tools import instrument
+
 def hamming(string_a, string_b):
     """ This function returns the hamming distance as the number of different
     bits for the given two byte arrays.
     """
 
-    return sum([bin(a ^ b).count('1') for a, b in zip(string_a, string_b)])
+    length = min(len(string_a), len(string_b))
+
+    if instrument.enabled:
+        instrument.count('hamming.bytes', length)
+
+    if len(string_a) != length:
+        string_a = memoryview(string_a)[:length]
+    if len(string_b) != length:
+        string_b = memoryview(string_b)[:length]
+
+    return (int.from_bytes(string_a, 'big') ^ int.from_bytes(string_b, 'big')).bit_count()
+
+
+def records_to_ints(records):
+    """ Converts the given byte strings of equal length to integers and returns
+    the list of them. Raises a ValueError if the lengths differ.
+    """
+
+    records = list(records)
+
+    if len({len(record) for record in records}) > 1:
+        raise ValueError("all records have to be of the same length")
+
+    return [int.from_bytes(record, 'big') for record in records]
+
+
+def iter_distance_rows(queries, records):
+    """ Yields the hamming distances of every query to all records as one list
+    per query. All queries and records have to be byte strings of the same
+    length.
+
+    The records are converted to integers once, so each distance is a single
+    xor and popcount. Only one row is kept at a time, so this is the memory
+    bounded variant of distance_matrix().
+    """
+
+    records = list(records)
+    length = len(records[0]) if records else None
+    records = records_to_ints(records)
+
+    for query in queries:
+        if length is None:
+            length = len(query)
+        elif len(query) != length:
+            raise ValueError("all queries and records have to be of the same length")
+
+        if instrument.enabled:
+            instrument.count('hamming.distances', len(records))
+
+        q = int.from_bytes(query, 'big')
+        yield [(q ^ r).bit_count() for r in records]
+
+
+def distance_matrix(queries, records=None):
+    """ Returns the N x M matrix (list of rows) of the hamming distances of the N
+    queries to the M records. If no records are given, the pairwise distances
+    of the queries are computed.
+    """
+
+    queries = list(queries)
+
+    return list(iter_distance_rows(queries, queries if records is None else records))
+
+
+def nearest(queries, records, k=1):
+    """ Returns the k nearest records for every query as list of (distance,
+    index) tuples, nearest first.
+    """
+
+    return [
+        heapq.nsmallest(k, zip(row, range(len(row))))
+        for row in iter_distance_rows(queries, records)
+    ]
+
+
+def read_records(fileobj, record_length=None):
+    """ Reads the records of the given binary file object. Records are either
+    separated by newlines or, if record_length is given, of fixed length.
+    """
+
+    if record_length is None:
+        return [line.rstrip(b'\r\n') for line in fileobj]
+
+    return list(iter(lambda: fileobj.read(record_length), b''))
 
 
 class TestHamming(unittest.TestCase):
@@ -25,6 +112,20 @@ class TestHamming(unittest.TestCase):
 
         string_a, string_b = b'this is a test', b'wokka wokka!!!'
         self.assertEqual(hamming(string_a, string_b), 37)
+        self.assertEqual(hamming(string_a, string_b + b'!'), 37)
+
+    def test_bulk(self):
+        """ Tests the distance matrix and the nearest neighbours. """
+
+        records = [b'\x00\x00', b'\x00\x01', b'\xff\xff', b'\x0f\x0f']
+
+        self.assertEqual(distance_matrix(records[:2], records), [[0, 1, 16, 8], [1, 0, 15, 7]])
+        self.assertEqual(distance_matrix(records), [
+            [hamming(a, b) for b in records] for a in records
+        ])
+
+        self.assertEqual(nearest([b'\xff\xfe'], records, k=2), [[(1, 2), (9, 3)]])
+        self.assertRaises(ValueError, distance_matrix, [b'\x00'], records)
 
 
 def cli():
@@ -32,20 +133,53 @@ def cli():
 
     Example:
 
-    $ ./hamming.py "crypto is fun" "beer is tasty"
+    $ python3 -m tools.hamming "crypto is fun" "beer is tasty"
     The hamming distance is: 34
+
+    $ python3 -m tools.hamming --records fingerprints.bin --record-length 32 --queries lookup.bin --top 3
     """
 
     parser = argparse.ArgumentParser(
         description='Tool to compute the hamming distance of both passed strings.'
     )
 
-    parser.add_argument('string_a', type=lambda c: c.encode())
-    parser.add_argument('string_b', type=lambda c: c.encode())
+    parser.add_argument('string_a', type=lambda c: c.encode(), nargs='?')
+    parser.add_argument('string_b', type=lambda c: c.encode(), nargs='?')
+
+    parser.add_argument(
+        '--records', type=argparse.FileType('rb'),
+        help='file of records to compare pairwise (or to compare the queries with)'
+    )
+
+    parser.add_argument(
+        '--queries', type=argparse.FileType('rb'), help='file of records to look up in --records'
+    )
+
+    parser.add_argument(
+        '--record-length', type=int, help='records are of this fixed length instead of lines'
+    )
+
+    parser.add_argument('--top', type=int, help='print only the top nearest records per query')
     args = parser.parse_args()
 
-    result = hamming(args.string_a, args.string_b)
-    print("The hamming distance is:", result)
+    if args.records is None:
+        if args.string_a is None or args.string_b is None:
+            parser.error('either both strings or --records are required')
+
+        result = hamming(args.string_a, args.string_b)
+        print("The hamming distance is:", result)
+        return
+
+    records = read_records(args.records, args.record_length)
+    queries = records if args.queries is None else read_records(args.queries, args.record_length)
+
+    if args.top:
+        for i, neighbours in enumerate(nearest(queries, records, args.top)):
+            print(i, ' '.join(f'{index}:{distance}' for distance, index in neighbours), sep='\t')
+        return
+
+    for row in iter_distance_rows(queries, records):
+        sys.stdout.write('\t'.join(map(str, row)) + '\n')
 
 
 if __name__ == "__main__":
@@ -0,0 +1,377 @@
+#!/usr/bin/env python3
+
+""" Persistent index answering hamming distance queries on fixed-length records.
+
+The records are stored in a BK-tree: every node has at most one child per
+distance, and the subtree of the child at distance i holds only records at
+distance i from the node. By the triangle inequality, a query q at distance d
+from a node can only find records within radius r in the children at the
+distances d - r .. d + r, so most of the tree is never visited.
+
+The records are kept as integers, so each distance is a single xor and
+popcount (the same as hamming()). Insertions walk a single path of the tree,
+the index grows without rebuilds. It is written to disk as the records
+followed by the parent and distance of every node, so loading it doesn't have
+to recompute any distance.
+"""
+
+import argparse
+import array
+import collections
+import heapq
+import math
+import struct
+import sys
+import time
+import unittest
+
+from tools import instrument
+from tools.hamming import read_records
+
+
+# number of recent queries whose latencies are kept for the stats:
+LATENCY_WINDOW = 10000
+
+_MAGIC = b'HBKT'
+_HEADER = struct.Struct('<4sII')
+
+
+class HammingIndex:
+    """ BK-tree over byte strings of a fixed length with the hamming distance
+    as metric. The records are referred to by their index (insertion order).
+
+    Example:
+    --------
+    >>> index = HammingIndex(32)
+    >>> index.extend(fingerprints)
+    >>> index.radius(query, 3)
+    [(1, 17), (3, 4)]
+    >>> index.nearest(query, k=2)
+    >>> index.save('fingerprints.bkt')
+    >>> index = HammingIndex.load('fingerprints.bkt')
+    """
+
+    def __init__(self, record_length):
+        self.record_length = record_length
+
+        self.values = []
+        self.children = []
+
+        # parent and distance of every node but the root (to serialize the tree):
+        self._parents = array.array('I')
+        self._distances = array.array('H')
+
+        self.latencies = collections.deque(maxlen=LATENCY_WINDOW)
+        self.queries = 0
+        self.comparisons = 0
+
+    def __len__(self):
+        return len(self.values)
+
+    def record(self, index):
+        """ Returns the record of the given index. """
+
+        return self.values[index].to_bytes(self.record_length, 'big')
+
+    def _to_int(self, record):
+        if len(record) != self.record_length:
+            raise ValueError(f"the records have to be {self.record_length} bytes long")
+
+        return int.from_bytes(record, 'big')
+
+    def insert(self, record):
+        """ Adds the record to the index and returns its index. """
+
+        value = self._to_int(record)
+        index = len(self.values)
+
+        if index:
+            node = 0
+
+            while True:
+                distance = (value ^ self.values[node]).bit_count()
+                child = self.children[node].get(distance)
+
+                if child is None:
+                    break
+
+                node = child
+
+            self.children[node][distance] = index
+            self._parents.append(node)
+            self._distances.append(distance)
+
+        self.values.append(value)
+        self.children.append({})
+
+        return index
+
+    def extend(self, records):
+        """ Adds all given records and returns the list of their indexes. """
+
+        return [self.insert(record) for record in records]
+
+    def _timed(self, start, comparisons):
+        self.latencies.append(time.perf_counter() - start)
+        self.queries += 1
+        self.comparisons += comparisons
+
+        if instrument.enabled:
+            instrument.count('hamming.distances', comparisons)
+
+    def radius(self, query, radius):
+        """ Returns all records within the given hamming distance of the query
+        as list of (distance, index) tuples, nearest first.
+        """
+
+        start = time.perf_counter()
+        q = self._to_int(query)
+
+        found, comparisons = [], 0
+        stack = [0] if self.values else []
+
+        while stack:
+            node = stack.pop()
+            distance = (q ^ self.values[node]).bit_count()
+            comparisons += 1
+
+            if distance <= radius:
+                found.append((distance, node))
+
+            children = self.children[node]
+            low, high = distance - radius, distance + radius
+
+            if 2 * radius + 1 < len(children):
+                stack.extend(children[d] for d in range(max(low, 0), high + 1) if d in children)
+            else:
+                stack.extend(child for d, child in children.items() if low <= d <= high)
+
+        self._timed(start, comparisons)
+        return sorted(found)
+
+    def nearest(self, query, k=1):
+        """ Returns the k nearest records of the query as list of (distance,
+        index) tuples, nearest first (like hamming.nearest()).
+        """
+
+        start = time.perf_counter()
+        q = self._to_int(query)
+
+        # max-heap (negated) of the k best records found so far:
+        best, comparisons = [], 0
+
+        # nodes ordered by the lower bound of the distances in their subtrees:
+        pending = [(0, 0)] if self.values and k > 0 else []
+
+        while pending:
+            bound, node = heapq.heappop(pending)
+            limit = -best[0][0] if len(best) == k else math.inf
+
+            if bound > limit:
+                break
+
+            distance = (q ^ self.values[node]).bit_count()
+            comparisons += 1
+
+            if len(best) < k:
+                heapq.heappush(best, (-distance, -node))
+            elif distance < limit:
+                heapq.heapreplace(best, (-distance, -node))
+
+            limit = -best[0][0] if len(best) == k else math.inf
+
+            for d, child in self.children[node].items():
+                bound = abs(d - distance)
+
+                if bound <= limit:
+                    heapq.heappush(pending, (bound, child))
+
+        self._timed(start, comparisons)
+        return sorted((-distance, -node) for distance, node in best)
+
+    def stats(self):
+        """ Returns the query statistics as dict: number of queries, average
+        distance computations per query and the latencies (in seconds) of the
+        recent queries.
+        """
+
+        latencies = sorted(self.latencies)
+
+        def percentile(p):
+            return latencies[min(len(latencies) - 1, int(p * len(latencies)))] if latencies else 0.0
+
+        return {
+            'records': len(self),
+            'queries': self.queries,
+            'comparisons': self.comparisons / self.queries if self.queries else 0.0,
+            'mean': sum(latencies) / len(latencies) if latencies else 0.0,
+            'p50': percentile(0.5),
+            'p90': percentile(0.9),
+            'p99': percentile(0.99),
+            'max': latencies[-1] if latencies else 0.0,
+        }
+
+    def save(self, path):
+        """ Writes the index to path. """
+
+        parents, distances = array.array('I', self._parents), array.array('H', self._distances)
+
+        if sys.byteorder == 'big':
+            parents.byteswap()
+            distances.byteswap()
+
+        with open(path, 'wb') as f:
+            f.write(_HEADER.pack(_MAGIC, self.record_length, len(self)))
+            f.write(b''.join(value.to_bytes(self.record_length, 'big') for value in self.values))
+            f.write(parents.tobytes())
+            f.write(distances.tobytes())
+
+    @classmethod
+    def load(cls, path):
+        """ Reads an index written by save(). """
+
+        with open(path, 'rb') as f:
+            data = f.read()
+
+        magic, record_length, count = _HEADER.unpack_from(data)
+
+        if magic != _MAGIC:
+            raise ValueError(f"{path} is no hamming index")
+
+        index = cls(record_length)
+        offset = _HEADER.size
+
+        index.values = [
+            int.from_bytes(data[i:i + record_length], 'big')
+            for i in range(offset, offset + count * record_length, record_length)
+        ]
+        offset += count * record_length
+
+        edges = max(count - 1, 0)
+        index._parents.frombytes(data[offset:offset + 4 * edges])
+        index._distances.frombytes(data[offset + 4 * edges:offset + 6 * edges])
+
+        if sys.byteorder == 'big':
+            index._parents.byteswap()
+            index._distances.byteswap()
+
+        index.children = [{} for _ in range(count)]
+
+        for node, (parent, distance) in enumerate(zip(index._parents, index._distances), 1):
+            index.children[parent][distance] = node
+
+        return index
+
+
+class TestHammingIndex(unittest.TestCase):
+    """ Some unittests for this package. """
+
+    def setUp(self):
+        import random
+
+        rng = random.Random(1)
+
+        self.records = [rng.getrandbits(32).to_bytes(4, 'big') for _ in range(500)]
+        self.queries = [rng.getrandbits(32).to_bytes(4, 'big') for _ in range(20)] + self.records[:5]
+
+        self.index = HammingIndex(4)
+        self.index.extend(self.records)
+
+    def test_queries(self):
+        """ Tests the radius and k-NN queries against a linear scan. """
+
+        from tools.hamming import hamming, nearest
+
+        for query in self.queries:
+            expected = sorted((hamming(query, record), i) for i, record in enumerate(self.records))
+
+            self.assertEqual(self.index.radius(query, 9), [e for e in expected if e[0] <= 9])
+            self.assertEqual(
+                [distance for distance, _ in self.index.nearest(query, 5)],
+                [distance for distance, _ in nearest([query], self.records, 5)[0]]
+            )
+
+        stats = self.index.stats()
+
+        self.assertEqual(stats['queries'], 2 * len(self.queries))
+        self.assertLess(stats['comparisons'], len(self.records))
+        self.assertRaises(ValueError, self.index.insert, b'\x00')
+
+    def test_save(self):
+        """ Tests that a loaded index answers like the original and can grow. """
+
+        import os
+        import tempfile
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'index.bkt')
+
+            self.index.save(path)
+            index = HammingIndex.load(path)
+
+        self.assertEqual(index.children, self.index.children)
+        self.assertEqual(index.record(7), self.records[7])
+
+        index.insert(self.queries[0])
+        self.assertEqual(index.nearest(self.queries[0]), [(0, len(self.records))])
+
+
+def cli():
+    """ Provides a command line interface. Pass -h as argument to get some information.
+
+    Example:
+
+    $ python3 -m tools.hamming_index build fingerprints.bkt --records fingerprints.bin --record-length 32
+    $ python3 -m tools.hamming_index query fingerprints.bkt --queries lookup.bin --radius 3
+    """
+
+    parser = argparse.ArgumentParser(description='Tool to build and query hamming distance indexes.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    build = commands.add_parser('build', help='create an index or add records to it')
+    build.add_argument('index', help='path of the index')
+    build.add_argument('--records', type=argparse.FileType('rb'), required=True, help='file of records to add')
+    build.add_argument('--record-length', type=int, help='records are of this fixed length instead of lines')
+    build.add_argument('--append', action='store_true', help='add the records to the existing index')
+
+    query = commands.add_parser('query', help='look up records in an index')
+    query.add_argument('index', help='path of the index')
+    query.add_argument('--queries', type=argparse.FileType('rb'), required=True, help='file of records to look up')
+    query.add_argument('--record-length', type=int, help='records are of this fixed length instead of lines')
+    query.add_argument('--radius', type=int, help='print all records within this distance')
+    query.add_argument('--top', type=int, default=1, help='print the top nearest records (default)')
+
+    args = parser.parse_args()
+    records = read_records(args.records if args.command == 'build' else args.queries, args.record_length)
+
+    if args.command == 'build':
+        if args.append:
+            index = HammingIndex.load(args.index)
+        elif args.record_length is None and not records:
+            parser.error('the records file is empty, pass --record-length to create an empty index')
+        else:
+            index = HammingIndex(args.record_length or len(records[0]))
+
+        index.extend(records)
+        index.save(args.index)
+
+        print(f"[+] {len(index)} records", file=sys.stderr)
+        return
+
+    index = HammingIndex.load(args.index)
+
+    for i, record in enumerate(records):
+        neighbours = index.nearest(record, args.top) if args.radius is None else index.radius(record, args.radius)
+        print(i, ' '.join(f'{node}:{distance}' for distance, node in neighbours), sep='\t')
+
+    stats = index.stats()
+    print(
+        f"[+] {stats['queries']} queries, {stats['comparisons']:.1f} distances per query, "
+        f"latency mean {stats['mean'] * 1e6:.1f}us p50 {stats['p50'] * 1e6:.1f}us "
+        f"p99 {stats['p99'] * 1e6:.1f}us max {stats['max'] * 1e6:.1f}us",
+        file=sys.stderr
+    )
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+
+""" Opt-in instrumentation of the library: counters and timers.
+
+The hot functions of the library report to this module, e.g. the number of
+SHA1 compressions, the bytes combined by otp or compared by hamming and the
+time spent in the stages of the crackers. As long as the instrumentation is
+disabled (the default), reporting costs a single check of the enabled flag:
+
+    if instrument.enabled:
+        instrument.count('sha1.compress')
+
+    with instrument.timer('caesar_cracker.score'):
+        ...
+
+Measurements are scoped by measure(), which optionally runs cProfile as well:
+
+    with instrument.measure(profile=True) as measurement:
+        crack(ciphertext)
+
+    measurement.write('stats.json')   # counters and timers as JSON
+    measurement.write('stats.prof')   # cProfile stats (pstats, snakeviz, ...)
+
+Work done in other processes (e.g. pools of the crackers) isn't counted.
+"""
+
+import collections
+import contextlib
+import io
+import sys
+import time
+import unittest
+
+# json, cProfile, pstats and the modules of the cli are imported on demand,
+# this module is imported by the whole library.
+
+
+enabled = False
+
+# name -> value:
+counters = collections.Counter()
+
+# name -> [calls, seconds]:
+timers = collections.defaultdict(lambda: [0, 0.0])
+
+
+def enable():
+    """ Enables the collection of the counters and timers. """
+
+    global enabled
+    enabled = True
+
+
+def disable():
+    """ Disables the collection, the collected values are kept. """
+
+    global enabled
+    enabled = False
+
+
+def reset():
+    """ Clears all counters and timers. """
+
+    counters.clear()
+    timers.clear()
+
+
+def count(name, amount=1):
+    """ Adds amount to the counter of the given name (callers check enabled first). """
+
+    counters[name] += amount
+
+
+class _Timer:
+    """ Context manager adding the time spent in its block to a timer. """
+
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        entry = timers[self.name]
+        entry[0] += 1
+        entry[1] += time.perf_counter() - self.start
+
+
+_NULL_TIMER = contextlib.nullcontext()
+
+
+def timer(name):
+    """ Returns a context manager timing its block under the given name, or a
+    shared no-op context manager if the instrumentation is disabled.
+    """
+
+    return _Timer(name) if enabled else _NULL_TIMER
+
+
+class Measurement:
+    """ The counters and timers collected within a measure() block and the
+    cProfile profile if requested.
+    """
+
+    def __init__(self, profile=None):
+        self.counters = collections.Counter()
+        self.timers = {}
+        self.profile = profile
+        self.elapsed = 0.0
+
+    def to_dict(self):
+        """ Returns the counters and timers as JSON serializable dict. """
+
+        return {
+            'elapsed': self.elapsed,
+            'counters': dict(sorted(self.counters.items())),
+            'timers': {name: {'calls': calls, 'seconds': seconds} for name, (calls, seconds) in sorted(self.timers.items())},
+        }
+
+    def summary(self, limit=20):
+        """ Returns a human readable summary of the counters and timers followed
+        by the top limit functions of the profile (sorted by cumulative time).
+        """
+
+        lines = [f'elapsed {self.elapsed:.6f}s']
+        lines += [f'{value:>16}  {name}' for name, value in sorted(self.counters.items())]
+        lines += [
+            f'{seconds:>15.6f}s  {name} ({calls} calls)' for name, (calls, seconds) in sorted(self.timers.items())
+        ]
+
+        if self.profile is not None:
+            import pstats
+
+            stream = io.StringIO()
+            pstats.Stats(self.profile, stream=stream).sort_stats('cumulative').print_stats(limit)
+            lines.append(stream.getvalue())
+
+        return '\n'.join(lines)
+
+    def write(self, path):
+        """ Writes the measurement to path: counters and timers as JSON if the
+        path ends with .json, the cProfile stats (pstats format) otherwise.
+        """
+
+        if path.endswith('.json'):
+            import json
+
+            with open(path, 'w') as f:
+                json.dump(self.to_dict(), f, indent=2)
+        elif self.profile is None:
+            raise ValueError("the measurement has no profile, use a .json path")
+        else:
+            self.profile.dump_stats(path)
+
+
+@contextlib.contextmanager
+def measure(profile=False):
+    """ Enables the instrumentation within its block and yields a Measurement,
+    which holds the counters and timers collected within the block once it is
+    left. If profile is set, the block is also run by cProfile.
+    """
+
+    global enabled
+
+    if profile:
+        import cProfile
+
+    previous_enabled = enabled
+    previous_counters = counters.copy()
+    previous_timers = {name: list(entry) for name, entry in timers.items()}
+
+    measurement = Measurement(cProfile.Profile() if profile else None)
+    enabled = True
+    start = time.perf_counter()
+
+    if measurement.profile is not None:
+        measurement.profile.enable()
+
+    try:
+        yield measurement
+    finally:
+        if measurement.profile is not None:
+            measurement.profile.disable()
+
+        measurement.elapsed = time.perf_counter() - start
+        enabled = previous_enabled
+
+        measurement.counters = counters - previous_counters
+
+        for name, (calls, seconds) in timers.items():
+            before = previous_timers.get(name, [0, 0.0])
+
+            if calls != before[0]:
+                measurement.timers[name] = [calls - before[0], seconds - before[1]]
+
+
+def report(measurement, destination):
+    """ Writes the measurement to the destination of a --profile option: the
+    summary to stderr for '-', otherwise to the file (see Measurement.write()).
+    """
+
+    if destination == '-':
+        print(measurement.summary(), file=sys.stderr)
+    else:
+        measurement.write(destination)
+
+
+class TestInstrument(unittest.TestCase):
+    """ Some unittests for this package. """
+
+    def test_disabled(self):
+        """ Tests that nothing is collected while disabled. """
+
+        reset()
+
+        with timer('stage'):
+            if enabled:
+                count('calls')
+
+        self.assertEqual((counters, dict(timers)), (collections.Counter(), {}))
+
+    def test_measure(self):
+        """ Tests that measurements are scoped and the state is restored. """
+
+        from hashing.sha1_lea import SHA1
+        from tools.hamming import hamming
+
+        with measure() as outer:
+            with timer('stage'):
+                hamming(b'abcd', b'abce')
+
+            with measure(profile=True) as inner:
+                SHA1().update(b'x' * 1000).hexdigest()
+
+        self.assertFalse(enabled)
+        self.assertEqual(inner.counters['sha1.compress'], 16)
+        self.assertEqual(outer.counters['sha1.compress'], 16)
+        self.assertEqual(outer.counters['hamming.bytes'], 4)
+        self.assertNotIn('hamming.bytes', inner.counters)
+        self.assertEqual(outer.timers['stage'][0], 1)
+
+        self.assertEqual(inner.to_dict()['counters']['sha1.compress'], 16)
+        self.assertIn('compress', inner.summary())
+
+
+def cli():
+    """ Provides a command line interface. Pass -h as argument to get some information.
+
+    Runs the cli of a module of this repository with enabled instrumentation.
+
+    Example:
+
+    $ python3 -m tools.instrument --profile stats.prof cryptanalysis.caesar_cracker KHOOR
+    """
+
+    import argparse
+    import runpy
+
+    parser = argparse.ArgumentParser(description='Tool to run a module with enabled instrumentation.')
+
+    parser.add_argument('--profile', default='-', help='.json file, cProfile stats file or - for stderr')
+    parser.add_argument('module', help='module to run, e.g. hashing.sha1_lea')
+    parser.add_argument('arguments', nargs=argparse.REMAINDER, help='arguments of the module')
+
+    args = parser.parse_args()
+    sys.argv = [args.module] + args.arguments
+
+    # the library reports to tools.instrument, not to this module run as __main__:
+    from tools import instrument
+
+    with instrument.measure(profile=True) as measurement:
+        try:
+            runpy.run_module(args.module, run_name='__main__', alter_sys=True)
+        except SystemExit:
+            pass
+
+    instrument.report(measurement, args.profile)
+
+
+if __name__ == "__main__":
+    cli()
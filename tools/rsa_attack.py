@@ -12,23 +12,50 @@ n = pq, where p and q are two prime numbers while phi(n) = (p-1)*(q-1)
 
 And on the left side of this formula we apply the pq-formula to calculate points
 of zero.
+
+Without phi(n), weak keys are factored by one of the following methods:
+
+- fermat: p and q are close to each other (close to the square root of n)
+- rho: Pollard's rho method finds small factors (Brent's variant)
+- p-1: Pollard's p-1 method finds p if p-1 is smooth
+- wiener: the private exponent d is small (d < n^(1/4) / 3), requires e
+
+The factoring engine runs all methods against a key at the same time, each in
+its own process, and terminates the others as soon as one of them succeeds or
+the time budget is exhausted.
 """
 
+import argparse
+import collections
 import math
-import sys
+import multiprocessing
+import queue
+import time
+import unittest
+
+from tools import instrument
+
+
+FactorResult = collections.namedtuple('FactorResult', ['n', 'factors', 'method', 'timings', 'errors'])
+
+# default limits of the methods when run without time budget:
+FERMAT_STEPS = 1 << 24
+RHO_STEPS = 1 << 24
+P1_BOUND = 1 << 20
+
+# default seconds per key of the engine:
+BUDGET = 60
+
+# seconds between the checks whether a method process died:
+POLL_INTERVAL = 0.5
+
 
 def int_sqrt(n):
     """ Calculates and returns the square root for a given
     integer without converting to float (for large ints).
     """
 
-    x, y = n, (n + 1) // 2
-
-    while y < x:
-        x = y
-        y = (x + n // x) // 2
-
-    return x
+    return math.isqrt(n)
 
 def factorize(n, phi):
     """ Factorize n with a known phi(n) """
@@ -41,15 +68,414 @@ def factorize(n, phi):
 
     return a + b, a - b
 
-def main():
+def fermat(n, e=None, steps=FERMAT_STEPS):
+    """ Fermat's method: searches a = (p + q) / 2 upwards from the square root of
+    n until a^2 - n = b^2 is a square, then n = (a + b)(a - b).
+    """
+
+    a = int_sqrt(n)
+    if a * a < n:
+        a += 1
+
+    b2 = a * a - n
+
+    for _ in range(steps):
+        b = int_sqrt(b2)
+
+        if b * b == b2 and a - b > 1:
+            return a + b, a - b
+
+        # (a + 1)^2 - n = a^2 - n + 2a + 1:
+        b2 += 2 * a + 1
+        a += 1
+
+    return None
+
+
+def pollard_rho(n, e=None, steps=RHO_STEPS):
+    """ Pollard's rho method in Brent's variant: the products of the differences
+    are accumulated and passed to gcd in batches. Gives up after steps iterations
+    over all tried polynomials (None for no limit).
+    """
+
+    if n % 2 == 0:
+        return 2, n // 2
+
+    batch, done = 128, 0
+
+    for c in range(1, n):
+        y, r, product, g = 2, 1, 1, 1
+
+        while g == 1:
+            x = y
+            for _ in range(r):
+                y = (y * y + c) % n
+
+            k = 0
+            while k < r and g == 1:
+                saved = y
+
+                for _ in range(min(batch, r - k)):
+                    y = (y * y + c) % n
+                    product = product * (x - y) % n
+
+                g = math.gcd(product, n)
+                k += batch
+
+            r *= 2
+            done += r
+
+            if steps is not None and done > steps:
+                return None
+
+        if g == n:
+            # the batch overshot, repeat its steps one by one:
+            g = 1
+            while g == 1:
+                saved = (saved * saved + c) % n
+                g = math.gcd(x - saved, n)
+
+        if g != n:
+            return g, n // g
+
+    return None
+
+
+def _primes(bound):
+    """ Returns the primes up to the bound (sieve of Eratosthenes). """
+
+    sieve = bytearray([1]) * (bound + 1)
+    sieve[:2] = b'\x00\x00'
+
+    for i in range(2, int_sqrt(bound) + 1):
+        if sieve[i]:
+            sieve[i * i::i] = bytes(len(range(i * i, bound + 1, i)))
+
+    return [i for i, is_prime in enumerate(sieve) if is_prime]
+
+
+def pollard_p1(n, e=None, bound=P1_BOUND):
+    """ Pollard's p-1 method: a = 2^M mod n for the product M of all prime powers
+    up to the bound. If p-1 divides M, p divides a - 1.
+    """
+
+    a = 2
+
+    for i, prime in enumerate(_primes(bound)):
+        power = prime
+        while power * prime <= bound:
+            power *= prime
+
+        a = pow(a, power, n)
+
+        if i % 1024 == 1023 or prime * prime > bound:
+            g = math.gcd(a - 1, n)
+
+            if 1 < g < n:
+                return g, n // g
+            if g == n:
+                return None
+
+    g = math.gcd(a - 1, n)
+    return (g, n // g) if 1 < g < n else None
+
+
+def wiener(n, e=None):
+    """ Wiener's attack: for small d, k/d is a convergent of the continued
+    fraction of e/n. Every convergent yields a candidate phi(n) = (ed - 1) / k,
+    which is checked by factorize.
+    """
+
+    if e is None:
+        return None
+
+    numerator, denominator = e, n
+    k0, k1, d0, d1 = 0, 1, 1, 0
+
+    while denominator:
+        a = numerator // denominator
+        numerator, denominator = denominator, numerator - a * denominator
+
+        # next convergent k1 / d1 of e / n:
+        k0, k1 = k1, a * k1 + k0
+        d0, d1 = d1, a * d1 + d0
+
+        if k1 == 0 or (e * d1 - 1) % k1:
+            continue
+
+        phi = (e * d1 - 1) // k1
+        s = n + 1 - phi
+        discriminant = s * s - 4 * n
+
+        if s % 2 == 0 and discriminant >= 0 and int_sqrt(discriminant) ** 2 == discriminant:
+            p, q = factorize(n, phi)
+
+            if p * q == n and 1 < q:
+                return p, q
+
+    return None
+
+
+# name -> method(n, e) returning the tuple of two factors or None:
+METHODS = {
+    'fermat': fermat,
+    'rho': pollard_rho,
+    'p-1': pollard_p1,
+    'wiener': wiener,
+}
+
+
+def _run_method(name, n, e, results):
+    """ Runs a single method, the entry point of the processes of the engine.
+    Puts the tuple (name, factors, seconds, error message or None) into results.
+    """
+
+    start = time.perf_counter()
+
     try:
-        n, phi = int(sys.argv[1]), int(sys.argv[2])
-    except IndexError:
-        print("Usage:", sys.argv[0], "<n> <phi>")
+        factors, error = METHODS[name](n, e), None
+    except Exception as exception:  # pylint: disable=broad-except
+        factors, error = None, f'{type(exception).__name__}: {exception}'
+
+    results.put((name, factors, time.perf_counter() - start, error))
+
+
+def factor(n, e=None, methods=None, budget=BUDGET):
+    """ Runs the given methods (default: all) against n at the same time, each
+    in its own process, and returns a FactorResult with the factors and the
+    method that found them (both None if no method succeeded) as well as the
+    timings: a dict mapping every method to the tuple (status, seconds) where
+    the status is one of found, failed, error, cancelled, timeout and skipped.
+    The errors map the methods that raised (or whose process died) to the
+    error message.
+
+    The remaining methods are terminated as soon as one succeeds or budget
+    seconds passed (None or 0 for no limit). Raises a ValueError for unknown methods.
+    """
+
+    methods = list(methods or METHODS)
+    unknown = [name for name in methods if name not in METHODS]
+
+    if unknown:
+        raise ValueError(f"unknown methods {', '.join(unknown)}, choose from {', '.join(METHODS)}")
+
+    timings, errors = {}, {}
+
+    if e is None and 'wiener' in methods:
+        methods.remove('wiener')
+        timings['wiener'] = ('skipped', 0.0)
+
+    start = time.perf_counter()
+    deadline = start + budget if budget else None
+
+    results = multiprocessing.Queue()
+    processes = {
+        name: multiprocessing.Process(target=_run_method, args=(name, n, e, results), daemon=True)
+        for name in methods
+    }
+
+    for process in processes.values():
+        process.start()
+
+    factors, method = None, None
+
+    try:
+        while factors is None and any(name not in timings for name in processes):
+            remaining = None if deadline is None else max(deadline - time.perf_counter(), 0)
+
+            # poll, so processes dying without a result (exit code != 0) are noticed:
+            try:
+                name, found, elapsed, error = results.get(timeout=POLL_INTERVAL if remaining is None else
+                                                          min(remaining, POLL_INTERVAL))
+            except queue.Empty:
+                for name, process in processes.items():
+                    if name not in timings and process.exitcode not in (None, 0):
+                        timings[name] = ('error', time.perf_counter() - start)
+                        errors[name] = f'the process exited with {process.exitcode}'
+
+                if deadline is not None and time.perf_counter() >= deadline:
+                    break
+
+                continue
+
+            if error is not None:
+                timings[name], errors[name] = ('error', elapsed), error
+            else:
+                timings[name] = ('found' if found else 'failed', elapsed)
+
+            if found:
+                factors, method = found, name
+    finally:
+        status = 'cancelled' if factors is not None else 'timeout'
+
+        for name, process in processes.items():
+            if name not in timings:
+                process.terminate()
+                timings[name] = (status, time.perf_counter() - start)
+
+            process.join()
+
+        results.close()
+
+    if instrument.enabled:
+        instrument.count('rsa_attack.keys')
+
+        if method is not None:
+            instrument.count(f'rsa_attack.found.{method}')
+
+    return FactorResult(n, factors, method, timings, errors)
+
+
+def factor_keys(keys, methods=None, budget=BUDGET):
+    """ Yields a FactorResult for every given key, either n or a tuple (n, e). """
+
+    for key in keys:
+        n, e = key if isinstance(key, tuple) else (key, None)
+        yield factor(n, e, methods, budget)
+
+
+def read_keys(fileobj):
+    """ Reads the keys of the given text file: one key per line, n or n and e
+    separated by whitespace (decimal or with 0x prefix). Empty lines and
+    comments (#) are skipped.
+    """
+
+    for line in fileobj:
+        fields = line.split('#', 1)[0].split()
+
+        if fields:
+            n, *e = (int(field, 0) for field in fields)
+            yield (n, e[0]) if e else n
+
+
+class TestRSAAttack(unittest.TestCase):
+    """ Some unittests for this package. """
+
+    p, q = 1000003, 1000033
+
+    # 120121 - 1 = 2^3 * 3 * 5 * 7 * 11 * 13, while 1000000007 - 1 = 2 * 500000003:
+    smooth_p, large_q = 120121, 1000000007
+
+    def test_int_sqrt(self):
+        """ Tests the square root with large integers. """
+
+        for n in (0, 1, 15, 16, 17, 3 ** 1000, 7 ** 2000 - 1):
+            root = int_sqrt(n)
+            self.assertTrue(root * root <= n < (root + 1) ** 2)
+
+    def test_factorize(self):
+        """ Tests the attack with a known phi(n). """
+
+        self.assertEqual(factorize(self.p * self.q, (self.p - 1) * (self.q - 1)), (self.q, self.p))
+
+    def test_methods(self):
+        """ Tests every method against a key it is able to factor. """
+
+        n = self.p * self.q
+
+        self.assertEqual(sorted(fermat(n)), [self.p, self.q])
+        self.assertEqual(sorted(pollard_rho(n)), [self.p, self.q])
+        self.assertIsNone(pollard_rho(self.large_q, steps=1 << 12))
+
+        self.assertEqual(sorted(pollard_p1(self.smooth_p * self.large_q, bound=1000)), [self.smooth_p, self.large_q])
+        self.assertIsNone(pollard_p1(n, bound=10))
+
+        p, q = 1000000007, 998244353
+        phi, d = (p - 1) * (q - 1), 101
+        e = pow(d, -1, phi)
+
+        self.assertEqual(sorted(wiener(p * q, e)), [q, p])
+        self.assertIsNone(wiener(p * q, 65537))
+
+    def test_factor(self):
+        """ Tests the engine: the first successful method wins, the others are
+        reported as failed or cancelled.
+        """
+
+        result = factor(self.p * self.q, budget=30)
+
+        self.assertEqual(sorted(result.factors), [self.p, self.q])
+        self.assertEqual(result.timings['wiener'][0], 'skipped')
+        self.assertEqual(result.timings[result.method][0], 'found')
+        self.assertEqual(set(result.timings), set(METHODS))
+
+        result = factor(self.smooth_p * self.large_q, methods=['fermat'], budget=0.5)
+
+        self.assertIsNone(result.factors)
+        self.assertEqual(result.timings['fermat'][0], 'timeout')
+
+        results = list(factor_keys([self.p * self.q, (self.p * self.q, 65537)], ['fermat'], budget=30))
+        self.assertEqual([sorted(r.factors) for r in results], [[self.p, self.q]] * 2)
+
+    def test_errors(self):
+        """ Tests that unknown, raising and dying methods don't block the engine. """
+
+        import os
+        from unittest import mock
+
+        def broken(n, e=None):
+            raise ArithmeticError('broken')
+
+        def dying(n, e=None):
+            os._exit(3)
+
+        self.assertRaises(ValueError, factor, self.p * self.q, methods=['nope'])
+
+        with mock.patch.dict(METHODS, {'broken': broken, 'dying': dying}):
+            result = factor(self.smooth_p * self.large_q, methods=['broken', 'dying'])
+
+        self.assertIsNone(result.factors)
+        self.assertEqual({name: status for name, (status, _) in result.timings.items()},
+                         {'broken': 'error', 'dying': 'error'})
+        self.assertEqual(result.errors['broken'], 'ArithmeticError: broken')
+
+def cli():
+    """ Provides a command line interface. Pass -h as argument to get some information.
+
+    Example:
+
+    $ python3 -m tools.rsa_attack <n> <phi>
+    $ python3 -m tools.rsa_attack --budget 60 --keys keys.txt
+    [+] n = 1000036000099: 1000003 * 1000033 (fermat)
+        fermat   found       0.000s
+        ...
+    """
+
+    parser = argparse.ArgumentParser(description='Tool to factor weak RSA moduli.')
+
+    parser.add_argument('n', nargs='?', type=lambda x: int(x, 0), help='modulus to factor')
+    parser.add_argument('phi', nargs='?', type=lambda x: int(x, 0), help='factor n with a known phi(n)')
+    parser.add_argument('-e', type=lambda x: int(x, 0), help='public exponent (for wiener)')
+    parser.add_argument('--keys', type=argparse.FileType('r'), help='file with one key (n [e]) per line')
+    parser.add_argument('--methods', nargs='+', choices=list(METHODS), help='methods to run (default: all)')
+    parser.add_argument('--budget', type=float, default=BUDGET, help='seconds per key, 0 for no limit')
+
+    args = parser.parse_args()
+
+    if args.phi is not None:
+        print(f"[+] apply attack on n = {args.n}, phi(n) = {args.phi}")
+        print(factorize(args.n, args.phi))
         return
 
-    print(f"[+] apply attack on n = {n}, phi(n) = {phi}")
-    print(factorize(n, phi))
+    if args.keys is not None:
+        keys = read_keys(args.keys)
+    elif args.n is not None:
+        keys = [(args.n, args.e) if args.e is not None else args.n]
+    else:
+        parser.error('either n or --keys is required')
+
+    for result in factor_keys(keys, args.methods, args.budget):
+        if result.factors is None:
+            print(f"[-] n = {result.n}: no factors found")
+        else:
+            p, q = result.factors
+            print(f"[+] n = {result.n}: {p} * {q} ({result.method})")
+
+        for name, (status, seconds) in result.timings.items():
+            print(f"    {name:<8} {status:<9} {seconds:8.3f}s  {result.errors.get(name, '')}".rstrip())
+
+# the former entry point:
+main = cli
 
 def example():
     n = 399081846921783573731969706872899710332479570669182598636878020544545498500095879706861915957763765677589271148544418027556897638123898650694905659699388027447329186567543669719056963934478907484470299975070884228881176791374833064981004136947342827784345106988800086071486535280883930849129956794812392496934540555767897685178133034313801007825526945491955390972816804087486190979770576016075456226669814508584111976115292015873914100495003509657724170377980833036834209651934046247242851210899152712215029291780647726641180724779799987396580312898896726502886323838513051112374864699777289381818747410721416544692008823061323004855133180373097904302215709173980719604124931552278155654881363712418244600042558077449111260172950537541679740953643124072108823653101336984482418977965548839966796825427469248953717368992453221758211069815998323467745433076440816218770134280148474654871865154874107896295277715856661495807558451423177301616266015627951159478809210586119547055672009526622844688457854956041456424573298569136603966508921141528661224225597464851189943714670790624246047603859474880886165025053072930864742536612129544210602896637521568724195304418687224790830444695979862424243638949764703980358968979360303879802689391
@@ -66,4 +492,4 @@ def example():
     print("q =", q)
 
 if __name__ == "__main__":
-    main()
+    cli()